@@ -0,0 +1,371 @@
+#
+# Misst den Eigenaufwand von ShrinkBot ohne echtes ffmpeg
+#
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time as time_module
+from Config import default_settings
+from Encoder import Encoder
+from Logger import setup_logging
+from Main import run
+from Metrics import Metrics
+from Processor import find_mkv_files
+from Staging import Scratch
+from State import StateStore
+
+# Ersetzt ffmpeg: schreibt die Ausgabe in Schritten, meldet den Fortschritt wie
+# "-progress pipe:1" und beendet sich bei "q" auf stdin.
+FAKE_FFMPEG = """
+import os, select, sys, time
+sleep, ratio, args = float(sys.argv[1]), float(sys.argv[2]), sys.argv[3:]
+source, output = args[args.index("-i") + 1], args[-1]
+size = os.path.getsize(source)
+duration = size * 8 / 10_640_000
+steps = 10
+for step in range(1, steps + 1):
+    time.sleep(sleep / steps)
+    written = int(size * ratio * step / steps)
+    with open(output, "wb") as f:
+        f.truncate(written)
+    print(f"fps=50\\ntotal_size={written}\\nout_time_us={int(duration * 1e6 * step / steps)}"
+          f"\\nspeed=2x\\nprogress={'end' if step == steps else 'continue'}", flush=True)
+    readable, _, _ = select.select([sys.stdin], [], [], 0)
+    if readable and sys.stdin.read(1) == "q":
+        break
+"""
+
+# Ersetzt ffprobe: HEVC in 1080p mit 10 Mbit/s Video und 640 kbit/s Audio
+FAKE_FFPROBE = """
+import json, os, sys
+size = os.path.getsize(sys.argv[-1])
+print(json.dumps({
+    "streams": [
+        {"codec_type": "video", "codec_name": "hevc", "width": 1920, "height": 1080,
+         "avg_frame_rate": "24000/1001", "bit_rate": "10000000"},
+        {"codec_type": "audio", "codec_name": "ac3", "bit_rate": "640000"},
+    ],
+    "format": {"duration": str(size * 8 / 10_640_000), "bit_rate": "10640000"},
+}))
+"""
+
+
+class StubEncoder(Encoder):
+    """
+    Führt statt ffmpeg und ffprobe kleine Python-Skripte aus. Die Konvertierung dauert
+    sleep Sekunden und schreibt eine Ausgabe mit ratio mal der Größe der Quelldatei.
+    """
+
+    def __init__(self, sleep, ratio):
+        super().__init__()
+        self.sleep = sleep
+        self.ratio = ratio
+
+    def command(self, args, directories, cpuset=None, program="ffmpeg"):
+        if program == "ffprobe":
+            return [sys.executable, "-c", FAKE_FFPROBE, *args]
+        return [
+            sys.executable,
+            "-c",
+            FAKE_FFMPEG,
+            str(self.sleep),
+            str(self.ratio),
+            *args,
+        ]
+
+
+def generate_tree(root, depth, directories, files, size_bytes):
+    """
+    Erzeugt eine synthetische Bibliothek aus Sparse-Dateien: Jedes Verzeichnis enthält
+    files MKV-Dateien und bis zur Tiefe depth jeweils directories Unterverzeichnisse.
+    Jede Datei beginnt mit ihrem Pfad, damit sie nicht als Duplikat erkannt wird.
+
+    Returns:
+        tuple: (Anzahl Verzeichnisse, Anzahl Dateien).
+    """
+    directory_count = file_count = 0
+    stack = [(root, 0)]
+    while stack:
+        path, level = stack.pop()
+        os.makedirs(path, exist_ok=True)
+        directory_count += 1
+        for number in range(files):
+            file_path = os.path.join(path, f"Folge {number:04d}.mkv")
+            with open(file_path, "wb") as f:
+                f.write(file_path.encode("utf-8")[:size_bytes])
+                f.truncate(size_bytes)
+            file_count += 1
+        if level < depth:
+            stack.extend(
+                (os.path.join(path, f"Staffel {number:03d}"), level + 1)
+                for number in range(directories)
+            )
+    return directory_count, file_count
+
+
+def written_bytes():
+    """
+    Liefert die Bytes, die dieser Prozess bisher an write() übergeben hat (Linux).
+    """
+    try:
+        with open("/proc/self/io", encoding="ascii") as f:
+            for line in f:
+                key, value = line.split(":")
+                if key == "wchar":
+                    return int(value)
+    except OSError:
+        pass
+    return None
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def make_config(workdir, name, encoder=None):
+    settings = default_settings()
+    settings["min_size_bytes"] = 1
+    state = StateStore(os.path.join(workdir, f"{name}.db"))
+    return {
+        "settings": settings,
+        "state": state,
+        "encoder": encoder,
+        "metrics": Metrics(state),
+        "scratch": Scratch(),
+    }
+
+
+def benchmark_scan(workdir, args):
+    """
+    Misst find_mkv_files ohne Index, mit vollständigem Index und mit --full-rescan.
+    """
+    root = os.path.join(workdir, "scan")
+    directory_count, file_count = generate_tree(
+        root, args.depth, args.directories, args.files, args.size_mb * 1024 * 1024
+    )
+    config = make_config(workdir, "scan")
+    state = config["state"]
+
+    def record(directory, snapshot):
+        if snapshot:
+            state.record_directory(directory, snapshot)
+
+    results = {"directories": directory_count, "files": file_count}
+    for label, full_rescan in (("cold", False), ("indexed", False), ("full", True)):
+        start = time_module.perf_counter()
+        found = sum(1 for _ in find_mkv_files(root, config, record, full_rescan))
+        elapsed = time_module.perf_counter() - start
+        results[label] = {
+            "seconds": elapsed,
+            "files_per_second": file_count / elapsed if elapsed else None,
+            "found": found,
+        }
+    state.close()
+    return results
+
+
+def benchmark_state_writes(workdir, args):
+    """
+    Misst Latenz und geschriebene Bytes der Zustandsänderungen, die pro Datei bzw.
+    pro Verzeichnis anfallen.
+    """
+    config = make_config(workdir, "writes")
+    state = config["state"]
+    snapshot = {
+        "mtime_ns": 0,
+        "entry_count": args.files,
+        "files": [
+            (f"/bench/dir/file{number}.mkv", 1, 0, number)
+            for number in range(args.files)
+        ],
+    }
+    operations = {
+        "add_history": lambda i: state.add_history(
+            {"path": f"/bench/dir{i}/file.mkv", "outcome": "converted"}
+        ),
+        "add_to_blacklist": lambda i: state.add_to_blacklist(f"/bench/file{i}.mkv"),
+        "set_checkpoint": lambda i: state.set_checkpoint(
+            "/bench", f"/bench/file{i}.mkv", "[]"
+        ),
+        "begin_end_job": lambda i: (
+            state.begin_job(f"/bench/file{i}.mkv", f"/bench/file{i}.mp4"),
+            state.end_job(f"/bench/file{i}.mkv"),
+        ),
+        "record_directory": lambda i: state.record_directory(
+            f"/bench/dir{i}", snapshot
+        ),
+    }
+    results = {}
+    for name, operation in operations.items():
+        latencies = []
+        before = written_bytes()
+        for number in range(args.writes):
+            start = time_module.perf_counter()
+            operation(number)
+            latencies.append(time_module.perf_counter() - start)
+        after = written_bytes()
+        results[name] = {
+            "mean_ms": sum(latencies) / len(latencies) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "bytes_per_op": (
+                (after - before) / args.writes if before is not None else None
+            ),
+        }
+    state.close()
+    return results
+
+
+def benchmark_blacklist(workdir, args):
+    """
+    Misst is_blacklisted bei einer Blacklist mit args.blacklist Einträgen.
+    """
+    config = make_config(workdir, "blacklist")
+    state = config["state"]
+    paths = [
+        f"/bench/Serie {i // 100}/Folge {i % 100}.mkv" for i in range(args.blacklist)
+    ]
+    start = time_module.perf_counter()
+    state.import_legacy_state({"blacklist": paths})
+    import_seconds = time_module.perf_counter() - start
+
+    rng = random.Random(0)
+    lookups = 10_000
+    results = {"entries": args.blacklist, "import_seconds": import_seconds}
+    for label, candidates in (
+        ("hit", [rng.choice(paths) for _ in range(lookups)] if paths else []),
+        ("miss", [f"/bench/fehlt/{i}.mkv" for i in range(lookups)]),
+    ):
+        if not candidates:
+            continue
+        start = time_module.perf_counter()
+        for path in candidates:
+            state.is_blacklisted(path)
+        elapsed = time_module.perf_counter() - start
+        results[f"{label}_us"] = elapsed / len(candidates) * 1_000_000
+    state.close()
+    return results
+
+
+def benchmark_pipeline(workdir, args):
+    """
+    Lässt den gesamten Ablauf von Main.run mit dem Stub-Encoder laufen.
+    """
+    root = os.path.join(workdir, "pipeline")
+    per_directory = max(1, min(args.files, args.jobs))
+    directories = -(-args.jobs // per_directory)
+    for number in range(directories):
+        count = min(per_directory, args.jobs - number * per_directory)
+        generate_tree(
+            os.path.join(root, f"Serie {number:03d}"),
+            0,
+            0,
+            count,
+            args.size_mb * 1024 * 1024,
+        )
+    config = make_config(workdir, "pipeline", StubEncoder(args.sleep, args.ratio))
+    config["settings"]["cpus_per_worker"] = 1
+    start = time_module.perf_counter()
+    run(config, [root], args.workers)
+    elapsed = time_module.perf_counter() - start
+    statistics = config["state"].get_statistics()
+    config["state"].close()
+    ideal = args.jobs * args.sleep / args.workers
+    return {
+        "jobs": args.jobs,
+        "workers": args.workers,
+        "seconds": elapsed,
+        "jobs_per_hour": args.jobs / elapsed * 3600 if elapsed else None,
+        "efficiency_percent": ideal / elapsed * 100 if elapsed else None,
+        "overhead_per_job_seconds": (elapsed * args.workers - args.jobs * args.sleep)
+        / args.jobs,
+        "files_converted": statistics["total_files_converted"],
+    }
+
+
+def report(results):
+    scan = results["scan"]
+    print(
+        f"📂 Bibliothek: {scan['directories']} Verzeichnisse, {scan['files']} Dateien"
+    )
+    for label in ("cold", "indexed", "full"):
+        print(
+            f"🔎 Scan {label}: {scan[label]['files_per_second']:.0f} Dateien/s "
+            f"({scan[label]['seconds']:.3f} s, {scan[label]['found']} gefunden)"
+        )
+    for name, values in results["state_writes"].items():
+        bytes_per_op = values["bytes_per_op"]
+        print(
+            f"💾 {name}: {values['mean_ms']:.3f} ms (p95 {values['p95_ms']:.3f} ms)"
+            + (f", {bytes_per_op:.0f} Bytes" if bytes_per_op is not None else "")
+        )
+    blacklist = results["blacklist"]
+    print(
+        f"🚫 Blacklist mit {blacklist['entries']} Einträgen: "
+        f"Treffer {blacklist.get('hit_us', 0):.1f} µs, kein Treffer {blacklist['miss_us']:.1f} µs"
+    )
+    pipeline = results["pipeline"]
+    print(
+        f"🏭 Durchlauf: {pipeline['jobs']} Dateien mit {pipeline['workers']} Workern in "
+        f"{pipeline['seconds']:.2f} s, {pipeline['jobs_per_hour']:.0f} Dateien/Stunde, "
+        f"Effizienz {pipeline['efficiency_percent']:.1f}%, "
+        f"Overhead {pipeline['overhead_per_job_seconds'] * 1000:.0f} ms pro Datei"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ShrinkBot Benchmark")
+    parser.add_argument("--depth", type=int, default=2, help="Tiefe der Bibliothek")
+    parser.add_argument(
+        "--directories", type=int, default=10, help="Unterverzeichnisse pro Ebene"
+    )
+    parser.add_argument(
+        "--files", type=int, default=20, help="MKV-Dateien pro Verzeichnis"
+    )
+    parser.add_argument(
+        "--size-mb", type=int, default=600, help="Größe der Sparse-Dateien in MB"
+    )
+    parser.add_argument(
+        "--blacklist", type=int, default=100_000, help="Einträge in der Blacklist"
+    )
+    parser.add_argument(
+        "--writes", type=int, default=1000, help="Zustandsänderungen pro Messung"
+    )
+    parser.add_argument("--jobs", type=int, default=40, help="Dateien im Durchlauf")
+    parser.add_argument("--workers", type=int, default=4, help="Parallele Worker")
+    parser.add_argument(
+        "--sleep", type=float, default=0.2, help="Dauer einer Stub-Konvertierung"
+    )
+    parser.add_argument(
+        "--ratio", type=float, default=0.5, help="Ausgabegröße relativ zur Quelle"
+    )
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    parser.add_argument("--keep", help="Arbeitsverzeichnis verwenden und behalten")
+    args = parser.parse_args()
+
+    workdir = args.keep or tempfile.mkdtemp(prefix="shrinkbot-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    setup_logging("%H:%M:%S", os.path.join(workdir, "benchmark.log"), console=False)
+    try:
+        results = {
+            "scan": benchmark_scan(workdir, args),
+            "state_writes": benchmark_state_writes(workdir, args),
+            "blacklist": benchmark_blacklist(workdir, args),
+            "pipeline": benchmark_pipeline(workdir, args),
+        }
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
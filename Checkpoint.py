@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+from collections import deque
+from Logger import log, warning
+
+
+def position_key(root, path, is_directory=False):
+    """
+    Berechnet die Position eines Pfads in der Durchlaufreihenfolge von find_mkv_files:
+    In jedem Verzeichnis zuerst die Dateien, dann die Unterverzeichnisse, jeweils nach Namen sortiert.
+    Positionen lassen sich als Tupel direkt vergleichen.
+
+    Args:
+        root (str): Das Startverzeichnis.
+        path (str): Der Pfad einer Datei oder eines Verzeichnisses unterhalb von root.
+        is_directory (bool): True, wenn path ein Verzeichnis ist.
+
+    Returns:
+        tuple: Die Position.
+    """
+    relative = os.path.relpath(path, root)
+    parts = [] if relative == "." else relative.split(os.sep)
+    if is_directory:
+        return tuple((1, part) for part in parts)
+    return tuple((1, part) for part in parts[:-1]) + ((0, parts[-1]),)
+
+
+class Checkpoint:
+    """
+    Merkt sich pro Startverzeichnis die letzte Datei, bis zu der alle Dateien in
+    Durchlaufreihenfolge fertig verarbeitet wurden. Da die Reihenfolge sortiert und damit
+    stabil ist, funktioniert das Fortsetzen auch, wenn die Datei inzwischen gelöscht wurde.
+    """
+
+    def __init__(self, state, root):
+        self.state = state
+        self.root = os.path.abspath(root)
+        self._lock = threading.Lock()
+        # Registrierte Dateien in Durchlaufreihenfolge: [Pfad, fertig]
+        self._queue = deque()
+        self._entries = {}
+        self.position = self._load()
+
+    def _load(self):
+        checkpoint = self.state.get_checkpoint(self.root)
+        if checkpoint:
+            path, position = checkpoint
+            # Nach einer erfolgreichen Konvertierung existiert nur noch die MP4-Datei
+            converted_path = f"{os.path.splitext(path)[0]}.mp4"
+            if os.path.exists(path) or os.path.exists(converted_path):
+                log(f"⏯️ Fortsetzen nach: {path}")
+            else:
+                warning(
+                    f"⚠️ Checkpoint {path} existiert nicht mehr. Fortsetzen an seiner Sortierposition."
+                )
+            return tuple(tuple(part) for part in json.loads(position))
+
+        # Übernimm den verzeichnisbasierten last_path älterer Versionen
+        last_path = self.state.get_last_path()
+        if not last_path:
+            return None
+        self.state.set_last_path(None)
+        last_path = os.path.abspath(last_path)
+        if (
+            not os.path.isdir(last_path)
+            or os.path.commonpath([self.root, last_path]) != self.root
+        ):
+            warning(f"⚠️ Veralteter Fortsetzungspunkt {last_path} wird verworfen.")
+            return None
+        log(f"⏯️ Fortsetzen ab: {last_path}")
+        position = position_key(self.root, last_path, is_directory=True)
+        self.state.set_checkpoint(self.root, last_path, json.dumps(position))
+        return position
+
+    def is_done(self, position):
+        """
+        Prüft, ob eine Datei an dieser Position bereits verarbeitet wurde.
+        """
+        return self.position is not None and position <= self.position
+
+    def is_directory_done(self, position):
+        """
+        Prüft, ob alle Dateien eines Verzeichnisses bereits verarbeitet wurden.
+        """
+        return (
+            self.position is not None
+            and position < self.position
+            and self.position[: len(position)] != position
+        )
+
+    def register(self, path):
+        """
+        Meldet eine Datei an, die in Durchlaufreihenfolge verarbeitet wird.
+        """
+        with self._lock:
+            entry = [path, False]
+            self._queue.append(entry)
+            self._entries[path] = entry
+
+    def complete(self, path, succeeded=True):
+        """
+        Markiert eine Datei als verarbeitet und rückt den Checkpoint vor,
+        sobald alle vorherigen Dateien ebenfalls fertig sind.
+        Eine fehlgeschlagene (z.B. abgebrochene) Datei hält den Checkpoint für den
+        Rest des Durchlaufs an, damit sie beim Fortsetzen erneut versucht wird.
+        """
+        with self._lock:
+            entry = self._entries.pop(path)
+            if not succeeded:
+                return
+            entry[1] = True
+            last = None
+            while self._queue and self._queue[0][1]:
+                last = self._queue.popleft()[0]
+            if last:
+                self.position = position_key(self.root, last)
+                self.state.set_checkpoint(self.root, last, json.dumps(self.position))
+
+    def clear(self):
+        """
+        Entfernt den Checkpoint nach einem vollständigen Durchlauf.
+        """
+        with self._lock:
+            self.position = None
+            self.state.clear_checkpoint(self.root)
+
+
+class CheckpointSet:
+    """
+    Die Checkpoints mehrerer Startverzeichnisse. Dateien werden beim Anmelden dem
+    Checkpoint ihres Startverzeichnisses zugeordnet; die Reihenfolge muss nur innerhalb
+    eines Startverzeichnisses stimmen.
+    """
+
+    def __init__(self, state, roots):
+        self._checkpoints = {
+            os.path.abspath(root): Checkpoint(state, root) for root in roots
+        }
+        self._lock = threading.Lock()
+        self._owners = {}
+
+    def for_root(self, root):
+        return self._checkpoints[os.path.abspath(root)]
+
+    def _owner(self, path):
+        return next(
+            checkpoint
+            for root, checkpoint in self._checkpoints.items()
+            if os.path.commonpath([root, path]) == root
+        )
+
+    def register(self, path):
+        checkpoint = self._owner(path)
+        with self._lock:
+            self._owners[path] = checkpoint
+        checkpoint.register(path)
+
+    def complete(self, path, succeeded=True):
+        with self._lock:
+            checkpoint = self._owners.pop(path)
+        checkpoint.complete(path, succeeded)
+
+    def clear(self):
+        for checkpoint in self._checkpoints.values():
+            checkpoint.clear()
@@ -1,108 +1,175 @@
+import copy
 import json
 import os
-from Logger import log, setup_logging
+from Encoder import (
+    DEFAULT_DOCKER_IMAGE,
+    DEFAULT_ENCODER,
+    DEFAULT_FFMPEG_PATH,
+    DEFAULT_FFPROBE_PATH,
+)
+from JobQueue import DEFAULT_LEASE_SECONDS, DEFAULT_QUEUE_POLL_SECONDS
+from LoadControl import (
+    DEFAULT_LOAD_HOLD_SAMPLES,
+    DEFAULT_LOAD_INTERVAL_SECONDS,
+    DEFAULT_LOAD_MAX_IOWAIT_PERCENT,
+    DEFAULT_LOAD_RESERVE_CPUS,
+)
+from Logger import (
+    DEFAULT_LOG_BACKUP_COUNT,
+    DEFAULT_LOG_LEVEL,
+    DEFAULT_LOG_MAX_BYTES,
+    error,
+    log,
+    setup_logging,
+)
+from Metrics import DEFAULT_METRICS_INTERVAL_SECONDS
+from Profiles import DEFAULT_PROFILES
+from Scan import DEFAULT_SCAN_THREADS
+from Staging import DEFAULT_PREFETCH_BYTES, DEFAULT_SCRATCH_RESERVE_BYTES
+from Segment import (
+    DEFAULT_CPUS_PER_SEGMENT,
+    DEFAULT_SEGMENT_MIN_DURATION_SECONDS,
+    DEFAULT_SEGMENT_SECONDS,
+)
+from Scheduler import DEFAULT_SCHEDULE, DEFAULT_SCHEDULE_QUEUE_SIZE
+from Watch import DEFAULT_WATCH_SETTLE_SECONDS
+from State import StateStore
 
 CONFIG_FILE = "shrinkbot_config.json"
 DEFAULT_MIN_SIZE_BYTES = 500 * 1024 * 1024  # 500 MB
 DEFAULT_TIME_FORMAT = "%d.%m.%Y %H:%M:%S"  # Deutsches Zeitformat
 DEFAULT_LOG_FILE = "shrinkbot.log"  # Name der Logdatei
+DEFAULT_WORKERS = 1  # Anzahl paralleler Konvertierungen
+DEFAULT_CPUS_PER_WORKER = 2  # CPU-Kerne pro Konvertierung
+DEFAULT_STATE_FILE = "shrinkbot_state.db"  # Datenbank für Blacklist und Statistiken
+DEFAULT_MIN_PREDICTED_SAVINGS_PERCENT = 5  # Mindestens erwartete Ersparnis laut ffprobe
+DEFAULT_EARLY_ABORT_MARGIN_PERCENT = (
+    10  # Toleranz, bevor eine wachsende Konvertierung abbricht
+)
+DEFAULT_EARLY_ABORT_MIN_PROGRESS_PERCENT = 5  # Ab diesem Fortschritt wird hochgerechnet
+DEFAULT_PROGRESS_LOG_INTERVAL_SECONDS = (
+    300  # Fortschritt laufender Konvertierungen loggen
+)
 
+# Felder, die frühere Versionen in der JSON-Datei gespeichert haben
+LEGACY_STATE_KEYS = ("last_path", "blacklist", "statistics")
 
-def load_config():
+
+def default_settings():
     """
-    Lädt die Konfiguration aus der JSON-Datei.
-    Falls die Datei nicht existiert oder beschädigt ist, wird eine Standardkonfiguration erstellt.
+    Liefert die Standardeinstellungen.
     """
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                config = json.load(f)
-                # Stelle sicher, dass die erforderlichen Felder existieren
-                if "blacklist" not in config:
-                    config["blacklist"] = []
-                if "statistics" not in config:
-                    config["statistics"] = {
-                        "total_input_mb": 0.0,
-                        "total_savings_mb": 0.0,
-                        "total_files_converted": 0,
-                        "total_conversion_time_seconds": 0.0,
-                        "per_directory_savings_mb": {},
-                    }
-                if "settings" not in config:
-                    config["settings"] = {
-                        "min_size_bytes": DEFAULT_MIN_SIZE_BYTES,
-                        "time_format": DEFAULT_TIME_FORMAT,
-                        "log_file": DEFAULT_LOG_FILE,
-                        "pause_times": [],
-                    }
-                else:
-                    if "pause_times" not in config["settings"]:
-                        config["settings"]["pause_times"] = []
-                # Aktualisiere das Logging basierend auf den Einstellungen
-                setup_logging(
-                    config["settings"].get("time_format", DEFAULT_TIME_FORMAT),
-                    config["settings"].get("log_file", DEFAULT_LOG_FILE),
-                )
-                return config
-        except json.JSONDecodeError:
-            log("😵‍💫 Konfigurationsdatei ist beschädigt. Starte von vorne.")
-            return {
-                "last_path": None,
-                "blacklist": [],
-                "statistics": {
-                    "total_input_mb": 0.0,
-                    "total_savings_mb": 0.0,
-                    "total_files_converted": 0,
-                    "total_conversion_time_seconds": 0.0,
-                    "per_directory_savings_mb": {},
-                },
-                "settings": {
-                    "min_size_bytes": DEFAULT_MIN_SIZE_BYTES,
-                    "time_format": DEFAULT_TIME_FORMAT,
-                    "log_file": DEFAULT_LOG_FILE,
-                    "pause_times": [],
-                },
-            }
-    # Standardkonfiguration, wenn die Datei nicht existiert
     return {
-        "last_path": None,
-        "blacklist": [],
-        "statistics": {
-            "total_input_mb": 0.0,
-            "total_savings_mb": 0.0,
-            "total_files_converted": 0,
-            "total_conversion_time_seconds": 0.0,
-            "per_directory_savings_mb": {},
-        },
-        "settings": {
-            "min_size_bytes": DEFAULT_MIN_SIZE_BYTES,
-            "time_format": DEFAULT_TIME_FORMAT,
-            "log_file": DEFAULT_LOG_FILE,
-            "pause_times": [],
-        },
+        "min_size_bytes": DEFAULT_MIN_SIZE_BYTES,
+        "time_format": DEFAULT_TIME_FORMAT,
+        "log_file": DEFAULT_LOG_FILE,
+        "log_level": DEFAULT_LOG_LEVEL,
+        "log_max_bytes": DEFAULT_LOG_MAX_BYTES,
+        "log_backup_count": DEFAULT_LOG_BACKUP_COUNT,
+        "log_rotate_when": None,
+        "log_json_file": None,
+        "pause_times": [],
+        "workers": DEFAULT_WORKERS,
+        "cpus_per_worker": DEFAULT_CPUS_PER_WORKER,
+        "state_file": DEFAULT_STATE_FILE,
+        "encoder": DEFAULT_ENCODER,
+        "docker_image": DEFAULT_DOCKER_IMAGE,
+        "ffmpeg_path": DEFAULT_FFMPEG_PATH,
+        "ffprobe_path": DEFAULT_FFPROBE_PATH,
+        "probe": True,
+        "remux": True,
+        "profiles": copy.deepcopy(DEFAULT_PROFILES),
+        "min_predicted_savings_percent": DEFAULT_MIN_PREDICTED_SAVINGS_PERCENT,
+        "early_abort": True,
+        "early_abort_margin_percent": DEFAULT_EARLY_ABORT_MARGIN_PERCENT,
+        "early_abort_min_progress_percent": DEFAULT_EARLY_ABORT_MIN_PROGRESS_PERCENT,
+        "progress_log_interval_seconds": DEFAULT_PROGRESS_LOG_INTERVAL_SECONDS,
+        "metrics_file": None,
+        "metrics_interval_seconds": DEFAULT_METRICS_INTERVAL_SECONDS,
+        "schedule": DEFAULT_SCHEDULE,
+        "schedule_queue_size": DEFAULT_SCHEDULE_QUEUE_SIZE,
+        "scratch_dir": None,
+        "scratch_reserve_bytes": DEFAULT_SCRATCH_RESERVE_BYTES,
+        "prefetch_bytes": DEFAULT_PREFETCH_BYTES,
+        "deduplicate": True,
+        "duplicate_mode": "hardlink",
+        "lease_seconds": DEFAULT_LEASE_SECONDS,
+        "queue_poll_seconds": DEFAULT_QUEUE_POLL_SECONDS,
+        "watch_settle_seconds": DEFAULT_WATCH_SETTLE_SECONDS,
+        "segmented_encoding": False,
+        "segment_seconds": DEFAULT_SEGMENT_SECONDS,
+        "segment_min_duration_seconds": DEFAULT_SEGMENT_MIN_DURATION_SECONDS,
+        "cpus_per_segment": DEFAULT_CPUS_PER_SEGMENT,
+        "load_control": False,
+        "load_min_workers": 1,
+        "load_interval_seconds": DEFAULT_LOAD_INTERVAL_SECONDS,
+        "load_hold_samples": DEFAULT_LOAD_HOLD_SAMPLES,
+        "load_reserve_cpus": DEFAULT_LOAD_RESERVE_CPUS,
+        "load_max_iowait_percent": DEFAULT_LOAD_MAX_IOWAIT_PERCENT,
+        "scan_threads": DEFAULT_SCAN_THREADS,
+        "max_jobs_per_device": 0,
     }
 
 
-def save_config(config):
+def load_config(shared=False):
     """
-    Speichert die aktuelle Konfiguration in die JSON-Datei.
+    Lädt die Einstellungen aus der JSON-Datei und öffnet die Zustandsdatenbank.
+    Falls die Datei nicht existiert, wird sie mit Standardwerten angelegt.
+    Blacklist, Statistiken und last_path aus älteren Versionen werden einmalig
+    in die Datenbank übernommen und danach aus der JSON-Datei entfernt.
+
+    Mit shared wird die Datenbank für den Zugriff von mehreren Rechnern geöffnet
+    (verteilter Betrieb).
     """
-    try:
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(config, f, ensure_ascii=False, indent=4)
-    except Exception as e:
-        log(f"❌ Fehler beim Speichern der Konfiguration: {e}")
+    data = {}
+    corrupt = False
+    if os.path.exists(CONFIG_FILE):
+        try:
+            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except json.JSONDecodeError:
+            corrupt = True
+
+    settings = default_settings()
+    settings.update(data.get("settings", {}))
+    # Aktualisiere das Logging basierend auf den Einstellungen
+    setup_logging(
+        settings["time_format"],
+        settings["log_file"],
+        level=settings["log_level"],
+        max_bytes=settings["log_max_bytes"],
+        backup_count=settings["log_backup_count"],
+        rotate_when=settings["log_rotate_when"],
+        json_file=settings["log_json_file"],
+    )
+    if corrupt:
+        log("😵‍💫 Konfigurationsdatei ist beschädigt. Verwende Standardeinstellungen.")
+
+    config = {"settings": settings, "state": StateStore(settings["state_file"], shared)}
+
+    legacy_state = {key: data[key] for key in LEGACY_STATE_KEYS if key in data}
+    if legacy_state:
+        config["state"].import_legacy_state(legacy_state)
+        log(
+            f"📦 Blacklist und Statistiken wurden nach {settings['state_file']} übernommen."
+        )
+    if legacy_state or not os.path.exists(CONFIG_FILE):
+        save_config(config)
+    return config
 
 
-def reset_config(config):
+def save_config(config):
     """
-    Setzt den letzten Pfad zurück, behält aber Blacklist und Statistics bei.
+    Speichert die Einstellungen in die JSON-Datei. Die Datei wird zuerst
+    vollständig geschrieben und dann atomar ersetzt.
     """
+    temp_file = f"{CONFIG_FILE}.tmp"
     try:
-        config["last_path"] = None
-        save_config(config)
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump({"settings": config["settings"]}, f, ensure_ascii=False, indent=4)
+        os.replace(temp_file, CONFIG_FILE)
     except Exception as e:
-        log(f"❌ Fehler beim Zurücksetzen des last_path in der Konfiguration: {e}")
+        error(f"❌ Fehler beim Speichern der Konfiguration: {e}")
 
 
 def reset_statistics(config):
@@ -110,17 +177,10 @@ def reset_statistics(config):
     Setzt die Statistiken zurück.
     """
     try:
-        config["statistics"] = {
-            "total_input_mb": 0.0,
-            "total_savings_mb": 0.0,
-            "total_files_converted": 0,
-            "total_conversion_time_seconds": 0.0,
-            "per_directory_savings_mb": {},
-        }
-        save_config(config)
+        config["state"].reset_statistics()
         log("📊 Statistiken wurden zurückgesetzt.")
     except Exception as e:
-        log(f"❌ Fehler beim Zurücksetzen der Statistiken: {e}")
+        error(f"❌ Fehler beim Zurücksetzen der Statistiken: {e}")
 
 
 def reset_blacklist(config):
@@ -128,8 +188,9 @@ def reset_blacklist(config):
     Setzt die Blacklist zurück.
     """
     try:
-        config["blacklist"] = []
-        save_config(config)
+        config["state"].clear_blacklist()
+        # Der Scan-Index würde sonst ehemals gesperrte Dateien weiter überspringen
+        config["state"].clear_scan_index()
         log("🚫 Blacklist wurde zurückgesetzt.")
     except Exception as e:
-        log(f"❌ Fehler beim Zurücksetzen der Blacklist: {e}")
+        error(f"❌ Fehler beim Zurücksetzen der Blacklist: {e}")
@@ -0,0 +1,351 @@
+import os
+import re
+import shutil
+import signal
+import subprocess
+import threading
+import time as time_module
+from Logger import error, log, warning
+
+DEFAULT_ENCODER = "docker"  # "docker", "docker-exec" oder "ffmpeg"
+DEFAULT_DOCKER_IMAGE = "linuxserver/ffmpeg"
+DEFAULT_FFMPEG_PATH = "ffmpeg"
+DEFAULT_FFPROBE_PATH = "ffprobe"
+
+
+class Encoder:
+    """
+    Basisklasse für die Backends, die ffmpeg ausführen.
+    Alle Pfade in den ffmpeg-Argumenten sind Pfade auf dem Host.
+    Mit start() gestartete Konvertierungen werden bis release() verwaltet und können
+    mit suspend() angehalten und mit resume() fortgesetzt werden. Prozesse mit gleichem
+    job (z.B. die Segmente einer Datei) zählen als eine Konvertierung.
+    """
+
+    def __init__(self):
+        self._processes_lock = threading.Lock()
+        # Laufende Prozesse in Startreihenfolge -> Zeitpunkt des Anhaltens oder None
+        self._processes = {}
+        self._suspended_seconds = {}
+        # Prozess -> Konvertierung, zu der er gehört
+        self._jobs = {}
+
+    def command(self, args, directories, cpuset=None, program="ffmpeg"):
+        """
+        Baut die Befehlszeile für einen ffmpeg-Aufruf.
+
+        Args:
+            args (list): Die ffmpeg-Argumente.
+            directories (list): Verzeichnisse, auf die ffmpeg zugreifen muss.
+            cpuset (str): CPU-Kerne, auf die ffmpeg beschränkt wird (z.B. "0,1").
+            program (str): "ffmpeg" oder "ffprobe".
+
+        Returns:
+            list: Die Befehlszeile.
+        """
+        raise NotImplementedError
+
+    def run(self, args, directories, cpuset=None):
+        """
+        Führt ffmpeg aus und wartet auf das Ende.
+
+        Raises:
+            subprocess.CalledProcessError: Wenn ffmpeg mit einem Fehler endet.
+        """
+        return subprocess.run(
+            self.command(args, directories, cpuset),
+            check=True,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+    def start(self, args, directories, cpuset=None, job=None):
+        """
+        Startet ffmpeg im Hintergrund. stdin bleibt offen, damit die Konvertierung
+        mit stop() beendet werden kann.
+
+        Args:
+            job: Kennung der Konvertierung, wenn sie aus mehreren Prozessen besteht
+                (standardmäßig der Prozess selbst). Ist sie gerade angehalten, wird
+                auch der neue Prozess sofort angehalten.
+
+        Returns:
+            subprocess.Popen: Der laufende Prozess.
+        """
+        process = subprocess.Popen(
+            self.command(args, directories, cpuset),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        with self._processes_lock:
+            job = process if job is None else job
+            suspended = any(
+                self._jobs[other] == job and suspended_at is not None
+                for other, suspended_at in self._processes.items()
+            )
+            self._processes[process] = None
+            self._suspended_seconds[process] = 0.0
+            self._jobs[process] = job
+        if suspended:
+            self.suspend(process)
+        return process
+
+    def release(self, process):
+        """
+        Meldet einen mit start() gestarteten Prozess nach seinem Ende ab.
+
+        Returns:
+            float: Wie viele Sekunden der Prozess insgesamt angehalten war.
+        """
+        with self._processes_lock:
+            suspended_at = self._processes.pop(process, None)
+            seconds = self._suspended_seconds.pop(process, 0.0)
+            self._jobs.pop(process, None)
+        if suspended_at is not None:
+            seconds += time_module.time() - suspended_at
+        return seconds
+
+    def running(self):
+        """
+        Liefert die laufenden Konvertierungen in Startreihenfolge. Eine Konvertierung
+        gilt als angehalten, sobald einer ihrer Prozesse angehalten ist.
+
+        Returns:
+            list: Tupel aus (Liste der Prozesse, angehalten).
+        """
+        jobs = {}
+        with self._processes_lock:
+            for process, suspended_at in self._processes.items():
+                entry = jobs.setdefault(self._jobs[process], [[], False])
+                entry[0].append(process)
+                entry[1] = entry[1] or suspended_at is not None
+        return [tuple(entry) for entry in jobs.values()]
+
+    def suspend(self, process):
+        """
+        Hält eine laufende Konvertierung an, ohne sie abzubrechen.
+        """
+        with self._processes_lock:
+            if process not in self._processes or self._processes[process] is not None:
+                return
+            self._processes[process] = time_module.time()
+        self._send_pause(process, True)
+
+    def resume(self, process):
+        """
+        Setzt eine mit suspend() angehaltene Konvertierung fort.
+        """
+        with self._processes_lock:
+            suspended_at = self._processes.get(process)
+            if suspended_at is None:
+                return
+            self._processes[process] = None
+            self._suspended_seconds[process] += time_module.time() - suspended_at
+        self._send_pause(process, False)
+
+    def _send_pause(self, process, pause):
+        """
+        Hält den Prozess an (pause=True) oder setzt ihn fort. Ohne Container genügen
+        SIGSTOP und SIGCONT; taskset ersetzt sich selbst durch ffmpeg.
+        """
+        try:
+            os.kill(process.pid, signal.SIGSTOP if pause else signal.SIGCONT)
+        except ProcessLookupError:
+            pass
+
+    def stop(self, process, timeout=30):
+        """
+        Beendet eine mit start() gestartete Konvertierung. ffmpeg bekommt wie bei einem
+        Tastendruck ein "q"; das funktioniert auch durch docker run und docker exec hindurch.
+        """
+        # Ein angehaltener Prozess würde das "q" erst nach der Pause lesen
+        self.resume(process)
+        try:
+            process.stdin.write(b"q")
+            process.stdin.flush()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    def probe(self, args, directories):
+        """
+        Führt ffprobe aus und liefert die Ausgabe.
+
+        Raises:
+            subprocess.CalledProcessError: Wenn ffprobe mit einem Fehler endet.
+        """
+        return subprocess.run(
+            self.command(args, directories, program="ffprobe"),
+            check=True,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        ).stdout.decode("utf-8")
+
+    def close(self):
+        """
+        Gibt vom Backend belegte Ressourcen frei.
+        """
+
+
+class FFmpegEncoder(Encoder):
+    """
+    Führt eine lokal installierte ffmpeg-Binary aus. Die CPU-Kerne werden mit taskset
+    festgelegt, sofern es verfügbar ist.
+    """
+
+    def __init__(
+        self, ffmpeg_path=DEFAULT_FFMPEG_PATH, ffprobe_path=DEFAULT_FFPROBE_PATH
+    ):
+        super().__init__()
+        self.paths = {"ffmpeg": ffmpeg_path, "ffprobe": ffprobe_path}
+        self.taskset = shutil.which("taskset")
+        if not self.taskset:
+            warning("⚠️ taskset nicht gefunden. ffmpeg läuft ohne feste CPU-Kerne.")
+
+    def command(self, args, directories, cpuset=None, program="ffmpeg"):
+        command = [self.paths[program], *args]
+        if cpuset and self.taskset:
+            command = [self.taskset, "-c", cpuset, *command]
+        return command
+
+
+class DockerRunEncoder(Encoder):
+    """
+    Startet für jeden Aufruf einen neuen Container. Die benötigten Verzeichnisse
+    werden unter dem gleichen Pfad eingebunden. Jeder Container bekommt einen eigenen
+    Namen, damit er mit docker pause angehalten werden kann.
+    """
+
+    def __init__(self, image=DEFAULT_DOCKER_IMAGE):
+        super().__init__()
+        self.image = image
+        self._counter = 0
+        self._counter_lock = threading.Lock()
+
+    def command(self, args, directories, cpuset=None, program="ffmpeg"):
+        with self._counter_lock:
+            self._counter += 1
+            name = f"shrinkbot-{os.getpid()}-{self._counter}"
+        # -i reicht stdin an ffmpeg weiter, siehe Encoder.stop()
+        command = ["docker", "run", "--rm", "-i", "--name", name]
+        if cpuset:
+            command += ["--cpuset-cpus", cpuset]
+        for directory in sorted(set(directories)):
+            command += ["-v", f"{directory}:{directory}"]
+        if program != "ffmpeg":
+            command += ["--entrypoint", program]
+        return [*command, self.image, *args]
+
+    def _send_pause(self, process, pause):
+        # Der Name steht in der Befehlszeile aus command()
+        name = process.args[process.args.index("--name") + 1]
+        subprocess.run(
+            ["docker", "pause" if pause else "unpause", name],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+
+class DockerExecEncoder(Encoder):
+    """
+    Startet einmalig einen Container, in dem die Startverzeichnisse eingebunden sind,
+    und führt ffmpeg darin mit docker exec aus. Das spart das Erstellen eines
+    Containers pro Datei.
+    """
+
+    def __init__(self, image=DEFAULT_DOCKER_IMAGE, mounts=()):
+        super().__init__()
+        self.image = image
+        self.mounts = sorted({os.path.abspath(mount) for mount in mounts})
+        self.container = f"shrinkbot-{os.getpid()}"
+        self._started = False
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            command = ["docker", "run", "-d", "--rm", "--name", self.container]
+            for mount in self.mounts:
+                command += ["-v", f"{mount}:{mount}"]
+            command += ["--entrypoint", "sleep", self.image, "infinity"]
+            subprocess.run(command, check=True, stdout=subprocess.PIPE)
+            self._started = True
+            log(f"🐳 Container {self.container} gestartet.")
+
+    def command(self, args, directories, cpuset=None, program="ffmpeg"):
+        for directory in directories:
+            directory = os.path.abspath(directory)
+            if not any(
+                os.path.commonpath([mount, directory]) == mount for mount in self.mounts
+            ):
+                raise ValueError(
+                    f"{directory} ist im Container {self.container} nicht eingebunden"
+                )
+        self._start()
+        command = ["docker", "exec", "-i", self.container]
+        if cpuset:
+            command += ["taskset", "-c", cpuset]
+        return [*command, program, *args]
+
+    def _send_pause(self, process, pause):
+        # Die Signale von docker exec erreichen ffmpeg nicht. Der Prozess wird im Container
+        # über seine Ausgabedatei gefunden, die in jeder Befehlszeile eindeutig ist.
+        result = subprocess.run(
+            [
+                "docker",
+                "exec",
+                self.container,
+                "pkill",
+                "-STOP" if pause else "-CONT",
+                "-f",
+                re.escape(process.args[-1]),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        if result.returncode > 1:
+            error(f"❌ Konvertierung im Container {self.container} nicht erreichbar.")
+
+    def close(self):
+        with self._lock:
+            if not self._started:
+                return
+            subprocess.run(
+                ["docker", "rm", "-f", self.container],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            self._started = False
+            log(f"🐳 Container {self.container} beendet.")
+
+
+def create_encoder(settings, mounts):
+    """
+    Erstellt das in den Einstellungen gewählte Backend.
+
+    Args:
+        settings (dict): Die Einstellungen aus der Konfigurationsdatei.
+        mounts (list): Verzeichnisse, die ein dauerhafter Container einbinden muss.
+
+    Returns:
+        Encoder: Das Backend.
+    """
+    encoder = settings.get("encoder", DEFAULT_ENCODER)
+    image = settings.get("docker_image", DEFAULT_DOCKER_IMAGE)
+    if encoder == "ffmpeg":
+        return FFmpegEncoder(
+            settings.get("ffmpeg_path", DEFAULT_FFMPEG_PATH),
+            settings.get("ffprobe_path", DEFAULT_FFPROBE_PATH),
+        )
+    if encoder == "docker-exec":
+        return DockerExecEncoder(image, mounts)
+    if encoder != "docker":
+        error(f"❌ Unbekannter Encoder '{encoder}'. Verwende docker.")
+    return DockerRunEncoder(image)
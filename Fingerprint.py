@@ -0,0 +1,44 @@
+import hashlib
+import os
+
+SAMPLE_COUNT = 16  # Anzahl gleichmäßig verteilter Stichproben
+SAMPLE_SIZE = 64 * 1024  # Bytes pro Stichprobe
+
+
+def compute_fingerprint(file_path):
+    """
+    Berechnet einen günstigen Inhalts-Fingerabdruck: die Größe und ein Hash über
+    SAMPLE_COUNT gleichmäßig verteilte Blöcke (inklusive Anfang und Ende). Es werden
+    höchstens SAMPLE_COUNT * SAMPLE_SIZE Bytes gelesen, unabhängig von der Dateigröße.
+
+    Returns:
+        str: Der Fingerabdruck, z.B. "4294967296:3f2a...".
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        digest.update(size.to_bytes(8, "little"))
+        if size <= SAMPLE_COUNT * SAMPLE_SIZE:
+            digest.update(f.read())
+        else:
+            step = (size - SAMPLE_SIZE) / (SAMPLE_COUNT - 1)
+            for number in range(SAMPLE_COUNT):
+                f.seek(int(number * step))
+                digest.update(f.read(SAMPLE_SIZE))
+    return f"{size}:{digest.hexdigest()}"
+
+
+def fingerprint_file(file_path, state):
+    """
+    Liefert den Fingerabdruck einer Datei. Er wird in der Zustandsdatenbank
+    zwischengespeichert, solange sich Größe und mtime der Datei nicht ändern.
+
+    Raises:
+        OSError: Wenn die Datei nicht gelesen werden kann.
+    """
+    stat = os.stat(file_path)
+    fingerprint = state.get_fingerprint(file_path, stat.st_size, stat.st_mtime_ns)
+    if fingerprint is None:
+        fingerprint = compute_fingerprint(file_path)
+        state.set_fingerprint(file_path, stat.st_size, stat.st_mtime_ns, fingerprint)
+    return fingerprint
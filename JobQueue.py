@@ -0,0 +1,144 @@
+import os
+import socket
+import threading
+from Logger import error, log, warning
+
+DEFAULT_LEASE_SECONDS = 120  # Ohne Heartbeat wird ein Auftrag danach neu vergeben
+DEFAULT_QUEUE_POLL_SECONDS = 10  # Wartezeit, wenn kein Auftrag vorliegt
+MAX_JOB_ATTEMPTS = 3  # Danach gilt ein Auftrag als fehlgeschlagen
+
+
+def default_worker_id():
+    """
+    Liefert eine eindeutige Kennung für diesen Prozess, z.B. "nas-4711".
+    """
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class JobQueue:
+    """
+    Gemeinsame Auftragswarteschlange für den verteilten Betrieb. Sie liegt in der
+    Zustandsdatenbank auf dem gemeinsamen Laufwerk, sodass Statistiken, Blacklist und
+    Fingerabdrücke aller Rechner an einer Stelle verbucht werden.
+
+    Der Koordinator stellt die gefundenen Dateien ein; Worker leihen sich Aufträge aus
+    und verlängern die Leihe regelmäßig (Heartbeat). Stirbt ein Worker, läuft die Leihe
+    ab und der Auftrag wird an einen anderen Worker vergeben.
+    """
+
+    def __init__(
+        self,
+        state,
+        worker_id=None,
+        lease_seconds=DEFAULT_LEASE_SECONDS,
+        max_attempts=MAX_JOB_ATTEMPTS,
+    ):
+        self.state = state
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = max(3, lease_seconds)
+        self.max_attempts = max_attempts
+        self._stop = threading.Event()
+        self._thread = None
+
+    def publish(self, file_path):
+        """
+        Stellt eine Datei in die Warteschlange.
+
+        Returns:
+            bool: True, wenn der Auftrag neu eingestellt wurde.
+        """
+        return self.state.enqueue_job(file_path)
+
+    def open(self):
+        """
+        Markiert die Warteschlange als offen, solange der Koordinator noch sucht.
+        """
+        self.state.set_meta("queue_state", "scanning")
+
+    def close(self):
+        """
+        Markiert die Warteschlange als vollständig; danach kommen keine Aufträge hinzu.
+        """
+        self.state.set_meta("queue_state", "closed")
+
+    def finished(self):
+        """
+        Prüft, ob der Koordinator fertig ist und kein Auftrag mehr offen ist.
+        """
+        if self.state.get_meta("queue_state") != "closed":
+            return False
+        counts = self.state.count_jobs()
+        return counts["queued"] == 0 and counts["leased"] == 0
+
+    def counts(self):
+        return self.state.count_jobs()
+
+    def requeue_expired(self):
+        """
+        Vergibt Aufträge von Workern ohne Heartbeat neu.
+        """
+        requeued, failed = self.state.requeue_expired_jobs(self.max_attempts)
+        for file_path in requeued:
+            log(
+                f"🔁 Worker antwortet nicht mehr. {os.path.basename(file_path)} wird neu vergeben."
+            )
+        for file_path in failed:
+            error(
+                f"❌ {os.path.basename(file_path)} nach {self.max_attempts} Versuchen aufgegeben."
+            )
+
+    def lease(self):
+        """
+        Leiht den nächsten Auftrag aus.
+
+        Returns:
+            str: Der Pfad der MKV-Datei oder None, wenn kein Auftrag wartet.
+        """
+        self.requeue_expired()
+        return self.state.lease_job(self.worker_id, self.lease_seconds)
+
+    def complete(self, file_path, outcome):
+        """
+        Meldet das Ergebnis eines Auftrags (passend für WorkerPool on_finished).
+        """
+        if not self.state.finish_job(file_path, self.worker_id, outcome):
+            warning(
+                f"⚠️ Auftrag für {os.path.basename(file_path)} war bereits neu vergeben."
+            )
+
+    def is_leased(self, file_path):
+        """
+        Prüft, ob gerade ein lebender Worker an der Datei arbeitet.
+        """
+        return self.state.is_job_leased(file_path)
+
+    def start_heartbeat(self):
+        """
+        Verlängert die Leihen dieses Workers regelmäßig in einem eigenen Thread.
+        """
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="ShrinkBot-Heartbeat", daemon=True
+        )
+        self._thread.start()
+
+    def stop_heartbeat(self):
+        """
+        Beendet den Heartbeat und gibt noch gehaltene Aufträge sofort frei.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        released = self.state.release_jobs(self.worker_id)
+        if released:
+            log(f"↩️ {released} Aufträge an die Warteschlange zurückgegeben.")
+
+    def _loop(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                self.state.renew_leases(self.worker_id, self.lease_seconds)
+            except Exception as e:
+                error(f"❌ Heartbeat fehlgeschlagen: {e}")
@@ -0,0 +1,191 @@
+import os
+import threading
+import time as time_module
+from Logger import error, log, warning
+from Pause import enforce_limit
+from Utils import format_number, format_time
+
+DEFAULT_LOAD_INTERVAL_SECONDS = 30  # Abstand der Messungen
+DEFAULT_LOAD_HOLD_SAMPLES = 3  # So viele Messungen in Folge, bevor angepasst wird
+DEFAULT_LOAD_RESERVE_CPUS = 1  # Kerne, die immer für andere Dienste frei bleiben
+DEFAULT_LOAD_MAX_IOWAIT_PERCENT = 20  # Darüber wird nicht weiter hochgeregelt
+
+
+def read_cpu_times():
+    """
+    Liest die aufsummierten CPU-Zeiten aller Kerne aus /proc/stat.
+
+    Returns:
+        tuple: (gesamt, Leerlauf, I/O-Wait) in Ticks.
+    """
+    with open("/proc/stat", encoding="ascii") as f:
+        fields = [int(value) for value in f.readline().split()[1:]]
+    # user nice system idle iowait irq softirq steal (guest ist in user enthalten)
+    return sum(fields[:8]), fields[3], fields[4]
+
+
+def read_load_average():
+    with open("/proc/loadavg", encoding="ascii") as f:
+        return float(f.read().split()[0])
+
+
+def target_workers(
+    sample, active, current, cpus_per_worker, minimum, maximum, reserve, max_iowait
+):
+    """
+    Berechnet aus einer Messung, wie viele Worker laufen sollten.
+
+    Die Last der eigenen Konvertierungen wird herausgerechnet: Jeder laufende
+    ffmpeg-Prozess lastet seine cpus_per_worker Kerne voll aus. Was an Last darüber
+    hinaus bleibt, gehört anderen Diensten; die restlichen Kerne abzüglich reserve
+    stehen ShrinkBot zur Verfügung. Hochgeregelt wird nur, wenn tatsächlich genug Kerne
+    im Leerlauf sind und die Platten nicht schon ausgelastet sind.
+
+    Args:
+        sample (dict): "cpus", "load", "idle_percent" und "iowait_percent".
+        active (int): Anzahl laufender (nicht angehaltener) ffmpeg-Prozesse.
+        current (int): Aktuelle Anzahl Worker.
+
+    Returns:
+        int: Die gewünschte Anzahl Worker.
+    """
+    foreign_load = max(0.0, sample["load"] - active * cpus_per_worker)
+    available = sample["cpus"] - reserve - foreign_load
+    target = int(available // cpus_per_worker)
+    if target > current:
+        idle_cpus = sample["idle_percent"] / 100 * sample["cpus"]
+        if idle_cpus < cpus_per_worker or sample["iowait_percent"] > max_iowait:
+            target = current
+    elif sample["iowait_percent"] > max_iowait:
+        target = min(target, current - 1)
+    return max(minimum, min(target, maximum))
+
+
+class LoadController:
+    """
+    Passt die Anzahl gleichzeitig laufender Konvertierungen an die Auslastung des
+    Rechners an. Sie beginnt mit allen Workern, damit ein Rechner ohne fremde Last nicht
+    erst langsam hochgeregelt werden muss. Alle interval Sekunden werden Load, Leerlauf
+    und I/O-Wait aus /proc gelesen. Zeigen hold Messungen in Folge in dieselbe Richtung, wird um einen Worker
+    hoch- oder heruntergeregelt; überzählige Konvertierungen werden angehalten und laufen
+    weiter, sobald wieder Kapazität frei ist. Jede Anpassung wird geloggt, beim Beenden
+    außerdem die genutzten Worker-Stunden über dem Minimum.
+    """
+
+    def __init__(self, pool, encoder, settings):
+        self.pool = pool
+        self.encoder = encoder
+        self.cpus_per_worker = max(1, settings.get("cpus_per_worker", 2))
+        self.minimum = max(0, min(settings.get("load_min_workers", 1), pool.workers))
+        self.interval = max(
+            1, settings.get("load_interval_seconds", DEFAULT_LOAD_INTERVAL_SECONDS)
+        )
+        self.hold = max(1, settings.get("load_hold_samples", DEFAULT_LOAD_HOLD_SAMPLES))
+        self.reserve = settings.get("load_reserve_cpus", DEFAULT_LOAD_RESERVE_CPUS)
+        self.max_iowait = settings.get(
+            "load_max_iowait_percent", DEFAULT_LOAD_MAX_IOWAIT_PERCENT
+        )
+        # Heruntergeregelt wird erst, wenn die Messungen zu hohe Last zeigen
+        self.workers = pool.workers
+        self._streak = 0
+        self._previous_times = None
+        self._harvested_seconds = 0.0
+        self._started_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        try:
+            self._previous_times = read_cpu_times()
+        except (OSError, ValueError, IndexError) as e:
+            warning(f"⚠️ Lastregelung nicht verfügbar: {e}")
+            return
+        log(
+            f"🎚️ Lastregelung aktiv: {self.minimum} bis {self.pool.workers} Worker, "
+            f"{self.reserve} Kerne bleiben frei."
+        )
+        self._started_at = time_module.monotonic()
+        self._apply(self.workers)
+        self._thread = threading.Thread(
+            target=self._loop, name="ShrinkBot-Load", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        Beendet die Regelung, hebt die Grenze auf und loggt die genutzte Kapazität.
+        """
+        self._stop.set()
+        if self._thread is None:
+            return
+        self._thread.join()
+        self._thread = None
+        self._apply(self.pool.workers)
+        elapsed = time_module.monotonic() - self._started_at
+        log(
+            f"🌾 Lastregelung: {format_number(self._harvested_seconds / 3600)} Worker-Stunden "
+            f"über dem Minimum in {format_time(elapsed)} genutzt."
+        )
+
+    def _apply(self, workers):
+        self.pool.set_limit(workers, "load")
+        enforce_limit(self.pool, self.encoder)
+
+    def sample(self):
+        """
+        Misst die Auslastung seit der letzten Messung.
+
+        Returns:
+            dict: "cpus", "load", "idle_percent" und "iowait_percent".
+        """
+        total, idle, iowait = read_cpu_times()
+        previous_total, previous_idle, previous_iowait = self._previous_times
+        self._previous_times = (total, idle, iowait)
+        elapsed = max(total - previous_total, 1)
+        return {
+            "cpus": os.cpu_count() or 1,
+            "load": read_load_average(),
+            "idle_percent": (idle - previous_idle) / elapsed * 100,
+            "iowait_percent": (iowait - previous_iowait) / elapsed * 100,
+        }
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._harvested_seconds += (self.workers - self.minimum) * self.interval
+            try:
+                sample = self.sample()
+            except (OSError, ValueError, IndexError) as e:
+                error(f"❌ Fehler beim Messen der Auslastung: {e}")
+                continue
+            active = sum(1 for _, suspended in self.encoder.running() if not suspended)
+            target = target_workers(
+                sample,
+                active,
+                self.workers,
+                self.cpus_per_worker,
+                self.minimum,
+                self.pool.workers,
+                self.reserve,
+                self.max_iowait,
+            )
+            self.adjust(target, sample)
+
+    def adjust(self, target, sample):
+        """
+        Regelt nach hold gleichgerichteten Messungen um einen Worker nach.
+        """
+        direction = (target > self.workers) - (target < self.workers)
+        if direction == 0 or (self._streak and (self._streak > 0) != (direction > 0)):
+            self._streak = direction
+        else:
+            self._streak += direction
+        if direction == 0 or abs(self._streak) < self.hold:
+            return
+        self._streak = 0
+        self.workers += direction
+        log(
+            f"{'📈' if direction > 0 else '📉'} Lastregelung: {self.workers} Worker "
+            f"(Load {format_number(sample['load'])}, Leerlauf {format_number(sample['idle_percent'])}%, "
+            f"I/O-Wait {format_number(sample['iowait_percent'])}%)"
+        )
+        self._apply(self.workers)
@@ -1,25 +1,140 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
 import sys
 
+LOGGER_NAME = "ShrinkBot"
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+DEFAULT_LOG_LEVEL = "INFO"
+DEFAULT_LOG_MAX_BYTES = 10 * 1024 * 1024  # Logdatei wird ab dieser Größe rotiert
+DEFAULT_LOG_BACKUP_COUNT = 5  # Anzahl aufbewahrter rotierter Logdateien
 
-def setup_logging(time_format, log_file):
+_logger = logging.getLogger(LOGGER_NAME)
+_logger.propagate = False
+_listener = None
+_options = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formatiert jeden Eintrag als eine Zeile JSON (JSON Lines) für die maschinelle
+    Auswertung.
+    """
+
+    def format(self, record):
+        return json.dumps(
+            {
+                "time": record.created,
+                "level": record.levelname,
+                "thread": record.threadName,
+                "message": record.getMessage(),
+            },
+            ensure_ascii=False,
+        )
+
+
+def _file_handler(log_file, max_bytes, backup_count, rotate_when):
+    if rotate_when:
+        return logging.handlers.TimedRotatingFileHandler(
+            log_file, when=rotate_when, backupCount=backup_count, encoding="utf-8"
+        )
+    return logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+    )
+
+
+def setup_logging(
+    time_format,
+    log_file,
+    console=True,
+    level=DEFAULT_LOG_LEVEL,
+    max_bytes=DEFAULT_LOG_MAX_BYTES,
+    backup_count=DEFAULT_LOG_BACKUP_COUNT,
+    rotate_when=None,
+    json_file=None,
+):
     """
     Konfiguriert das Logging basierend auf den übergebenen Einstellungen.
+    Mit console=False wird nur in die Logdatei geschrieben.
+
+    Aufrufer legen Nachrichten nur in eine Warteschlange; ein Hintergrund-Thread
+    schreibt sie in Logdatei, Konsole und optional json_file. Die Logdateien werden
+    ab max_bytes (0 schaltet das ab) oder mit rotate_when (z.B. "midnight") nach
+    der Zeit rotiert. Ein erneuter Aufruf mit gleichen Einstellungen ändert nichts.
     """
-    logging.getLogger().handlers = []  # Entferne bestehende Handler
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(message)s",
-        datefmt=time_format,
-        handlers=[
-            logging.FileHandler(log_file, encoding="utf-8"),
-            logging.StreamHandler(sys.stdout),
-        ],
+    global _listener, _options
+    options = (
+        time_format,
+        log_file,
+        console,
+        level,
+        max_bytes,
+        backup_count,
+        rotate_when,
+        json_file,
     )
+    if options == _options:
+        return
+    if level not in LOG_LEVELS:
+        level = DEFAULT_LOG_LEVEL
+
+    formatter = logging.Formatter("%(asctime)s - %(message)s", datefmt=time_format)
+    handlers = [_file_handler(log_file, max_bytes, backup_count, rotate_when)]
+    if console:
+        handlers.append(logging.StreamHandler(sys.stdout))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    if json_file:
+        json_handler = _file_handler(json_file, max_bytes, backup_count, rotate_when)
+        json_handler.setFormatter(JsonFormatter())
+        handlers.append(json_handler)
+
+    # Alte Pipeline erst nach dem Leeren ihrer Warteschlange ersetzen
+    shutdown_logging()
+    log_queue = queue.SimpleQueue()
+    _logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    _logger.setLevel(level)
+    _listener = logging.handlers.QueueListener(log_queue, *handlers)
+    _listener.start()
+    _options = options
+
+
+def shutdown_logging():
+    """
+    Schreibt alle noch wartenden Nachrichten und schließt die Logdateien.
+    """
+    global _listener, _options
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    _options = None
+
+
+atexit.register(shutdown_logging)
 
 
 def log(message):
     """
     Loggt eine Nachricht mit dem INFO-Level.
     """
-    logging.info(message)
+    _logger.info(message)
+
+
+def debug(message):
+    """
+    Loggt eine Nachricht mit dem DEBUG-Level, z.B. für jede einzelne Datei beim Durchsuchen.
+    """
+    _logger.debug(message)
+
+
+def warning(message):
+    _logger.warning(message)
+
+
+def error(message):
+    _logger.error(message)
@@ -4,23 +4,264 @@
 import os
 import sys
 import argparse
-from Config import load_config, reset_statistics, reset_blacklist, reset_config
-from Logger import log
-from Processor import find_mkv_files, process_mkv
-from Pause import check_pause_time
-from Statistics import display_directory_savings, display_total_statistics
+import time as time_module
+from Checkpoint import CheckpointSet
+from Config import load_config, reset_statistics, reset_blacklist
+from Encoder import create_encoder
+from JobQueue import DEFAULT_LEASE_SECONDS, DEFAULT_QUEUE_POLL_SECONDS, JobQueue
+from LoadControl import LoadController
+from Logger import debug, error, log
+from Metrics import DEFAULT_METRICS_INTERVAL_SECONDS, Metrics
+from Processor import cleanup_interrupted_jobs
+from Pause import PauseController, PauseSchedule, check_pause_time
+from Plan import write_plan
+from Pool import WorkerPool
+from Report import DEFAULT_REPORT_DEPTH, print_report
+from Scan import DEFAULT_SCAN_THREADS, check_roots, normalize_roots, scan_roots
+from Staging import DEFAULT_PREFETCH_BYTES, DEFAULT_SCRATCH_RESERVE_BYTES, Scratch
+from Scheduler import (
+    DEFAULT_SCHEDULE,
+    DEFAULT_SCHEDULE_QUEUE_SIZE,
+    SCHEDULE_POLICIES,
+    Scheduler,
+)
+from Statistics import display_total_statistics
 from Utils import format_number
+from Watch import DEFAULT_WATCH_SETTLE_SECONDS, Watcher
 
 VERSION = "v241025"
 
 
+def run(
+    config,
+    roots,
+    workers,
+    full_rescan=False,
+    schedule=DEFAULT_SCHEDULE,
+    watcher=None,
+):
+    """
+    Durchsucht die Startpfade roots gleichzeitig und konvertiert die gefundenen Dateien
+    mit dem Worker-Pool. config muss bereits "encoder", "metrics" und "scratch" enthalten.
+    Nach einem vollständigen Durchlauf werden die Checkpoints zurückgesetzt; bei einem
+    Abbruch bleiben sie erhalten.
+
+    Mit watcher läuft ShrinkBot nach dem ersten Durchlauf weiter und konvertiert neue
+    Dateien, sobald der Watcher sie meldet. Dann wird kein Checkpoint verwendet, weil
+    die neuen Dateien nicht in Suchreihenfolge kommen; der Scan-Index hält den ersten
+    Durchlauf nach einem Neustart trotzdem kurz.
+
+    Mit schedule "walk" werden die Dateien in Suchreihenfolge konvertiert. Mit einer
+    anderen Strategie sucht der Scan weiter, solange Worker beschäftigt sind, und freie
+    Worker bekommen jeweils die beste vorgemerkte Datei (siehe Scheduler).
+
+    Raises:
+        KeyboardInterrupt: Wenn der Vorgang unterbrochen wurde.
+        TypeError: Wenn roots ein einzelner Pfad statt einer Liste ist.
+    """
+    check_roots(roots)
+    settings = config["settings"]
+    cleanup_interrupted_jobs(config)
+    checkpoints = None if watcher else CheckpointSet(config["state"], roots)
+    pool = WorkerPool(
+        config,
+        workers,
+        settings.get("cpus_per_worker", 2),
+        checkpoints,
+        max_per_device=settings.get("max_jobs_per_device", 0),
+    )
+    # Pausenzeiten werden einmal eingelesen und auch während der Konvertierungen durchgesetzt
+    pause_schedule = PauseSchedule(settings.get("pause_times"))
+    pause_controller = PauseController(pause_schedule, pool, config["encoder"])
+    pause_controller.start()
+    load_controller = LoadController(pool, config["encoder"], settings)
+    if settings.get("load_control", False):
+        load_controller.start()
+    scheduler = None
+    if schedule != "walk":
+        scheduler = Scheduler(
+            config,
+            schedule,
+            settings.get("schedule_queue_size", DEFAULT_SCHEDULE_QUEUE_SIZE),
+        )
+        log(f"🗂️ Reihenfolge der Konvertierungen: {schedule}")
+
+    def start_next():
+        # Überprüfe vor der Verarbeitung auf Pausenzeiten
+        check_pause_time(pause_schedule, config["state"].get_statistics)
+        pool.wait_for_slot(park=True)
+        pool.start(scheduler.pop())
+
+    try:
+        for kind, value in scan_roots(
+            roots,
+            config,
+            full_rescan,
+            checkpoints,
+            directories=True,
+            on_idle=pool.dispatch,
+            threads=settings.get("scan_threads", DEFAULT_SCAN_THREADS),
+        ):
+            if kind == "directory":
+                pool.directory_scanned(*value)
+                continue
+            mkv_file = value
+            if scheduler is None:
+                # Überprüfe vor der Verarbeitung auf Pausenzeiten
+                check_pause_time(pause_schedule, config["state"].get_statistics)
+
+                # Die nächste Datei vorab lesen, während alle Worker beschäftigt sind
+                if not pool.has_free_slot(park=True):
+                    config["scratch"].prefetch(mkv_file)
+                # Erst weitersuchen, wenn ein Worker frei ist
+                pool.wait_for_slot(park=True)
+                pool.submit(mkv_file)
+                continue
+
+            pool.register(mkv_file)
+            scheduler.push(mkv_file)
+            # Freie Worker sofort beschäftigen; ist die Warteschlange voll, auf einen warten
+            while scheduler and (scheduler.full() or pool.has_free_slot(park=True)):
+                start_next()
+            if scheduler:
+                config["scratch"].prefetch(scheduler.peek())
+
+        while scheduler:
+            start_next()
+
+        if watcher:
+            log(f"👁️ Erster Durchlauf abgeschlossen. Beobachte {', '.join(roots)}.")
+            for mkv_file in watcher:
+                # Auch der erste Durchlauf kann die Datei gefunden haben
+                if pool.is_active(mkv_file):
+                    debug(f"⏭️ {os.path.basename(mkv_file)} wird bereits verarbeitet.")
+                    continue
+                # Überprüfe vor der Verarbeitung auf Pausenzeiten
+                check_pause_time(pause_schedule, config["state"].get_statistics)
+                pool.wait_for_slot()
+                pool.submit(mkv_file)
+                pool.directory_scanned(os.path.dirname(mkv_file), None)
+
+        # Warte auf die noch laufenden Konvertierungen
+        pool.join()
+    except BaseException:
+        pool.shutdown()
+        raise
+    finally:
+        load_controller.stop()
+        pause_controller.stop()
+
+    # Setze die Checkpoints zurück nach erfolgreichem Durchlauf
+    if checkpoints:
+        checkpoints.clear()
+
+
+def run_coordinator(config, roots, full_rescan=False):
+    """
+    Durchsucht die Startpfade roots und stellt die gefundenen Dateien in die gemeinsame
+    Warteschlange, statt sie selbst zu konvertieren. Wartet danach, bis die Worker
+    alle Aufträge abgeschlossen haben, und vergibt Aufträge ausgefallener Worker neu.
+    """
+    settings = config["settings"]
+    job_queue = JobQueue(
+        config["state"],
+        lease_seconds=settings.get("lease_seconds", DEFAULT_LEASE_SECONDS),
+    )
+    poll_seconds = settings.get("queue_poll_seconds", DEFAULT_QUEUE_POLL_SECONDS)
+    cleanup_interrupted_jobs(config, job_queue)
+
+    job_queue.open()
+    published = 0
+    for _, mkv_file in scan_roots(
+        roots,
+        config,
+        full_rescan,
+        threads=settings.get("scan_threads", DEFAULT_SCAN_THREADS),
+    ):
+        if job_queue.publish(mkv_file):
+            published += 1
+    job_queue.close()
+    log(f"📬 {published} Aufträge eingestellt. Warte auf die Worker.")
+
+    last_counts = None
+    while True:
+        job_queue.requeue_expired()
+        counts = job_queue.counts()
+        if counts["queued"] == 0 and counts["leased"] == 0:
+            break
+        if counts != last_counts:
+            log(
+                f"📮 {counts['queued']} wartend, {counts['leased']} in Arbeit, "
+                f"{counts['done']} erledigt, {counts['failed']} fehlgeschlagen"
+            )
+            last_counts = counts
+        time_module.sleep(poll_seconds)
+
+
+def run_worker(config, workers, worker_id=None):
+    """
+    Leiht sich Aufträge aus der gemeinsamen Warteschlange und konvertiert sie mit dem
+    Worker-Pool. Endet, sobald der Koordinator fertig ist und kein Auftrag mehr offen ist.
+
+    Raises:
+        KeyboardInterrupt: Wenn der Vorgang unterbrochen wurde.
+    """
+    settings = config["settings"]
+    job_queue = JobQueue(
+        config["state"],
+        worker_id,
+        settings.get("lease_seconds", DEFAULT_LEASE_SECONDS),
+    )
+    poll_seconds = settings.get("queue_poll_seconds", DEFAULT_QUEUE_POLL_SECONDS)
+    log(f"🛰️ Worker {job_queue.worker_id} wartet auf Aufträge.")
+    cleanup_interrupted_jobs(config, job_queue)
+    pool = WorkerPool(
+        config,
+        workers,
+        settings.get("cpus_per_worker", 2),
+        on_finished=job_queue.complete,
+        max_per_device=settings.get("max_jobs_per_device", 0),
+    )
+    pause_schedule = PauseSchedule(settings.get("pause_times"))
+    pause_controller = PauseController(pause_schedule, pool, config["encoder"])
+    pause_controller.start()
+    load_controller = LoadController(pool, config["encoder"], settings)
+    if settings.get("load_control", False):
+        load_controller.start()
+    job_queue.start_heartbeat()
+    try:
+        while True:
+            # Überprüfe vor der Verarbeitung auf Pausenzeiten
+            check_pause_time(pause_schedule, config["state"].get_statistics)
+            pool.wait_for_slot()
+            mkv_file = job_queue.lease()
+            if mkv_file is None:
+                if job_queue.finished():
+                    break
+                time_module.sleep(poll_seconds)
+                continue
+            pool.submit(mkv_file)
+            # Verzeichnisse gelten als durchsucht; die Ersparnis wird nach der Datei angezeigt
+            pool.directory_scanned(os.path.dirname(mkv_file), None)
+
+        # Warte auf die noch laufenden Konvertierungen
+        pool.join()
+    except BaseException:
+        pool.shutdown()
+        raise
+    finally:
+        load_controller.stop()
+        pause_controller.stop()
+        job_queue.stop_heartbeat()
+
+
 def main():
     parser = argparse.ArgumentParser(description="ShrinkBot")
     parser.add_argument(
-        "start_path",
-        nargs="?",
-        default=os.getcwd(),
-        help="Startverzeichnis für den ShrinkBot (standardmäßig aktuelles Verzeichnis)",
+        "start_paths",
+        nargs="*",
+        metavar="start_path",
+        help="Startverzeichnisse für den ShrinkBot (standardmäßig aktuelles Verzeichnis)",
     )
     parser.add_argument(
         "--reset-stats",
@@ -32,10 +273,66 @@ def main():
         action="store_true",
         help="Setze die Blacklist zurück",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Anzahl paralleler Konvertierungen (überschreibt settings.workers)",
+    )
+    parser.add_argument(
+        "--full-rescan",
+        action="store_true",
+        help="Ignoriere den Scan-Index und durchsuche alle Verzeichnisse vollständig",
+    )
+    parser.add_argument(
+        "--schedule",
+        choices=SCHEDULE_POLICIES,
+        help="Reihenfolge der Konvertierungen (überschreibt settings.schedule)",
+    )
+    parser.add_argument(
+        "--report",
+        action="store_true",
+        help="Zeige einen Bericht über den Konvertierungsverlauf unterhalb des Startpfads",
+    )
+    parser.add_argument(
+        "--report-depth",
+        type=int,
+        default=DEFAULT_REPORT_DEPTH,
+        help="Verzeichnisebenen für die Gruppierung im Bericht (Standard: 1)",
+    )
+    parser.add_argument(
+        "--plan",
+        metavar="DATEI",
+        help="Nichts konvertieren, sondern Ersparnis und Dauer schätzen und als CSV oder JSON speichern",
+    )
+    parser.add_argument(
+        "--plan-probe",
+        action="store_true",
+        help="Für --plan jede Datei mit ffprobe lesen statt nur gespeicherte Ergebnisse zu verwenden",
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--watch",
+        action="store_true",
+        help="Nach dem ersten Durchlauf weiterlaufen und neue MKV-Dateien per inotify konvertieren",
+    )
+    mode.add_argument(
+        "--coordinator",
+        action="store_true",
+        help="Nur durchsuchen und Aufträge in die gemeinsame Warteschlange stellen",
+    )
+    mode.add_argument(
+        "--worker",
+        action="store_true",
+        help="Aufträge aus der gemeinsamen Warteschlange konvertieren statt selbst zu suchen",
+    )
+    parser.add_argument(
+        "--worker-id",
+        help="Kennung dieses Workers (standardmäßig Rechnername und Prozess-ID)",
+    )
     args = parser.parse_args()
 
-    start_path = args.start_path
-    config = load_config()
+    start_paths = args.start_paths or [os.getcwd()]
+    config = load_config(shared=args.coordinator or args.worker)
 
     # Handhabung der Reset-Parameter
     if args.reset_stats or args.reset_blacklist:
@@ -45,9 +342,33 @@ def main():
             reset_blacklist(config)
         sys.exit(0)
 
-    if not os.path.exists(start_path):
-        log(f"❌ Startpfad existiert nicht: {start_path}")
-        sys.exit(1)
+    if args.report:
+        print_report(config["state"], normalize_roots(start_paths), args.report_depth)
+        sys.exit(0)
+
+    for start_path in start_paths:
+        if not os.path.exists(start_path):
+            error(f"❌ Startpfad existiert nicht: {start_path}")
+            sys.exit(1)
+    roots = normalize_roots(start_paths)
+
+    if args.plan:
+        settings = config["settings"]
+        if args.plan_probe:
+            config["encoder"] = create_encoder(settings, roots)
+        try:
+            write_plan(
+                config,
+                roots,
+                args.plan,
+                max(1, args.workers or settings.get("workers", 1)),
+                args.full_rescan,
+                args.plan_probe,
+            )
+        finally:
+            if "encoder" in config:
+                config["encoder"].close()
+        sys.exit(0)
 
     settings = config.get("settings", {})
     min_size_mb = settings.get("min_size_bytes", 500 * 1024 * 1024) / (1024 * 1024)
@@ -55,35 +376,60 @@ def main():
     log(
         f"🐘 Nur MKV-Dateien größer als {format_number(min_size_mb)} MB werden verarbeitet."
     )
-    log(f"🔎 Durchsuche: {start_path}")
+    if not args.worker:
+        log(f"🔎 Durchsuche: {', '.join(roots)}")
 
-    current_directory = None
+    workers = max(1, args.workers or settings.get("workers", 1))
+    if workers > 1 and not args.coordinator:
+        log(f"👷 {workers} Konvertierungen laufen parallel.")
+    config["scratch"] = Scratch(
+        settings.get("scratch_dir"),
+        settings.get("scratch_reserve_bytes", DEFAULT_SCRATCH_RESERVE_BYTES),
+        settings.get("prefetch_bytes", DEFAULT_PREFETCH_BYTES),
+    )
+    mounts = list(roots)
+    if config["scratch"].directory:
+        mounts.append(config["scratch"].directory)
+    # Der Koordinator konvertiert nicht selbst und braucht keinen Encoder
+    if not args.coordinator:
+        config["encoder"] = create_encoder(settings, mounts)
+    config["metrics"] = Metrics(
+        config["state"],
+        settings.get("metrics_file"),
+        settings.get("metrics_interval_seconds", DEFAULT_METRICS_INTERVAL_SECONDS),
+    )
+    config["metrics"].start()
+    schedule = args.schedule or settings.get("schedule", DEFAULT_SCHEDULE)
+    if schedule not in SCHEDULE_POLICIES:
+        error(f"❌ Unbekannte Reihenfolge '{schedule}'. Verwende {DEFAULT_SCHEDULE}.")
+        schedule = DEFAULT_SCHEDULE
+    watcher = None
     try:
-        for mkv_file in find_mkv_files(start_path, config):
-            # Überprüfe vor der Verarbeitung auf Pausenzeiten
-            check_pause_time(settings, config.get("statistics", {}))
-
-            directory = os.path.dirname(mkv_file)
-            # Überprüfe, ob wir in ein neues Verzeichnis wechseln
-            if current_directory and directory != current_directory:
-                # Zeige die Ersparnis für das vorherige Verzeichnis an
-                display_directory_savings(config, current_directory)
-            current_directory = directory
-
-            process_mkv(mkv_file, config)
-
-        # Nach der Schleife, zeige die Ersparnis für das letzte Verzeichnis an
-        if current_directory:
-            display_directory_savings(config, current_directory)
-
+        if args.watch:
+            # Vor dem ersten Durchlauf, damit währenddessen keine neue Datei verloren geht
+            watcher = Watcher(
+                config,
+                roots,
+                settings.get("watch_settle_seconds", DEFAULT_WATCH_SETTLE_SECONDS),
+            )
+        if args.coordinator:
+            run_coordinator(config, roots, args.full_rescan)
+        elif args.worker:
+            run_worker(config, workers, args.worker_id)
+        else:
+            run(config, roots, workers, args.full_rescan, schedule, watcher)
     except KeyboardInterrupt:
         log("⏸️ Vorgang unterbrochen. Fortschritt gespeichert.")
     except Exception as e:
-        log(f"❌ Ein Fehler ist aufgetreten: {e}")
+        error(f"❌ Ein Fehler ist aufgetreten: {e}")
     else:
         log("✅ Durchsuchen abgeschlossen.")
-        # Setze last_path zurück nach erfolgreichem Durchlauf
-        reset_config(config)
+    finally:
+        config["metrics"].stop()
+        if watcher:
+            watcher.close()
+        if "encoder" in config:
+            config["encoder"].close()
 
     # Zeige die Gesamtstatistiken an
     display_total_statistics(config)
@@ -0,0 +1,179 @@
+import os
+import threading
+import time as time_module
+from Logger import error
+
+DEFAULT_METRICS_INTERVAL_SECONDS = 30  # Wie oft die Metrikdatei geschrieben wird
+
+JOB_METRICS = (
+    ("percent", "shrinkbot_job_progress_percent", "Fortschritt der Konvertierung"),
+    ("fps", "shrinkbot_job_fps", "Kodierte Bilder pro Sekunde"),
+    ("speed", "shrinkbot_job_speed", "Geschwindigkeit als Vielfaches der Echtzeit"),
+    ("eta_seconds", "shrinkbot_job_eta_seconds", "Geschätzte Restdauer"),
+    ("bytes_written", "shrinkbot_job_written_bytes", "Bisher geschriebene Bytes"),
+)
+
+STATISTIC_METRICS = (
+    ("total_input_mb", "shrinkbot_input_megabytes_total", "counter"),
+    ("total_savings_mb", "shrinkbot_savings_megabytes_total", "counter"),
+    ("total_files_converted", "shrinkbot_files_converted_total", "counter"),
+    ("total_files_remuxed", "shrinkbot_files_remuxed_total", "counter"),
+    ("total_files_reused", "shrinkbot_files_reused_total", "counter"),
+    ("total_conversion_time_seconds", "shrinkbot_conversion_seconds_total", "counter"),
+    ("total_remux_time_seconds", "shrinkbot_remux_seconds_total", "counter"),
+    ("total_cpu_seconds", "shrinkbot_cpu_seconds_total", "counter"),
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def throughput(statistics):
+    """
+    Berechnet den Durchsatz aus den Gesamtstatistiken.
+
+    Returns:
+        tuple: (GB Eingabe pro Stunde Laufzeit, MB Ersparnis pro CPU-Stunde);
+            None, solange noch keine Zeit verbucht ist.
+    """
+    hours = (
+        statistics["total_conversion_time_seconds"]
+        + statistics["total_remux_time_seconds"]
+    ) / 3600
+    cpu_hours = statistics["total_cpu_seconds"] / 3600
+    input_gb_per_hour = statistics["total_input_mb"] / 1024 / hours if hours else None
+    savings_per_cpu_hour = (
+        statistics["total_savings_mb"] / cpu_hours if cpu_hours else None
+    )
+    return input_gb_per_hour, savings_per_cpu_hour
+
+
+class Metrics:
+    """
+    Sammelt den Fortschritt der laufenden Konvertierungen und schreibt ihn zusammen mit
+    den Gesamtstatistiken regelmäßig im Textformat von Prometheus in metrics_file
+    (z.B. für den textfile-Collector des node_exporter). Alle Methoden sind threadsicher.
+    """
+
+    def __init__(self, state, path=None, interval=DEFAULT_METRICS_INTERVAL_SECONDS):
+        self.state = state
+        self.path = path
+        self.interval = max(1, interval)
+        self.started_at = time_module.time()
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._outcomes = {}
+        self._input_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Startet das regelmäßige Schreiben, sofern metrics_file gesetzt ist.
+        """
+        if not self.path or self._thread:
+            return
+        self._thread = threading.Thread(
+            target=self._loop, name="ShrinkBot-Metrics", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        Beendet das regelmäßige Schreiben und schreibt die Datei ein letztes Mal.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._jobs.clear()
+        self.write()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def job_started(self, path, input_size, profile):
+        with self._lock:
+            self._jobs[path] = {"input_size": input_size, "profile": profile}
+
+    def job_progress(self, path, summary):
+        with self._lock:
+            if path in self._jobs:
+                self._jobs[path].update(summary)
+
+    def job_finished(self, path, outcome):
+        """
+        Verbucht das Ergebnis einer Datei für diesen Lauf.
+
+        Args:
+            path (str): Der Pfad der MKV-Datei.
+            outcome (str): Das Ergebnis von process_mkv.
+        """
+        with self._lock:
+            job = self._jobs.pop(path, None)
+            self._outcomes[outcome] = self._outcomes.get(outcome, 0) + 1
+            if job and outcome != "failed":
+                self._input_bytes += job["input_size"]
+
+    def render(self):
+        """
+        Erzeugt den Inhalt der Metrikdatei.
+
+        Returns:
+            str: Die Metriken im Textformat von Prometheus.
+        """
+        statistics = self.state.get_statistics()
+        with self._lock:
+            jobs = {path: dict(job) for path, job in self._jobs.items()}
+            outcomes = dict(self._outcomes)
+            input_bytes = self._input_bytes
+        elapsed_hours = (time_module.time() - self.started_at) / 3600
+
+        lines = []
+        for key, name, help_text in JOB_METRICS:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            for path, job in sorted(jobs.items()):
+                if job.get(key) is not None:
+                    labels = (
+                        f'file="{_escape(path)}",profile="{_escape(job["profile"])}"'
+                    )
+                    lines.append(f"{name}{{{labels}}} {job[key]}")
+        lines += [
+            "# TYPE shrinkbot_jobs_running gauge",
+            f"shrinkbot_jobs_running {len(jobs)}",
+            "# TYPE shrinkbot_session_files gauge",
+        ]
+        for outcome, count in sorted(outcomes.items()):
+            lines.append(f'shrinkbot_session_files{{outcome="{outcome}"}} {count}')
+        lines += [
+            "# TYPE shrinkbot_session_input_gigabytes_per_hour gauge",
+            "shrinkbot_session_input_gigabytes_per_hour "
+            f"{input_bytes / 1024**3 / elapsed_hours if elapsed_hours else 0}",
+        ]
+        for key, name, metric_type in STATISTIC_METRICS:
+            lines += [f"# TYPE {name} {metric_type}", f"{name} {statistics[key]}"]
+        input_gb_per_hour, savings_per_cpu_hour = throughput(statistics)
+        lines += [
+            "# TYPE shrinkbot_input_gigabytes_per_hour gauge",
+            f"shrinkbot_input_gigabytes_per_hour {input_gb_per_hour or 0}",
+            "# TYPE shrinkbot_savings_megabytes_per_cpu_hour gauge",
+            f"shrinkbot_savings_megabytes_per_cpu_hour {savings_per_cpu_hour or 0}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """
+        Schreibt die Metrikdatei atomar, damit der Collector nie eine halbe Datei liest.
+        """
+        if not self.path:
+            return
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            error(f"❌ Fehler beim Schreiben der Metriken nach {self.path}: {e}")
@@ -1,68 +1,202 @@
+import threading
 from datetime import datetime, timedelta
-from Logger import log
+from Logger import error, log
 from Utils import format_number, format_time
 import time as time_module
 
 
-def check_pause_time(settings, statistics):
+class PauseWindow:
+    """
+    Ein Pausenzeitraum aus pause_times. Mit "workers" wird nicht ganz pausiert,
+    sondern nur die Anzahl gleichzeitiger Konvertierungen begrenzt.
+    """
+
+    def __init__(self, start, end, workers=0):
+        self.start = start
+        self.end = end
+        self.workers = workers
+        self.label = f"{start.strftime('%H:%M')} - {end.strftime('%H:%M')}"
+
+    def contains(self, now):
+        """
+        Prüft, ob die Uhrzeit now (datetime.time) im Zeitraum liegt.
+        """
+        if self.start < self.end:
+            # Pausenzeit innerhalb eines Tages
+            return self.start <= now < self.end
+        # Pausenzeit über Mitternacht hinweg
+        return now >= self.start or now < self.end
+
+    def next_end(self, now):
+        """
+        Liefert das nächste Ende des Zeitraums nach now (datetime).
+        """
+        return _next_occurrence(self.end, now)
+
+    def next_boundaries(self, now):
+        return _next_occurrence(self.start, now), _next_occurrence(self.end, now)
+
+
+def _next_occurrence(clock_time, now):
+    moment = datetime.combine(now.date(), clock_time)
+    if moment <= now:
+        moment += timedelta(days=1)
+    return moment
+
+
+class PauseSchedule:
+    """
+    Die einmalig eingelesenen Pausenzeiten aus den Einstellungen.
+    """
+
+    def __init__(self, pause_times):
+        self.windows = []
+        for pause in pause_times or []:
+            try:
+                start = datetime.strptime(pause.get("start"), "%H:%M").time()
+                end = datetime.strptime(pause.get("end"), "%H:%M").time()
+                workers = max(0, int(pause.get("workers", 0)))
+            except (TypeError, ValueError):
+                error(f"❌ Ungültiges Zeitformat in Pausenzeit: {pause}")
+                continue  # Überspringe ungültige Pausenzeiten
+            self.windows.append(PauseWindow(start, end, workers))
+
+    def __bool__(self):
+        return bool(self.windows)
+
+    def active(self, now=None):
+        """
+        Liefert die Zeiträume, die zum Zeitpunkt now (datetime) aktiv sind.
+        """
+        now = now or datetime.now()
+        return [window for window in self.windows if window.contains(now.time())]
+
+    def allowed_workers(self, workers, now=None):
+        """
+        Liefert, wie viele Konvertierungen zum Zeitpunkt now gleichzeitig laufen dürfen.
+        """
+        return min([workers] + [window.workers for window in self.active(now)])
+
+    def next_change(self, now=None):
+        """
+        Liefert den nächsten Beginn oder das nächste Ende eines Zeitraums.
+
+        Returns:
+            datetime: Der Zeitpunkt oder None, wenn keine Pausen definiert sind.
+        """
+        now = now or datetime.now()
+        boundaries = [
+            moment for window in self.windows for moment in window.next_boundaries(now)
+        ]
+        return min(boundaries) if boundaries else None
+
+
+def check_pause_time(pause_schedule, get_statistics):
     """
     Überprüft, ob die aktuelle Zeit innerhalb eines Pausenzeitraums liegt.
     Wenn ja, wartet bis der Pausenzeitraum vorbei ist und loggt die Gesamtersparnis und
-    die durchschnittliche Konvertierungszeit pro Datei.
+    die durchschnittliche Konvertierungszeit pro Datei. Zeiträume mit "workers" begrenzen
+    nur die Anzahl der Worker (siehe PauseController) und halten hier nicht an.
 
     Args:
-        settings (dict): Die Einstellungen aus der Konfigurationsdatei.
-        statistics (dict): Die aktuellen Statistiken aus der Konfigurationsdatei.
+        pause_schedule (PauseSchedule): Die Pausenzeiten.
+        get_statistics (callable): Liefert die aktuellen Statistiken, z.B.
+            StateStore.get_statistics. Sie werden aus dem ganzen Verlauf berechnet und
+            deshalb nur bei einer aktiven Pause abgefragt.
     """
-    pause_times = settings.get("pause_times", [])
-    if not pause_times:
-        return  # Keine Pausen definiert
-
-    now = datetime.now().time()
-
-    for pause in pause_times:
-        start_str = pause.get("start")
-        end_str = pause.get("end")
-        try:
-            start_time = datetime.strptime(start_str, "%H:%M").time()
-            end_time = datetime.strptime(end_str, "%H:%M").time()
-        except ValueError:
-            log(f"❌ Ungültiges Zeitformat in Pausenzeit: {pause}")
-            continue  # Überspringe ungültige Pausenzeiten
-
-        if start_time < end_time:
-            # Pausenzeit innerhalb eines Tages
-            if start_time <= now < end_time:
-                wait_until = datetime.combine(datetime.today(), end_time)
-                wait_seconds = (wait_until - datetime.now()).total_seconds()
-                wait_minutes = int(round(wait_seconds / 60))
-                log(f"🏝️ Pausenzeit aktiv: {start_str} - {end_str}")
-                # Logge die aktuellen Statistiken
-                log_current_statistics(statistics)
-                log(f"🕰️ Warte {wait_minutes} Minuten bis zum Ende der Pause.")
-                time_module.sleep(wait_seconds)
-                log("🐿️ Pausenzeit beendet. Weiter geht's...")
-                return  # Nach der Pause weiterarbeiten
-        else:
-            # Pausenzeit über Mitternacht hinweg
-            if now >= start_time or now < end_time:
-                if now >= start_time:
-                    # Pause bis zum Ende der heutigen Pausezeit
-                    wait_until = datetime.combine(
-                        datetime.today() + timedelta(days=1), end_time
-                    )
-                else:
-                    # Pause bis zum Ende der morgigen Pausezeit
-                    wait_until = datetime.combine(datetime.today(), end_time)
-                wait_seconds = (wait_until - datetime.now()).total_seconds()
-                wait_minutes = int(round(wait_seconds / 60))
-                log(f"🏝️ Pausenzeit aktiv: {start_str} - {end_str}")
-                # Logge die aktuellen Statistiken
-                log_current_statistics(statistics)
-                log(f"🕰️ Warte {wait_minutes} Minuten bis zum Ende der Pause.")
-                time_module.sleep(wait_seconds)
-                log("🐿️ Pausenzeit beendet. Weiter geht's...")
-                return  # Nach der Pause weiterarbeiten
+    now = datetime.now()
+    for window in pause_schedule.active(now):
+        if window.workers:
+            continue
+        wait_seconds = (window.next_end(now) - datetime.now()).total_seconds()
+        wait_minutes = int(round(wait_seconds / 60))
+        log(f"🏝️ Pausenzeit aktiv: {window.label}")
+        # Logge die aktuellen Statistiken
+        log_current_statistics(get_statistics())
+        log(f"🕰️ Warte {wait_minutes} Minuten bis zum Ende der Pause.")
+        time_module.sleep(max(wait_seconds, 0))
+        log("🐿️ Pausenzeit beendet. Weiter geht's...")
+        return  # Nach der Pause weiterarbeiten
+
+
+def enforce_limit(pool, encoder):
+    """
+    Hält Konvertierungen über der aktuellen Grenze des Pools an (die zuletzt
+    gestarteten zuerst) und setzt die übrigen fort. Eine Konvertierung in Segmenten
+    wird mit allen ihren Prozessen angehalten bzw. fortgesetzt.
+    """
+    for index, (processes, _) in enumerate(encoder.running()):
+        for process in processes:
+            if index < pool.limit:
+                encoder.resume(process)
+            else:
+                encoder.suspend(process)
+
+
+class PauseController:
+    """
+    Setzt die Pausenzeiten auch während laufender Konvertierungen durch: Ein Hintergrund-Thread
+    begrenzt an jeder Grenze eines Zeitraums die Worker des Pools und hält überzählige
+    Konvertierungen mit dem Encoder an (die zuletzt gestarteten zuerst). Nach der Pause
+    laufen sie an der gleichen Stelle weiter.
+    """
+
+    # Spätestens so oft wird geprüft, ob eine angehaltene Konvertierung nachrücken kann
+    POLL_SECONDS = 10
+
+    def __init__(self, pause_schedule, pool, encoder):
+        self.pause_schedule = pause_schedule
+        self.pool = pool
+        self.encoder = encoder
+        self._stop = threading.Event()
+        self._thread = None
+        self._allowed = pool.workers
+
+    def start(self):
+        if not self.pause_schedule or self._thread:
+            return
+        self.apply()
+        self._thread = threading.Thread(
+            target=self._loop, name="ShrinkBot-Pause", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        Beendet den Thread und setzt alle angehaltenen Konvertierungen fort.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.pool.set_limit(self.pool.workers, "pause")
+        enforce_limit(self.pool, self.encoder)
+
+    def _loop(self):
+        while True:
+            next_change = self.pause_schedule.next_change()
+            timeout = (next_change - datetime.now()).total_seconds()
+            if self._stop.wait(min(max(timeout, 0), self.POLL_SECONDS)):
+                return
+            self.apply()
+
+    def apply(self):
+        """
+        Passt Worker und laufende Konvertierungen an die aktuelle Uhrzeit an.
+        """
+        allowed = self.pause_schedule.allowed_workers(self.pool.workers)
+        if allowed != self._allowed:
+            if allowed == 0:
+                log(
+                    "🏝️ Pausenzeit beginnt. Laufende Konvertierungen werden angehalten."
+                )
+            elif allowed < self.pool.workers:
+                log(f"🐢 Reduzierter Betrieb: {allowed} Worker.")
+            else:
+                log("🐿️ Pausenzeit beendet. Angehaltene Konvertierungen laufen weiter.")
+            self._allowed = allowed
+        self.pool.set_limit(allowed, "pause")
+        enforce_limit(self.pool, self.encoder)
 
 
 def log_current_statistics(statistics):
@@ -0,0 +1,248 @@
+import csv
+import json
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from Logger import log, warning
+from Pause import PauseSchedule
+from Probe import predict_output_size, probe_file
+from Profiles import is_remux, select_profile, target_bitrate
+from Scan import scan_roots
+from Scheduler import calibrate
+from Utils import format_number, format_time
+
+PLAN_FIELDS = (
+    "path",
+    "size_bytes",
+    "codec",
+    "height",
+    "duration_seconds",
+    "profile",
+    "action",
+    "predicted_output_bytes",
+    "predicted_savings_bytes",
+    "predicted_seconds",
+    "basis",
+)
+PROBE_THREADS = 8  # Parallele ffprobe-Aufrufe mit --plan-probe
+PROBE_BATCH_SIZE = 1000  # So viele Dateien werden gleichzeitig vorgemerkt
+MAX_FORECAST_DAYS = 3650  # Danach gilt das Ende als nicht absehbar
+
+
+def cached_probe(file_path, stat, config):
+    """
+    Liefert ein bereits gespeichertes ffprobe-Ergebnis, ohne ffprobe zu starten.
+    """
+    return config["state"].get_probe(file_path, stat.st_size, stat.st_mtime_ns)
+
+
+def forecast_file(file_path, size, info, settings, rates):
+    """
+    Schätzt für eine Datei, was ShrinkBot mit ihr machen würde. Die Entscheidung
+    entspricht preflight: Dateien unter min_predicted_savings_percent werden nur
+    auf die Blacklist gesetzt ("skip").
+
+    Args:
+        info (dict): Die ffprobe-Daten oder None.
+        rates (tuple): Erfahrungswerte aus Scheduler.calibrate.
+
+    Returns:
+        dict: Eine Zeile des Plans mit den Feldern aus PLAN_FIELDS.
+    """
+    encode_seconds_per_mb, remux_seconds_per_mb, savings_ratio = rates
+    profile = select_profile(settings, info)
+    remux = is_remux(profile)
+    size_mb = size / (1024 * 1024)
+
+    predicted_size = None
+    video_bitrate = target_bitrate(profile, info)
+    if info and video_bitrate:
+        predicted_size = predict_output_size(info, video_bitrate)
+    basis = "probe" if predicted_size is not None else "statistics"
+    if predicted_size is None:
+        predicted_size = int(size * (1 - savings_ratio))
+
+    if remux:
+        action = "remux"
+        seconds = size_mb * remux_seconds_per_mb
+    elif (
+        settings.get("probe", True)
+        and basis == "probe"
+        and size > 0
+        and (1 - predicted_size / size) * 100
+        < settings.get("min_predicted_savings_percent", 5)
+    ):
+        action = "skip"
+        seconds = 0.0
+    else:
+        action = "encode"
+        seconds = size_mb * encode_seconds_per_mb
+
+    # Ohne Ersparnis wird die Ausgabe verworfen
+    savings = max(size - predicted_size, 0) if action != "skip" else 0
+    info = info or {}
+    return {
+        "path": file_path,
+        "size_bytes": size,
+        "codec": info.get("codec"),
+        "height": info.get("height"),
+        "duration_seconds": info.get("duration"),
+        "profile": profile.get("name"),
+        "action": action,
+        "predicted_output_bytes": predicted_size,
+        "predicted_savings_bytes": savings,
+        "predicted_seconds": round(seconds, 1),
+        "basis": basis,
+    }
+
+
+def estimate_finish(worker_seconds, workers, pause_schedule, now=None):
+    """
+    Verteilt die geschätzte Arbeit auf die Worker und berücksichtigt dabei die
+    Pausenzeiten (auch solche, die nur die Anzahl der Worker begrenzen).
+
+    Returns:
+        datetime: Voraussichtliches Ende oder None, wenn keines absehbar ist.
+    """
+    now = now or datetime.now()
+    remaining = worker_seconds
+    limit = now + timedelta(days=MAX_FORECAST_DAYS)
+    while remaining > 0:
+        if now >= limit:
+            return None
+        allowed = pause_schedule.allowed_workers(workers, now)
+        next_change = pause_schedule.next_change(now) or limit
+        # Auf volle Sekunden runden, damit Zeiträume sicher verlassen werden
+        span = max((next_change - now).total_seconds(), 1)
+        if allowed > 0 and remaining <= allowed * span:
+            return now + timedelta(seconds=remaining / allowed)
+        remaining -= allowed * span
+        now += timedelta(seconds=span)
+    return now
+
+
+def _candidates(roots, config, full_rescan, probe):
+    """
+    Liefert (Pfad, Größe, ffprobe-Daten) für alle Dateien, die konvertiert würden.
+    Mit probe werden fehlende ffprobe-Daten parallel ermittelt, sonst nur die
+    gespeicherten verwendet.
+    """
+    settings = config["settings"]
+    use_probe = settings.get("probe", True)
+
+    def inspect(file_path):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None  # Inzwischen gelöscht oder verschoben
+        info = None
+        if use_probe:
+            info = cached_probe(file_path, stat, config)
+            if info is None and probe:
+                try:
+                    info = probe_file(file_path, config)
+                except (subprocess.CalledProcessError, ValueError, OSError) as e:
+                    warning(
+                        f"⚠️ ffprobe für {os.path.basename(file_path)} fehlgeschlagen: {e}"
+                    )
+        return file_path, stat.st_size, info
+
+    files = (
+        file_path
+        for _, file_path in scan_roots(roots, config, full_rescan, read_only=True)
+    )
+    if not probe:
+        for file_path in files:
+            candidate = inspect(file_path)
+            if candidate:
+                yield candidate
+        return
+
+    with ThreadPoolExecutor(
+        max_workers=PROBE_THREADS, thread_name_prefix="ShrinkBot-Plan"
+    ) as executor:
+        batch = []
+        for file_path in files:
+            batch.append(file_path)
+            if len(batch) >= PROBE_BATCH_SIZE:
+                yield from filter(None, executor.map(inspect, batch))
+                batch = []
+        yield from filter(None, executor.map(inspect, batch))
+
+
+def write_plan(config, roots, plan_file, workers, full_rescan=False, probe=False):
+    """
+    Erstellt einen Plan für die Startpfade roots, ohne Dateien zu verändern, und schreibt ihn
+    als CSV oder (bei der Endung .json) als JSON nach plan_file. Die Zeilen werden
+    direkt beim Durchsuchen geschrieben, sodass auch sehr große Bibliotheken kaum
+    Speicher brauchen. Zum Schluss wird eine Zusammenfassung mit voraussichtlichem
+    Ende geloggt.
+
+    Returns:
+        dict: Die Zusammenfassung.
+    """
+    settings = config["settings"]
+    rates = calibrate(config["state"].get_statistics())
+    summary = {
+        "files": 0,
+        "encode": 0,
+        "remux": 0,
+        "skip": 0,
+        "input_bytes": 0,
+        "predicted_savings_bytes": 0,
+        "worker_seconds": 0.0,
+        "workers": workers,
+    }
+    as_json = plan_file.lower().endswith(".json")
+    temp_file = f"{plan_file}.tmp"
+    with open(temp_file, "w", encoding="utf-8", newline="") as f:
+        if as_json:
+            f.write('{"files": [\n')
+        else:
+            writer = csv.DictWriter(f, fieldnames=PLAN_FIELDS)
+            writer.writeheader()
+        for file_path, size, info in _candidates(roots, config, full_rescan, probe):
+            row = forecast_file(file_path, size, info, settings, rates)
+            if as_json:
+                if summary["files"]:
+                    f.write(",\n")
+                f.write(json.dumps(row, ensure_ascii=False))
+            else:
+                writer.writerow(row)
+            summary["files"] += 1
+            summary[row["action"]] += 1
+            summary["input_bytes"] += size
+            summary["predicted_savings_bytes"] += row["predicted_savings_bytes"]
+            summary["worker_seconds"] += row["predicted_seconds"]
+
+        pause_schedule = PauseSchedule(settings.get("pause_times", []))
+        finish = estimate_finish(summary["worker_seconds"], workers, pause_schedule)
+        summary["finish"] = finish.isoformat(timespec="minutes") if finish else None
+        if as_json:
+            f.write("\n], ")
+            f.write(f'"summary": {json.dumps(summary)}}}\n')
+    os.replace(temp_file, plan_file)
+
+    savings_mb = summary["predicted_savings_bytes"] / (1024 * 1024)
+    log(
+        f"🗺️ Plan nach {plan_file} geschrieben: {summary['files']} Dateien, "
+        f"{summary['encode']} Konvertierungen, {summary['remux']} Remuxe, "
+        f"{summary['skip']} ohne lohnende Ersparnis."
+    )
+    log(
+        f"💾 Erwartete Ersparnis: {format_number(savings_mb)} MB von "
+        f"{format_number(summary['input_bytes'] / (1024 ** 3))} GB"
+    )
+    log(
+        f"⏱️ Erwartete Rechenzeit: {format_time(summary['worker_seconds'])} "
+        f"({format_number(summary['worker_seconds'] / 3600)} Worker-Stunden)"
+    )
+    if finish:
+        log(
+            f"🏁 Voraussichtlich fertig am {finish.strftime(settings.get('time_format', '%d.%m.%Y %H:%M:%S'))} "
+            f"mit {workers} Workern{' und den Pausenzeiten' if pause_schedule else ''}."
+        )
+    else:
+        warning("⚠️ Mit den Pausenzeiten ist kein Ende absehbar.")
+    return summary
@@ -0,0 +1,340 @@
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from Logger import debug, warning
+from Processor import process_mkv, snapshot_directory
+from Statistics import display_directory_savings
+
+MAX_WAITING_FILES = 10_000  # Dateien, die höchstens auf ein ausgelastetes Gerät warten
+
+
+def build_cpusets(workers, cpus_per_worker):
+    """
+    Teilt die verfügbaren CPU-Kerne in disjunkte Gruppen für die Worker auf.
+    Reichen die Kerne nicht für alle Worker, werden die Gruppen verkleinert und
+    im Notfall mehrfach vergeben.
+
+    Args:
+        workers (int): Anzahl der Worker.
+        cpus_per_worker (int): Gewünschte Anzahl Kerne pro Worker.
+
+    Returns:
+        list: Eine Liste von CPU-Sets im Docker-Format (z.B. "0,1").
+    """
+    try:
+        available = sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        available = list(range(os.cpu_count() or 1))
+
+    if workers * cpus_per_worker > len(available):
+        cpus_per_worker = max(1, len(available) // workers)
+        if workers > len(available):
+            warning(
+                f"⚠️ Nur {len(available)} CPU-Kerne für {workers} Worker verfügbar. Kerne werden geteilt."
+            )
+
+    cpusets = []
+    for worker in range(workers):
+        cpus = [
+            available[(worker * cpus_per_worker + i) % len(available)]
+            for i in range(cpus_per_worker)
+        ]
+        cpusets.append(",".join(str(cpu) for cpu in cpus))
+    return cpusets
+
+
+class WorkerPool:
+    """
+    Führt mehrere Konvertierungen parallel aus. Jeder laufende Auftrag bekommt ein
+    eigenes CPU-Set. Die Ersparnis pro Verzeichnis wird angezeigt, sobald ein Verzeichnis
+    durchsucht und alle seine Dateien fertig sind, und zwar in der Reihenfolge, in der die
+    Verzeichnisse durchsucht wurden. Verzeichnisse ohne fehlgeschlagene Konvertierung werden
+    in den Scan-Index aufgenommen. Fertige Dateien rücken den Checkpoint vor.
+    on_finished wird nach jeder Datei mit Pfad und Ergebnis aufgerufen.
+
+    Mit max_per_device laufen höchstens so viele Konvertierungen gleichzeitig auf
+    demselben Gerät (st_dev, also Platte oder Netzlaufwerk). Weitere Dateien dieses
+    Geräts warten, bis dort eine Konvertierung fertig ist; freie Worker bekommen
+    inzwischen Dateien anderer Geräte. Eine wartende Datei wird gestartet, sobald auf
+    ihrem Gerät eine Konvertierung endet.
+    """
+
+    def __init__(
+        self,
+        config,
+        workers,
+        cpus_per_worker,
+        checkpoint=None,
+        on_finished=None,
+        max_per_device=0,
+    ):
+        self.config = config
+        self.checkpoint = checkpoint
+        self.on_finished = on_finished
+        self.workers = workers
+        self.max_per_device = max(0, max_per_device)
+        # Gerät -> laufende Konvertierungen bzw. wartende Dateien
+        self._device_jobs = {}
+        self._waiting = {}
+        # Kann durch Pausenzeiten oder die Lastregelung gesenkt werden
+        self.limit = workers
+        self._limits = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="ShrinkBot"
+        )
+        self._cpusets = queue.Queue()
+        for cpuset in build_cpusets(workers, cpus_per_worker):
+            self._cpusets.put(cpuset)
+        self._futures = set()
+        self._running = 0
+        # Angemeldete, noch nicht fertige Dateien
+        self._active = set()
+        self._lock = threading.Lock()
+        # Verzeichnis -> Fortschritt, in Suchreihenfolge
+        self._directories = {}
+
+    def submit(self, file_path):
+        """
+        Übergibt eine MKV-Datei an den nächsten freien Worker.
+        """
+        self.register(file_path)
+        self.start(file_path)
+
+    def register(self, file_path):
+        """
+        Meldet eine gefundene Datei an, bevor sie gestartet wird. Muss in
+        Suchreihenfolge aufgerufen werden, damit Checkpoint und Scan-Index erst
+        vorrücken, wenn alle Dateien eines Verzeichnisses fertig sind.
+        """
+        if self.checkpoint:
+            self.checkpoint.register(file_path)
+        with self._lock:
+            self._active.add(file_path)
+            entry = self._directory_entry(os.path.dirname(file_path))
+            entry["pending"] += 1
+            entry["submitted"] = True
+
+    def is_active(self, file_path):
+        """
+        Prüft, ob eine Datei angemeldet und noch nicht fertig ist (wartend oder laufend).
+        """
+        with self._lock:
+            return file_path in self._active
+
+    def start(self, file_path):
+        """
+        Übergibt eine mit register() angemeldete Datei an den nächsten freien Worker.
+        Ist ihr Gerät ausgelastet, wartet sie, bis dort ein Worker fertig ist.
+        """
+        device = self._device(file_path)
+        with self._lock:
+            busy = self._device_busy(device)
+            if busy:
+                self._waiting.setdefault(device, deque()).append(file_path)
+            else:
+                self._launch(file_path, device)
+        if busy:
+            debug(
+                f"💿 {os.path.basename(file_path)} wartet auf einen freien Platz auf dem Gerät."
+            )
+
+    def _device(self, file_path):
+        if not self.max_per_device:
+            return None
+        try:
+            return os.stat(file_path).st_dev
+        except OSError:
+            return None  # Fehler meldet die Konvertierung selbst
+
+    def _device_busy(self, device):
+        return (
+            device is not None
+            and self._device_jobs.get(device, 0) >= self.max_per_device
+        )
+
+    def _launch(self, file_path, device):
+        # Nur mit self._lock aufrufen
+        self._device_jobs[device] = self._device_jobs.get(device, 0) + 1
+        self._running += 1
+        self._futures.add(
+            self._executor.submit(
+                self._run, file_path, os.path.dirname(file_path), device
+            )
+        )
+
+    def _dispatch(self):
+        """
+        Startet wartende Dateien, sobald ihr Gerät und ein Worker frei sind. Die Geräte
+        kommen reihum dran. Nur mit self._lock aufrufen; wird auch aus den Workern
+        aufgerufen, wenn eine Konvertierung endet.
+        """
+        for device in list(self._waiting):
+            if self._running >= self.limit:
+                return
+            if self._device_busy(device):
+                continue
+            files = self._waiting.pop(device)
+            self._launch(files.popleft(), device)
+            if files:
+                # Hinten anstellen, damit die anderen Geräte zuerst drankommen
+                self._waiting[device] = files
+
+    def _waiting_count(self):
+        return sum(len(files) for files in self._waiting.values())
+
+    def _directory_entry(self, directory):
+        return self._directories.setdefault(
+            directory,
+            {
+                "pending": 0,
+                "scanned": False,
+                "submitted": False,
+                "failed": False,
+                "snapshot": None,
+            },
+        )
+
+    def _run(self, file_path, directory, device=None):
+        cpuset = self._cpusets.get()
+        outcome = "failed"
+        try:
+            outcome = process_mkv(file_path, self.config, cpuset)
+            return outcome
+        finally:
+            self._cpusets.put(cpuset)
+            with self._lock:
+                self._device_jobs[device] -= 1
+                self._running -= 1
+                # Nicht erst warten, bis der Aufrufer wieder Dateien einsammelt
+                self._dispatch()
+            self.config["metrics"].job_finished(file_path, outcome)
+            if self.checkpoint:
+                self.checkpoint.complete(file_path, outcome != "failed")
+            if self.on_finished:
+                self.on_finished(file_path, outcome)
+            with self._lock:
+                self._active.discard(file_path)
+                entry = self._directories[directory]
+                entry["pending"] -= 1
+                if outcome == "failed":
+                    entry["failed"] = True
+            self._flush()
+
+    def directory_scanned(self, directory, snapshot):
+        """
+        Markiert ein Verzeichnis als vollständig durchsucht.
+
+        Args:
+            directory (str): Das Verzeichnis.
+            snapshot (dict): Der Scan-Snapshot oder None, wenn es unverändert war.
+        """
+        with self._lock:
+            entry = self._directory_entry(directory)
+            entry["scanned"] = True
+            entry["snapshot"] = snapshot
+        self._flush()
+
+    def _flush(self):
+        finished = []
+        with self._lock:
+            while self._directories:
+                directory, entry = next(iter(self._directories.items()))
+                if entry["pending"] or not entry["scanned"]:
+                    break
+                del self._directories[directory]
+                finished.append((directory, entry))
+        # Datenbankabfragen und Dateisystemzugriffe ohne Lock, damit Worker und Scan nicht warten
+        for directory, entry in finished:
+            if entry["submitted"]:
+                display_directory_savings(self.config, directory)
+            self._index_directory(directory, entry)
+
+    def _index_directory(self, directory, entry):
+        # Fehlgeschlagene Dateien sollen beim nächsten Lauf erneut versucht werden
+        if entry["failed"] or entry["snapshot"] is None:
+            return
+        snapshot = entry["snapshot"]
+        if entry["submitted"]:
+            # Konvertierungen haben das Verzeichnis verändert
+            try:
+                snapshot = snapshot_directory(directory)
+            except OSError:
+                return
+        self.config["state"].record_directory(directory, snapshot)
+
+    def has_free_slot(self, park=False):
+        """
+        Prüft ohne zu blockieren, ob ein Worker frei ist (siehe wait_for_slot).
+        """
+        self._collect(FIRST_COMPLETED, timeout=0)
+        return self._has_room(park)
+
+    def _has_room(self, park=False):
+        with self._lock:
+            if self._running >= self.limit:
+                return False
+            if park:
+                # Der Scan läuft weiter, solange Dateien anderer Geräte nachrücken können
+                return self._waiting_count() < MAX_WAITING_FILES
+            return not self._waiting
+
+    def set_limit(self, limit, source="pause"):
+        """
+        Begrenzt die Anzahl gleichzeitig gestarteter Dateien (höchstens workers).
+        Jede Quelle ("pause", "load") setzt ihre eigene Grenze; es gilt die kleinste.
+        """
+        with self._lock:
+            self._limits[source] = max(0, min(limit, self.workers))
+            self.limit = min(self._limits.values())
+            self._dispatch()
+
+    def wait_for_slot(self, park=False):
+        """
+        Blockiert, bis mindestens ein Worker frei ist und keine Datei auf ein Gerät
+        wartet. Mit park darf weitergesucht werden, solange Dateien auf ein
+        ausgelastetes Gerät warten, damit Dateien anderer Geräte die freien Worker
+        bekommen. Wer Dateien verbindlich übernimmt (Leases, Watcher), nimmt keine
+        weiteren an, solange welche warten.
+        Fehler aus den Workern werden hier weitergereicht.
+        """
+        while not self._has_room(park):
+            # Mit Zeitlimit, damit ein wieder angehobenes limit bemerkt wird
+            self._collect(FIRST_COMPLETED, timeout=1)
+
+    def dispatch(self):
+        """
+        Sammelt fertige Dateien ein und startet wartende, ohne zu blockieren.
+        """
+        self._collect(FIRST_COMPLETED, timeout=0)
+
+    def join(self):
+        """
+        Wartet, bis alle übergebenen Dateien verarbeitet wurden.
+        """
+        while True:
+            with self._lock:
+                if not self._futures and not self._waiting:
+                    break
+            # Mit Zeitlimit, damit nachgerückte wartende Dateien mitgezählt werden
+            self._collect(FIRST_COMPLETED, timeout=1)
+        self._executor.shutdown()
+
+    def shutdown(self):
+        """
+        Verwirft noch nicht gestartete Aufträge, z.B. nach einer Unterbrechung.
+        """
+        with self._lock:
+            self._waiting.clear()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _collect(self, return_when, timeout=None):
+        with self._lock:
+            futures = set(self._futures)
+        done, _ = wait(futures, timeout, return_when)
+        with self._lock:
+            self._futures -= done
+            self._dispatch()
+        for future in done:
+            future.result()
@@ -0,0 +1,126 @@
+import json
+import os
+
+TARGET_VIDEO_BITRATE = 4_000_000  # Entspricht dem Profil "1080p"
+CONTAINER_OVERHEAD = 0.01  # Zuschlag für den MP4-Container
+
+
+def _bitrate(stream):
+    """
+    Liest die Bitrate eines Streams. MKV-Dateien speichern sie oft nur als Tag.
+    """
+    value = stream.get("bit_rate")
+    if value is None:
+        tags = stream.get("tags", {})
+        value = tags.get("BPS") or tags.get("BPS-eng")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _frame_rate(value):
+    try:
+        numerator, denominator = value.split("/")
+        return int(numerator) / int(denominator) if int(denominator) else None
+    except (AttributeError, ValueError):
+        return None
+
+
+def parse_probe(data):
+    """
+    Wertet die JSON-Ausgabe von ffprobe aus.
+
+    Args:
+        data (dict): Die Ausgabe von "ffprobe -show_format -show_streams".
+
+    Returns:
+        dict: Codec, Auflösung, Bildrate, Bitraten (Bit/s) und Dauer (Sekunden).
+    """
+    streams = data.get("streams", [])
+    video = next(
+        (
+            stream
+            for stream in streams
+            if stream.get("codec_type") == "video"
+            and not stream.get("disposition", {}).get("attached_pic")
+        ),
+        {},
+    )
+    audio_streams = [
+        stream for stream in streams if stream.get("codec_type") == "audio"
+    ]
+    audio_bitrate = sum(_bitrate(stream) or 0 for stream in audio_streams)
+
+    format_info = data.get("format", {})
+    try:
+        duration = float(format_info.get("duration") or video.get("duration") or 0)
+    except ValueError:
+        duration = 0.0
+    try:
+        total_bitrate = int(format_info.get("bit_rate") or 0)
+    except ValueError:
+        total_bitrate = 0
+
+    video_bitrate = _bitrate(video)
+    if video_bitrate is None and total_bitrate:
+        # Ohne Angabe im Stream bleibt die Gesamtbitrate abzüglich Audio
+        video_bitrate = max(total_bitrate - audio_bitrate, 0)
+
+    return {
+        "codec": video.get("codec_name"),
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "fps": _frame_rate(video.get("avg_frame_rate") or video.get("r_frame_rate")),
+        "video_bitrate": video_bitrate,
+        "audio_bitrate": audio_bitrate,
+        "bitrate": total_bitrate,
+        "duration": duration,
+    }
+
+
+def probe_file(file_path, config):
+    """
+    Liest Container- und Streamdaten einer Datei mit ffprobe. Das Ergebnis wird
+    in der Zustandsdatenbank zwischengespeichert, solange sich Größe und mtime
+    der Datei nicht ändern.
+
+    Raises:
+        subprocess.CalledProcessError: Wenn ffprobe mit einem Fehler endet.
+        ValueError: Wenn die Ausgabe von ffprobe nicht gelesen werden kann.
+    """
+    state = config["state"]
+    stat = os.stat(file_path)
+    info = state.get_probe(file_path, stat.st_size, stat.st_mtime_ns)
+    if info is not None:
+        return info
+
+    output = config["encoder"].probe(
+        [
+            "-v",
+            "error",
+            "-print_format",
+            "json",
+            "-show_format",
+            "-show_streams",
+            file_path,
+        ],
+        [os.path.dirname(file_path)],
+    )
+    info = parse_probe(json.loads(output))
+    state.set_probe(file_path, stat.st_size, stat.st_mtime_ns, info)
+    return info
+
+
+def predict_output_size(info, video_bitrate=TARGET_VIDEO_BITRATE):
+    """
+    Schätzt die Größe der MP4-Datei aus der Dauer, der Ziel-Bitrate für Video
+    und dem unverändert kopierten Audio.
+
+    Returns:
+        int: Die geschätzte Größe in Bytes oder None, wenn die Dauer unbekannt ist.
+    """
+    if not info.get("duration"):
+        return None
+    bits = info["duration"] * (video_bitrate + (info.get("audio_bitrate") or 0))
+    return int(bits / 8 * (1 + CONTAINER_OVERHEAD))
@@ -1,81 +1,378 @@
 import os
+import shutil
 import subprocess
-from Logger import log
-from Config import save_config
-from Statistics import update_statistics
-from Utils import format_number
+from Checkpoint import position_key
+from Fingerprint import fingerprint_file
+from Logger import debug, error, log, warning
+from Probe import predict_output_size, probe_file
+from Profiles import is_remux, select_profile, target_bitrate, video_args
+from Segment import (
+    encode_segmented,
+    is_segment_directory,
+    segment_directory,
+    use_segments,
+)
+from Progress import (
+    progress_summary,
+    progress_value,
+    projected_size,
+    run_with_progress,
+)
+from Staging import partial_path
+from Utils import format_number, format_time
 import time as time_module  # Importiert für die Zeitmessung und Sleep
 
 
-def find_mkv_files(start_path, config):
+def snapshot_directory(path, entries=None, mtime_ns=None):
+    """
+    Erstellt einen Eintrag für den Scan-Index: mtime und Anzahl der Einträge des Verzeichnisses
+    sowie Größe, mtime und Inode jeder MKV-Datei. Die Stat-Daten von os.scandir werden
+    wiederverwendet.
+
+    Args:
+        path (str): Das Verzeichnis.
+        entries (list): Bereits gelesene os.DirEntry-Objekte (optional).
+        mtime_ns (int): Bereits gelesene mtime des Verzeichnisses (optional).
+
+    Returns:
+        dict: Der Snapshot.
+    """
+    if entries is None:
+        with os.scandir(path) as iterator:
+            entries = list(iterator)
+    files = []
+    for entry in entries:
+        if entry.name.lower().endswith(".mkv") and entry.is_file():
+            try:
+                stat = entry.stat()
+            except OSError as e:
+                error(f"❌ Fehler beim Zugriff auf {entry.path}: {e}")
+                continue
+            files.append((entry.path, stat.st_size, stat.st_mtime_ns, stat.st_ino))
+    if mtime_ns is None:
+        mtime_ns = os.stat(path).st_mtime_ns
+    return {
+        "mtime_ns": mtime_ns,
+        "entry_count": len(entries),
+        "files": files,
+    }
+
+
+def large_enough(size, settings):
+    """
+    Prüft, ob eine Datei größer als min_size_bytes ist. Scan und Watcher verwenden
+    dieselbe Grenze.
+    """
+    return size > settings.get("min_size_bytes", 500 * 1024 * 1024)
+
+
+def min_size_changed(config, read_only=False):
+    """
+    Prüft, ob sich min_size_bytes seit dem letzten Durchlauf geändert hat, und merkt sich
+    den aktuellen Wert (außer mit read_only). Eine geänderte Mindestgröße macht alle
+    Entscheidungen im Scan-Index ungültig. Muss vor dem Durchsuchen aller Startpfade
+    einmal aufgerufen werden.
+
+    Returns:
+        bool: True, wenn alle Verzeichnisse neu durchsucht werden müssen.
+    """
+    state = config["state"]
+    min_size_bytes = config.get("settings", {}).get("min_size_bytes", 500 * 1024 * 1024)
+    indexed_min_size = state.get_meta("scan_min_size_bytes")
+    changed = indexed_min_size is not None and indexed_min_size != str(min_size_bytes)
+    if changed:
+        log(
+            "🔁 min_size_bytes wurde geändert. Alle Verzeichnisse werden neu durchsucht."
+        )
+    if not read_only:
+        state.set_meta("scan_min_size_bytes", str(min_size_bytes))
+    return changed
+
+
+def find_mkv_files(
+    start_path,
+    config,
+    on_directory_scanned=None,
+    full_rescan=False,
+    checkpoint=None,
+    read_only=False,
+    stop=None,
+):
     """
     Durchsucht rekursiv das Startverzeichnis nach MKV-Dateien, die nicht auf der Blacklist stehen
     und größer als die minimale Größe sind.
+
+    Verzeichnisse, deren mtime und Anzahl der Einträge seit dem letzten vollständigen Durchlauf
+    unverändert sind, werden übersprungen (nur ihre Unterverzeichnisse werden weiter durchsucht).
+    In geänderten Verzeichnissen werden unveränderte Dateien übersprungen, über die bereits
+    entschieden wurde. Mit full_rescan wird der Scan-Index ignoriert.
+
+    Die Reihenfolge ist stabil: In jedem Verzeichnis zuerst die Dateien, dann die
+    Unterverzeichnisse, jeweils nach Namen sortiert. Dateien und Verzeichnisse, die laut
+    checkpoint bereits verarbeitet wurden, werden übersprungen.
+
+    Ist on_directory_scanned gesetzt, wird die Funktion nach jedem durchsuchten Verzeichnis
+    mit dem Verzeichnis und seinem Snapshot aufgerufen (None, wenn es nicht vollständig
+    geprüft wurde), statt den Scan-Index direkt zu speichern. So kann der Worker-Pool den
+    Index erst schreiben, wenn alle Dateien des Verzeichnisses konvertiert wurden.
+    Mit read_only wird der Scan-Index nur gelesen (z.B. für --plan). Ist das Event stop
+    gesetzt, endet die Suche vor dem nächsten Verzeichnis. Ob sich min_size_bytes seit dem
+    letzten Durchlauf geändert hat, prüft der Aufrufer mit min_size_changed.
     """
     settings = config.get("settings", {})
-    min_size_bytes = settings.get("min_size_bytes", 500 * 1024 * 1024)
-    started = False
-    for root, _, files in os.walk(start_path):
-        if config.get("last_path"):
-            if not started:
-                if os.path.abspath(root) == os.path.abspath(config["last_path"]):
-                    started = True
-                    log(f"⏯️ Fortsetzen ab: {root}")
-                else:
-                    continue
-        else:
-            started = True
+    state = config["state"]
+    start_path = os.path.abspath(start_path)
+
+    skipped_directories = 0
+    total_found = 0
+    total_blacklisted = 0
+    stack = [start_path]
+    while stack:
+        if stop and stop.is_set():
+            return
+        root = stack.pop()
+        try:
+            with os.scandir(root) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError as e:
+            error(f"❌ Fehler beim Zugriff auf {root}: {e}")
+            continue
+        # Unterverzeichnisse nach dem Verzeichnis selbst, bereits verarbeitete gar nicht
+        subdirectories = [
+            entry.path
+            for entry in entries
+            if entry.is_dir()
+            and not entry.is_symlink()
+            and not is_segment_directory(entry.path)
+            and not (
+                checkpoint
+                and checkpoint.is_directory_done(
+                    position_key(start_path, entry.path, is_directory=True)
+                )
+            )
+        ]
+        stack.extend(reversed(subdirectories))
+
+        try:
+            mtime_ns = os.stat(root).st_mtime_ns
+        except OSError as e:
+            error(f"❌ Fehler beim Zugriff auf {root}: {e}")
+            continue
 
-        for file in files:
-            if file.lower().endswith(".mkv"):
-                file_path = os.path.abspath(os.path.join(root, file))
-                if file_path in config.get("blacklist", []):
-                    log(f"🚫 Überspringe {file} da die Datei auf der Blacklist steht.")
+        found = 0
+        indexed = None if full_rescan else state.get_directory_index(root)
+        # Unveränderte Verzeichnisse kosten nur ein stat, nicht eins pro MKV-Datei
+        if indexed and indexed[:2] == (mtime_ns, len(entries)):
+            skipped_directories += 1
+            snapshot = None
+        else:
+            snapshot = snapshot_directory(root, entries, mtime_ns)
+            known_files = indexed[2] if indexed else {}
+            resumed = False
+            for file_path, size, mtime_ns, inode in snapshot["files"]:
+                if checkpoint and checkpoint.is_done(
+                    position_key(start_path, file_path)
+                ):
+                    resumed = True
+                    continue
+                # Über unveränderte Dateien wurde bereits entschieden
+                if known_files.get(file_path) == (size, mtime_ns, inode):
+                    continue
+                file = os.path.basename(file_path)
+                if state.is_blacklisted(file_path):
+                    debug(
+                        f"🚫 Überspringe {file} da die Datei auf der Blacklist steht."
+                    )
+                    total_blacklisted += 1
                     continue
-                try:
-                    size = os.path.getsize(file_path)
-                    if size > min_size_bytes:
-                        size_mb = size / (1024 * 1024)
-                        log(f"👀 Gefunden: {file} ({format_number(size_mb)} MB)")
-                        yield file_path
-                except OSError as e:
-                    log(f"❌ Fehler beim Zugriff auf {file_path}: {e}")
+                if large_enough(size, settings):
+                    size_mb = size / (1024 * 1024)
+                    debug(f"👀 Gefunden: {file} ({format_number(size_mb)} MB)")
+                    found += 1
+                    total_found += 1
+                    yield file_path
+            # Über die beim letzten Lauf verarbeiteten Dateien ist hier nichts bekannt
+            if resumed:
+                snapshot = None
 
-        config["last_path"] = root
-        save_config(config)
+        if on_directory_scanned:
+            on_directory_scanned(root, snapshot)
+        elif snapshot and not found and not read_only:
+            # Nach Konvertierungen ist der Snapshot veraltet und wird nicht gespeichert
+            state.record_directory(root, snapshot)
 
+    # Einzelne Dateien werden nur mit log_level DEBUG geloggt
+    log(
+        f"🔎 {start_path}: {total_found} MKV-Dateien gefunden, {total_blacklisted} wegen der Blacklist übersprungen."
+    )
+    if skipped_directories:
+        log(f"⏭️ {skipped_directories} unveränderte Verzeichnisse übersprungen.")
 
-def process_mkv(file_path, config):
+
+def cleanup_interrupted_jobs(config, job_queue=None):
     """
-    Konvertiert eine MKV-Datei zu MP4 mittels Docker-FFmpeg, vergleicht die Dateigrößen,
-    löscht die Originaldatei bei Ersparnis oder löscht die konvertierte Datei und fügt sie zur Blacklist hinzu.
-    Aktualisiert die Statistiken bei positiver Ersparnis.
+    Löscht halb geschriebene Ausgabedateien von Konvertierungen, die beim letzten Lauf
+    unterbrochen wurden: die Staging-Datei und eine beim Veröffentlichen halb kopierte
+    ".part"-Datei neben dem Ziel. Fertige MP4-Dateien entstehen nur durch atomares
+    Umbenennen und bleiben immer erhalten.
+
+    Mit job_queue (verteilter Betrieb) bleiben Dateien unangetastet, an denen gerade
+    ein anderer Worker arbeitet.
     """
-    directory, filename = os.path.split(file_path)
-    name, _ = os.path.splitext(filename)
-    output_filename = f"{name}.mp4"
-    output_path = os.path.join(directory, output_filename)
+    state = config["state"]
+    for file_path, staging_path in state.get_running_jobs():
+        if job_queue and job_queue.is_leased(file_path):
+            continue
+        segments = segment_directory(staging_path)
+        if os.path.isdir(segments):
+            shutil.rmtree(segments, ignore_errors=True)
+            log(f"🧹 Unvollständige Segmente gelöscht: {segments}")
+        output_path = f"{os.path.splitext(file_path)[0]}.mp4"
+        for path in {staging_path, partial_path(output_path)}:
+            # Ältere Versionen schrieben direkt in die MP4-Datei
+            if path == output_path and not os.path.exists(file_path):
+                continue
+            if not os.path.exists(path):
+                continue
+            try:
+                os.remove(path)
+                log(f"🧹 Unvollständige Ausgabedatei gelöscht: {path}")
+            except OSError as e:
+                error(f"❌ Fehler beim Löschen von {path}: {e}")
+        state.end_job(file_path)
+
+
+def preflight(file_path, config, fingerprint=None):
+    """
+    Liest die Datei mit ffprobe, wählt das Profil und schätzt die Größe der MP4-Datei.
+    Liegt die geschätzte Ersparnis unter min_predicted_savings_percent, wird die Datei
+    ohne Konvertierung auf die Blacklist gesetzt. Dateien, die nur umgepackt werden,
+    sind von der Prognose ausgenommen.
+
+    Returns:
+        tuple: (konvertieren (bool), ffprobe-Daten (dict oder None), Profil (dict)).
+    """
+    settings = config["settings"]
+    if not settings.get("probe", True):
+        return True, None, select_profile(settings, None)
+
+    filename = os.path.basename(file_path)
+    try:
+        info = probe_file(file_path, config)
+        input_size = os.path.getsize(file_path)
+    except (subprocess.CalledProcessError, ValueError, OSError) as e:
+        warning(
+            f"⚠️ ffprobe für {filename} fehlgeschlagen, konvertiere ohne Prognose: {e}"
+        )
+        return True, None, select_profile(settings, None)
+
+    profile = select_profile(settings, info)
+    video_bitrate = target_bitrate(profile, info)
+    if is_remux(profile) or not video_bitrate:
+        return True, info, profile
+
+    predicted_size = predict_output_size(info, video_bitrate)
+    if predicted_size is None or input_size == 0:
+        return True, info, profile
+
+    predicted_percent = (1 - predicted_size / input_size) * 100
+    if predicted_percent < settings.get("min_predicted_savings_percent", 5):
+        if config["state"].add_to_blacklist(file_path, "predicted", fingerprint):
+            log(
+                f"🔮 {filename} spart voraussichtlich nur {format_number(predicted_percent)}%. Blacklisteintrag erstellt."
+            )
+        return False, info, profile
+    return True, info, profile
+
+
+def content_fingerprint(file_path, config):
+    """
+    Liefert den Inhalts-Fingerabdruck einer Datei, sofern deduplicate aktiv ist.
+
+    Returns:
+        str: Der Fingerabdruck oder None.
+    """
+    if not config["settings"].get("deduplicate", True):
+        return None
+    try:
+        return fingerprint_file(file_path, config["state"])
+    except OSError as e:
+        warning(
+            f"⚠️ Fingerabdruck für {os.path.basename(file_path)} fehlgeschlagen: {e}"
+        )
+        return None
+
 
-    command = [
-        "docker",
-        "run",
-        "--rm",
-        "--cpuset-cpus",
-        "0,1",  # Nur einen CPU Core verwenden
-        "-v",
-        f"{directory}:/config",
-        "linuxserver/ffmpeg",
+def reuse_duplicate(file_path, output_path, fingerprint, config, record):
+    """
+    Übernimmt das Ergebnis einer früheren Konvertierung mit gleichem Inhalt, statt
+    die Datei erneut zu konvertieren. Die vorhandene MP4-Datei wird per Hardlink
+    (duplicate_mode "hardlink", bei Fehlschlag Kopie) oder als Kopie ("copy") neben
+    das Ziel gelegt und atomar umbenannt.
+
+    Args:
+        record (dict): Verlaufseintrag, in den die Dateigrößen geschrieben werden.
+
+    Returns:
+        bool: True, wenn das Ergebnis übernommen und die MKV-Datei gelöscht wurde.
+    """
+    result = config["state"].get_content_result(fingerprint)
+    if not result:
+        return False
+    source_path, source_size = result
+    try:
+        if os.path.getsize(source_path) != source_size:
+            return False
+    except OSError:
+        return False  # Frühere MP4-Datei wurde gelöscht oder verschoben
+
+    filename = os.path.basename(file_path)
+    target_partial = partial_path(output_path)
+    try:
+        linked = False
+        if config["settings"].get("duplicate_mode", "hardlink") == "hardlink":
+            try:
+                os.link(source_path, target_partial)
+                linked = True
+            except OSError:
+                pass  # Anderes Dateisystem oder keine Hardlinks möglich
+        if not linked:
+            shutil.copyfile(source_path, target_partial)
+        os.replace(target_partial, output_path)
+        input_size = os.path.getsize(file_path)
+        os.remove(file_path)
+    except OSError as e:
+        error(f"❌ Fehler beim Übernehmen des Duplikats für {filename}: {e}")
+        if os.path.exists(target_partial):
+            os.remove(target_partial)
+        return False
+
+    input_size_mb = input_size / (1024 * 1024)
+    savings_mb = input_size_mb - source_size / (1024 * 1024)
+    log(
+        f"♻️ {filename} ist ein Duplikat von {source_path}. Ergebnis {'verlinkt' if linked else 'kopiert'}, "
+        f"Ersparnis {format_number(savings_mb)} MB."
+    )
+    record["input_size"] = input_size
+    record["output_size"] = source_size
+    return True
+
+
+def build_ffmpeg_args(file_path, output_path, profile, info):
+    """
+    Baut die ffmpeg-Argumente für eine Datei. Audio wird immer kopiert, Untertitel
+    werden umgewandelt; der Videostream richtet sich nach dem Profil.
+
+    Returns:
+        list: Die ffmpeg-Argumente.
+    """
+    return [
         "-y",
         "-loglevel",
         "error",  # Reduziere die Ausgabe von ffmpeg
         "-i",
-        f"/config/{filename}",
-        "-c:v",
-        "libx264",
-        "-b:v",
-        "4M",
-        "-vf",
-        "scale=1920:1080,fps=30",
+        file_path,
+        *video_args(profile, info),
         "-c:a",
         "copy",
         "-c:s",
@@ -86,30 +383,224 @@ def process_mkv(file_path, config):
         "0:a",
         "-map",
         "0:s?",
-        f"/config/{output_filename}",
+        # Das Format explizit angeben, da der Staging-Pfad auf ".part" endet
+        "-f",
+        "mp4",
+        output_path,
     ]
 
-    log(f"🔄 Konvertierung läuft...")
+
+class GrowthGuard:
+    """
+    Beobachtet den Fortschritt einer Konvertierung und meldet einen Abbruch, sobald die
+    hochgerechnete Ausgabegröße die Quelldatei plus early_abort_margin_percent übersteigt.
+    Vor early_abort_min_progress_percent der Dauer ist die Hochrechnung zu ungenau;
+    übersteigt die bereits geschriebene Größe die Quelldatei, wird aber sofort abgebrochen.
+    input_size wird vom Aufrufer übergeben, damit eine inzwischen verschwundene Quelle
+    dort als Fehler behandelt wird.
+    """
+
+    def __init__(self, settings, input_size, info):
+        self.enabled = settings.get("early_abort", True)
+        self.margin = settings.get("early_abort_margin_percent", 10) / 100
+        self.min_progress = settings.get("early_abort_min_progress_percent", 5) / 100
+        self.input_size = input_size
+        self.duration = (info or {}).get("duration")
+        self.projected = None
+
+    def __call__(self, progress):
+        if not self.enabled:
+            return False
+        written = progress_value(progress, "total_size") or 0
+        if written > self.input_size:
+            self.projected = written
+            return True
+        out_time_us = progress_value(progress, "out_time_us") or 0
+        if (
+            not self.duration
+            or out_time_us / 1_000_000 < self.duration * self.min_progress
+        ):
+            return False
+        projected = projected_size(progress, self.duration)
+        if projected and projected > self.input_size * (1 + self.margin):
+            self.projected = projected
+            return True
+        return False
+
+
+class ProgressReporter:
+    """
+    Nimmt die Fortschrittsblöcke einer Konvertierung entgegen: Aktualisiert die Metriken,
+    loggt alle progress_log_interval_seconds fps, Geschwindigkeit, Fortschritt und
+    Restdauer und fragt den GrowthGuard, ob abgebrochen werden soll.
+    """
+
+    def __init__(self, config, file_path, info, guard):
+        self.metrics = config["metrics"]
+        self.interval = config["settings"].get("progress_log_interval_seconds", 300)
+        self.file_path = file_path
+        self.filename = os.path.basename(file_path)
+        self.duration = (info or {}).get("duration")
+        self.guard = guard
+        self.last_log = time_module.time()
+
+    def __call__(self, progress):
+        summary = progress_summary(progress, self.duration)
+        self.metrics.job_progress(self.file_path, summary)
+        now = time_module.time()
+        if self.interval and now - self.last_log >= self.interval:
+            self.last_log = now
+            self._log(summary)
+        return self.guard(progress)
+
+    def _log(self, summary):
+        parts = []
+        if summary["percent"] is not None:
+            parts.append(f"{format_number(summary['percent'])}%")
+        if summary["fps"] is not None:
+            parts.append(f"{format_number(summary['fps'])} fps")
+        if summary["speed"] is not None:
+            parts.append(f"{format_number(summary['speed'])}x")
+        if summary["eta_seconds"] is not None:
+            parts.append(f"noch {format_time(summary['eta_seconds'])}")
+        if summary["bytes_written"] is not None:
+            parts.append(
+                f"{format_number(summary['bytes_written'] / (1024 * 1024))} MB geschrieben"
+            )
+        log(f"⏳ {self.filename}: {', '.join(parts)}")
+
+
+def process_mkv(file_path, config, cpuset="0,1"):
+    """
+    Konvertiert eine MKV-Datei zu MP4 mittels FFmpeg, vergleicht die Dateigrößen,
+    löscht die Originaldatei bei Ersparnis oder löscht die konvertierte Datei und fügt sie zur Blacklist hinzu.
+    Jedes Ergebnis wird als Eintrag im Verlauf gespeichert, aus dem die Statistiken berechnet werden.
+
+    Args:
+        file_path (str): Pfad der MKV-Datei.
+        config (dict): Die Konfiguration.
+        cpuset (str): CPU-Kerne, auf die ffmpeg beschränkt wird (z.B. "0,1").
+
+    Returns:
+        str: "converted", "remuxed", "reused", "blacklisted" oder "failed".
+    """
+    record = {"path": file_path}
+    outcome = "failed"
+    try:
+        outcome = _process_mkv(file_path, config, cpuset, record)
+        return outcome
+    finally:
+        record["outcome"] = outcome
+        try:
+            config["state"].add_history(record)
+        except Exception as e:
+            error(f"❌ Fehler beim Speichern des Verlaufs für {file_path}: {e}")
+
+
+def _process_mkv(file_path, config, cpuset, record):
+    directory, filename = os.path.split(file_path)
+    name, _ = os.path.splitext(filename)
+    output_filename = f"{name}.mp4"
+    output_path = os.path.join(directory, output_filename)
+
+    # Gleicher Inhalt unter anderem Pfad: Entscheidung und Ergebnis übernehmen
+    fingerprint = content_fingerprint(file_path, config)
+    if fingerprint:
+        reason = config["state"].content_blacklist_reason(fingerprint)
+        if reason is not None:
+            if config["state"].add_to_blacklist(file_path, reason or None):
+                log(
+                    f"🫣 {filename} hat den gleichen Inhalt wie eine Datei auf der Blacklist. Blacklisteintrag erstellt."
+                )
+            return "blacklisted"
+        if reuse_duplicate(file_path, output_path, fingerprint, config, record):
+            return "reused"
+
+    worthwhile, info, profile = preflight(file_path, config, fingerprint)
+    record["profile"] = profile.get("name")
+    if info:
+        record["codec"] = info.get("codec")
+        record["width"] = info.get("width")
+        record["height"] = info.get("height")
+        record["media_duration"] = info.get("duration")
+    if not worthwhile:
+        return "blacklisted"
+
+    # ffmpeg schreibt in einen Staging-Pfad; das Ziel entsteht erst beim Veröffentlichen
+    scratch = config["scratch"]
+    try:
+        input_size = os.path.getsize(file_path)
+    except OSError as e:
+        # Seit dem Durchsuchen gelöscht oder verschoben
+        error(f"❌ Fehler beim Zugriff auf {file_path}: {e}")
+        return "failed"
+    record["input_size"] = input_size
+    staging_path = scratch.reserve(file_path, output_path, input_size)
+    if staging_path is None:
+        log(f"💽 Nicht genug Speicherplatz für die Konvertierung von {filename}.")
+        return "failed"
+
+    remux = is_remux(profile)
+    args = build_ffmpeg_args(file_path, staging_path, profile, info)
+
+    if remux:
+        log(f"📦 Remux läuft: {filename}")
+    else:
+        log(f"🔄 Konvertierung läuft: {filename} (Profil {profile.get('name', '?')})")
+    # Merke die Konvertierung, damit eine unterbrochene Ausgabedatei aufgeräumt werden kann
+    config["state"].begin_job(file_path, staging_path)
+    guard = GrowthGuard(config["settings"], input_size, info)
+    config["metrics"].job_started(file_path, guard.input_size, profile.get("name"))
     start_time = time_module.time()  # Startzeit für die Konvertierung
+    suspended_seconds = 0.0  # In Pausen angehaltene Zeit zählt nicht zur Konvertierung
     try:
-        subprocess.run(
-            command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
+        directories = [directory, *scratch.directories(staging_path)]
+        if use_segments(config["settings"], info, profile):
+            # Lange Dateien werden in Segmenten auf den Kernen des Workers kodiert
+            complete, suspended_seconds = encode_segmented(
+                config, file_path, staging_path, profile, info, directories, cpuset
+            )
+            if not complete:
+                return "failed"
+            aborted = False
+        else:
+            # Jeder Worker bekommt eigene CPU-Kerne
+            reporter = ProgressReporter(config, file_path, info, guard)
+            aborted, suspended_seconds = run_with_progress(
+                config["encoder"], args, directories, cpuset, reporter
+            )
+        if aborted:
+            log(
+                f"✋ Konvertierung von {filename} abgebrochen: voraussichtlich {format_number(guard.projected / (1024 * 1024))} MB "
+                f"statt {format_number(guard.input_size / (1024 * 1024))} MB."
+            )
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            if config["state"].add_to_blacklist(file_path, "no_savings", fingerprint):
+                log(
+                    f"🫣 Die Konvertierung von {filename} bringt keine Ersparnis. Blacklisteintrag erstellt."
+                )
+            return "blacklisted"
         end_time = time_module.time()  # Endzeit nach der Konvertierung
-        conversion_time = end_time - start_time
-        log(f"✅ Konvertierung abgeschlossen!")
+        conversion_time = end_time - start_time - suspended_seconds
+        record["conversion_seconds"] = conversion_time
+        if remux:
+            log(f"✅ Remux abgeschlossen: {filename}")
+        else:
+            log(f"✅ Konvertierung abgeschlossen: {filename}")
 
         # Überprüfen, ob das Ausgabefile existiert und größer als 0 Bytes ist
-        if not os.path.exists(output_path):
-            log(f"❌ Ausgabedatei wurde nicht erstellt: {output_path}")
-            return
+        if not os.path.exists(staging_path):
+            error(f"❌ Ausgabedatei wurde nicht erstellt: {staging_path}")
+            return "failed"
 
-        output_size = os.path.getsize(output_path)
+        output_size = os.path.getsize(staging_path)
+        record["output_size"] = output_size
         if output_size == 0:
-            log(f"😵‍💫 Ausgabedatei ist leer: {output_path}")
-            os.remove(output_path)
-            log(f"✅ Leere Ausgabedatei gelöscht: {output_path}")
-            return
+            log(f"😵‍💫 Ausgabedatei ist leer: {staging_path}")
+            os.remove(staging_path)
+            log(f"✅ Leere Ausgabedatei gelöscht: {staging_path}")
+            return "failed"
 
         # Vergleiche Dateigrößen
         try:
@@ -122,36 +613,52 @@ def process_mkv(file_path, config):
             )
 
             if output_size < input_size:
+                # Erst nach dem Größenvergleich an den Zielort verschieben
+                scratch.publish(staging_path, output_path)
+                if fingerprint:
+                    config["state"].set_content_result(
+                        fingerprint, output_path, output_size
+                    )
                 os.remove(file_path)
                 log(f"🧹 Original MKV-Datei gelöscht: {file_path}")
+                outcome = "remuxed" if remux else "converted"
             else:
-                os.remove(output_path)
-                # log(f"🧹 Konvertierte MP4-Datei gelöscht: {output_path}")
+                os.remove(staging_path)
+                # log(f"🧹 Konvertierte MP4-Datei gelöscht: {staging_path}")
 
                 # Füge die Datei zur Blacklist hinzu
-                if file_path not in config["blacklist"]:
-                    config["blacklist"].append(file_path)
-                    save_config(config)
+                if config["state"].add_to_blacklist(
+                    file_path, "no_savings", fingerprint
+                ):
                     log(
-                        f"🫣 Die Konvertierung bringt keine Ersparnis. Blacklisteintrag erstellt."
+                        f"🫣 Die Konvertierung von {filename} bringt keine Ersparnis. Blacklisteintrag erstellt."
                     )
+                outcome = "blacklisted"
 
-            # Nur positive Ersparnisse loggen und in die Statistik aufnehmen
+            # Nur positive Ersparnisse loggen
             if savings_mb > 0 and savings_percent > 0:
                 # Logge die Ersparnis pro Datei
                 log(
                     f"🥳 Ersparnis für {filename}: {format_number(savings_mb)} MB ({format_number(savings_percent)}%)"
                 )
 
-                # Aktualisiere die Statistik
-                update_statistics(
-                    config, directory, input_size_mb, savings_mb, conversion_time
-                )
+            return outcome
 
         except OSError as e:
-            log(f"❌ Fehler beim Vergleichen oder Löschen der Dateien: {e}")
+            error(f"❌ Fehler beim Vergleichen oder Löschen der Dateien: {e}")
 
     except subprocess.CalledProcessError as e:
-        log(
+        error(
             f"❌ Fehler bei der Verarbeitung von {file_path}: {e.stderr.decode('utf-8')}"
         )
+    finally:
+        # Eine nicht veröffentlichte Ausgabe bleibt nie liegen
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
+        scratch.release(staging_path)
+        config["state"].end_job(file_path)
+        # CPU-Zeit als Laufzeit mal reservierte Kerne, auch ohne Ersparnis
+        record["cpu_seconds"] = (
+            time_module.time() - start_time - suspended_seconds
+        ) * len(cpuset.split(","))
+    return "failed"
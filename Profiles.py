@@ -0,0 +1,180 @@
+from Logger import warning
+
+# Profile werden der Reihe nach geprüft, das erste passende wird verwendet.
+# "match" enthält die Bedingungen an die ffprobe-Daten; ein Profil ohne Bedingungen passt immer.
+DEFAULT_PROFILES = [
+    {
+        "name": "remux",
+        "match": {
+            "codecs": ["h264"],
+            "max_width": 1920,
+            "max_height": 1080,
+            "max_video_bitrate": 4_000_000,
+        },
+        "video_codec": "copy",
+    },
+    {
+        "name": "sd",
+        "match": {"max_height": 576},
+        "video_codec": "libx264",
+        "video_bitrate": "1500k",
+        "preset": "medium",
+    },
+    {
+        "name": "720p",
+        "match": {"max_height": 720},
+        "video_codec": "libx264",
+        "video_bitrate": "2500k",
+        "preset": "medium",
+    },
+    {
+        "name": "1080p",
+        "video_codec": "libx264",
+        "video_bitrate": "4M",
+        "preset": "medium",
+        "max_width": 1920,
+        "max_height": 1080,
+    },
+]
+
+# Wird verwendet, wenn kein Profil aus den Einstellungen passt
+FALLBACK_PROFILE = DEFAULT_PROFILES[-1]
+
+BITRATE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_bitrate(value):
+    """
+    Wandelt eine ffmpeg-Bitrate wie "4M" oder "2500k" in Bit/s um.
+
+    Returns:
+        int: Die Bitrate oder None.
+    """
+    if value is None:
+        return None
+    text = str(value).strip().lower()
+    factor = BITRATE_SUFFIXES.get(text[-1:], 1)
+    if factor != 1:
+        text = text[:-1]
+    try:
+        return int(float(text) * factor)
+    except ValueError:
+        return None
+
+
+def matches(rules, info):
+    """
+    Prüft, ob die ffprobe-Daten einer Datei alle Bedingungen eines Profils erfüllen.
+    Ohne ffprobe-Daten passen nur Profile ohne Bedingungen.
+    """
+    if not rules:
+        return True
+    if not info:
+        return False
+    if "codecs" in rules and info.get("codec") not in rules["codecs"]:
+        return False
+    for key, field in (
+        ("width", "width"),
+        ("height", "height"),
+        ("video_bitrate", "video_bitrate"),
+    ):
+        value = info.get(field)
+        if f"max_{key}" in rules and (not value or value > rules[f"max_{key}"]):
+            return False
+        if f"min_{key}" in rules and (not value or value < rules[f"min_{key}"]):
+            return False
+    return True
+
+
+def select_profile(settings, info):
+    """
+    Wählt das erste passende Profil aus den Einstellungen. Ist "remux" deaktiviert,
+    werden Profile mit "video_codec": "copy" übersprungen.
+
+    Args:
+        settings (dict): Die Einstellungen.
+        info (dict): Die ffprobe-Daten oder None.
+
+    Returns:
+        dict: Das Profil.
+    """
+    for profile in settings.get("profiles") or DEFAULT_PROFILES:
+        if is_remux(profile) and not settings.get("remux", True):
+            continue
+        if matches(profile.get("match"), info):
+            return profile
+    warning(f"⚠️ Kein Profil passt, verwende {FALLBACK_PROFILE['name']}.")
+    return FALLBACK_PROFILE
+
+
+def is_remux(profile):
+    """
+    Prüft, ob ein Profil das Video nur kopiert.
+    """
+    return profile.get("video_codec") == "copy"
+
+
+def target_bitrate(profile, info):
+    """
+    Liefert die zu erwartende Video-Bitrate eines Profils für die Vorhersage.
+
+    Returns:
+        int: Bit/s oder None, wenn sie sich nicht vorhersagen lässt (z.B. bei crf).
+    """
+    if is_remux(profile):
+        return (info or {}).get("video_bitrate")
+    return parse_bitrate(profile.get("video_bitrate"))
+
+
+def _video_filters(profile, info):
+    info = info or {}
+    filters = []
+    max_width = profile.get("max_width")
+    max_height = profile.get("max_height")
+    width, height = info.get("width"), info.get("height")
+    if (max_width or max_height) and (
+        not width
+        or not height
+        or width > (max_width or width)
+        or height > (max_height or height)
+    ):
+        # Nur verkleinern, nie hochskalieren; Seitenverhältnis bleibt erhalten
+        box_width = f"min(iw,{max_width})" if max_width else "iw"
+        box_height = f"min(ih,{max_height})" if max_height else "ih"
+        filters.append(
+            f"scale=w='{box_width}':h='{box_height}'"
+            ":force_original_aspect_ratio=decrease:force_divisible_by=2"
+        )
+    max_fps = profile.get("max_fps")
+    fps = info.get("fps")
+    if max_fps and (not fps or fps > max_fps):
+        filters.append(f"fps={max_fps}")
+    return filters
+
+
+def video_args(profile, info):
+    """
+    Baut die ffmpeg-Argumente für den Videostream. Filter werden nur eingefügt,
+    wenn die Quelle größer ist als das Profil erlaubt; die Bildrate der Quelle
+    bleibt erhalten, sofern das Profil kein "max_fps" setzt.
+
+    Args:
+        profile (dict): Das Profil.
+        info (dict): Die ffprobe-Daten oder None.
+
+    Returns:
+        list: Die ffmpeg-Argumente.
+    """
+    args = ["-c:v", profile.get("video_codec", "libx264")]
+    if is_remux(profile):
+        return args
+    if profile.get("crf") is not None:
+        args += ["-crf", str(profile["crf"])]
+    elif profile.get("video_bitrate"):
+        args += ["-b:v", str(profile["video_bitrate"])]
+    if profile.get("preset"):
+        args += ["-preset", profile["preset"]]
+    filters = _video_filters(profile, info)
+    if filters:
+        args += ["-vf", ",".join(filters)]
+    return args
@@ -0,0 +1,137 @@
+import subprocess
+import threading
+
+
+def read_progress(stream):
+    """
+    Liest die Ausgabe von "ffmpeg -progress pipe:1" und liefert pro Fortschrittsblock
+    ein Dictionary (z.B. out_time_us, total_size, fps, speed, progress).
+
+    Args:
+        stream: Die stdout-Pipe des ffmpeg-Prozesses.
+    """
+    block = {}
+    for raw_line in stream:
+        line = raw_line.decode("utf-8", "replace").strip()
+        if "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        block[key] = value
+        if key == "progress":
+            yield block
+            block = {}
+
+
+def progress_value(progress, key):
+    """
+    Liest einen Zahlenwert aus einem Fortschrittsblock. ffmpeg meldet fehlende
+    Werte als "N/A".
+
+    Returns:
+        float: Der Wert oder None.
+    """
+    value = progress.get(key, "").rstrip("x")
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def projected_size(progress, duration):
+    """
+    Rechnet die bisher geschriebene Größe auf die gesamte Dauer hoch.
+
+    Args:
+        progress (dict): Ein Fortschrittsblock.
+        duration (float): Die Dauer der Quelldatei in Sekunden.
+
+    Returns:
+        float: Die voraussichtliche Größe in Bytes oder None.
+    """
+    out_time_us = progress_value(progress, "out_time_us")
+    total_size = progress_value(progress, "total_size")
+    if not duration or not out_time_us or total_size is None:
+        return None
+    return total_size * duration / (out_time_us / 1_000_000)
+
+
+def run_with_progress(encoder, args, directories, cpuset, on_progress):
+    """
+    Führt ffmpeg mit "-progress pipe:1" aus und ruft on_progress für jeden
+    Fortschrittsblock auf. Gibt on_progress True zurück, wird ffmpeg beendet.
+
+    Args:
+        encoder (Encoder): Das Backend.
+        args (list): Die ffmpeg-Argumente (ohne -progress).
+        directories (list): Verzeichnisse, auf die ffmpeg zugreifen muss.
+        cpuset (str): CPU-Kerne für ffmpeg.
+        on_progress (callable): Wird mit dem Fortschrittsblock aufgerufen.
+
+    Returns:
+        tuple: (abgebrochen (bool), Sekunden, die ffmpeg angehalten war (float)).
+
+    Raises:
+        subprocess.CalledProcessError: Wenn ffmpeg mit einem Fehler endet.
+    """
+    args = ["-progress", "pipe:1", "-nostats", *args]
+    process = encoder.start(args, directories, cpuset)
+
+    # stderr parallel lesen, damit ffmpeg nie an einer vollen Pipe hängt
+    stderr = []
+    reader = threading.Thread(
+        target=lambda: stderr.append(process.stderr.read()), daemon=True
+    )
+    reader.start()
+
+    aborted = False
+    try:
+        for progress in read_progress(process.stdout):
+            if on_progress(progress):
+                aborted = True
+                break
+    except BaseException:
+        encoder.stop(process)
+        raise
+    finally:
+        if aborted:
+            encoder.stop(process)
+        # Restliche Ausgabe verwerfen, bis ffmpeg beendet ist
+        process.stdout.read()
+        process.wait()
+        reader.join()
+        suspended_seconds = encoder.release(process)
+
+    if not aborted and process.returncode != 0:
+        raise subprocess.CalledProcessError(
+            process.returncode, args, stderr=b"".join(stderr)
+        )
+    return aborted, suspended_seconds
+
+
+def progress_summary(progress, duration):
+    """
+    Fasst einen Fortschrittsblock für Log und Metriken zusammen.
+
+    Args:
+        progress (dict): Ein Fortschrittsblock.
+        duration (float): Die Dauer der Quelldatei in Sekunden oder None.
+
+    Returns:
+        dict: fps, speed (Vielfaches der Echtzeit), percent, eta_seconds und
+            bytes_written; unbekannte Werte sind None.
+    """
+    out_time_us = progress_value(progress, "out_time_us")
+    speed = progress_value(progress, "speed")
+    percent = eta_seconds = None
+    if duration and out_time_us is not None:
+        out_time = out_time_us / 1_000_000
+        percent = min(out_time / duration * 100, 100.0)
+        if speed:
+            eta_seconds = max(duration - out_time, 0) / speed
+    return {
+        "fps": progress_value(progress, "fps"),
+        "speed": speed,
+        "percent": percent,
+        "eta_seconds": eta_seconds,
+        "bytes_written": progress_value(progress, "total_size"),
+    }
@@ -0,0 +1,137 @@
+import os
+import time as time_module
+from State import SAVING_OUTCOMES
+from Utils import format_number
+
+DEFAULT_REPORT_DEPTH = 1  # Verzeichnisebenen unterhalb des Startpfads
+REPORT_GROUPS = (
+    ("directory", "📂 Nach Verzeichnis"),
+    ("outcome", "🏷️ Nach Ergebnis"),
+    ("day", "📅 Nach Tag"),
+    ("codec", "🎞️ Nach Quell-Codec"),
+    ("resolution", "📐 Nach Auflösung"),
+)
+
+
+def directory_prefix(directory, roots, depth):
+    """
+    Kürzt ein Verzeichnis auf die ersten depth Ebenen unterhalb seines Startpfads.
+
+    Returns:
+        str: Das gekürzte Verzeichnis oder None, wenn es unter keinem Startpfad liegt.
+    """
+    for root in roots:
+        relative = os.path.relpath(directory, root)
+        if relative == os.curdir:
+            return root
+        parts = relative.split(os.sep)
+        if parts[0] != os.pardir:
+            return os.path.join(root, *parts[:depth])
+    return None
+
+
+def group_keys(record, roots, depth):
+    """
+    Liefert für jede Gruppierung den Schlüssel, unter dem ein Eintrag gezählt wird.
+    """
+    prefix = directory_prefix(record["directory"], roots, depth)
+    if prefix is None:
+        return None
+    height = record["height"]
+    return {
+        "directory": prefix,
+        "outcome": record["outcome"],
+        "day": time_module.strftime(
+            "%Y-%m-%d", time_module.localtime(record["finished_at"])
+        ),
+        "codec": record["codec"] or "?",
+        "resolution": f"{height}p" if height else "?",
+    }
+
+
+def build_report(records, roots, depth=DEFAULT_REPORT_DEPTH):
+    """
+    Berechnet alle Gruppierungen in einem einzigen Durchlauf über den Verlauf, ohne
+    die Einträge im Speicher zu halten.
+
+    Args:
+        records (iterable): Einträge aus StateStore.iter_history.
+        roots (list): Nur Dateien unterhalb dieser Verzeichnisse werden gezählt.
+        depth (int): Verzeichnisebenen für die Gruppierung nach Verzeichnis.
+
+    Returns:
+        dict: Gruppierung -> {Schlüssel -> Summen}.
+    """
+    roots = [os.path.abspath(root) for root in roots]
+    depth = max(1, depth)
+    report = {group: {} for group, _ in REPORT_GROUPS}
+    for record in records:
+        keys = group_keys(record, roots, depth)
+        if keys is None:
+            continue
+        input_size = record["input_size"] or 0
+        output_size = record["output_size"]
+        saved = (
+            record["outcome"] in SAVING_OUTCOMES
+            and output_size is not None
+            and output_size < input_size
+        )
+        for group, key in keys.items():
+            totals = report[group].get(key)
+            if totals is None:
+                totals = report[group][key] = {
+                    "files": 0,
+                    "input_bytes": 0,
+                    "saved_input_bytes": 0,
+                    "savings_bytes": 0,
+                    "cpu_seconds": 0.0,
+                }
+            totals["files"] += 1
+            totals["input_bytes"] += input_size
+            totals["cpu_seconds"] += record["cpu_seconds"] or 0.0
+            if saved:
+                totals["saved_input_bytes"] += input_size
+                totals["savings_bytes"] += input_size - output_size
+    return report
+
+
+def format_row(key, totals):
+    savings_mb = totals["savings_bytes"] / (1024 * 1024)
+    percent = (
+        totals["savings_bytes"] / totals["saved_input_bytes"] * 100
+        if totals["saved_input_bytes"]
+        else 0.0
+    )
+    cpu_hours = totals["cpu_seconds"] / 3600
+    per_cpu_hour = (
+        f"{format_number(savings_mb / cpu_hours)} MB/CPU-h" if cpu_hours else "–"
+    )
+    return (
+        f"  {key}: {totals['files']} Dateien, "
+        f"{format_number(totals['input_bytes'] / (1024 ** 3))} GB Eingabe, "
+        f"{format_number(savings_mb)} MB gespart ({format_number(percent)}%), "
+        f"{format_number(cpu_hours)} CPU-h, {per_cpu_hour}"
+    )
+
+
+def print_report(state, roots, depth=DEFAULT_REPORT_DEPTH):
+    """
+    Gibt den Bericht über den Konvertierungsverlauf unterhalb der Startpfade roots aus.
+    Verzeichnisse und Codecs sind nach Ersparnis sortiert, Tage chronologisch.
+    """
+    report = build_report(state.iter_history(), roots, depth)
+    if not report["outcome"]:
+        print(f"📭 Kein Verlauf für {', '.join(roots)} vorhanden.")
+        return
+    for group, title in REPORT_GROUPS:
+        print(title)
+        if group == "day":
+            rows = sorted(report[group].items())
+        else:
+            rows = sorted(
+                report[group].items(),
+                key=lambda item: item[1]["savings_bytes"],
+                reverse=True,
+            )
+        for key, totals in rows:
+            print(format_row(key, totals))
@@ -0,0 +1,164 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from Logger import error, warning
+from Processor import find_mkv_files, min_size_changed
+
+DEFAULT_SCAN_THREADS = 8  # Höchstens so viele Startpfade werden gleichzeitig durchsucht
+SCAN_QUEUE_SIZE = 1000  # Gefundene, aber noch nicht abgeholte Dateien
+IDLE_SECONDS = 1  # So oft wird on_idle aufgerufen, solange nichts gefunden wird
+
+
+def normalize_roots(start_paths):
+    """
+    Entfernt doppelte Startpfade und solche, die in einem anderen Startpfad liegen,
+    damit keine Datei zweimal gefunden wird.
+
+    Returns:
+        list: Absolute Startpfade in der angegebenen Reihenfolge.
+    """
+    roots = []
+    for path in map(os.path.abspath, start_paths):
+        if path in roots:
+            continue
+        parent = next(
+            (root for root in roots if os.path.commonpath([root, path]) == root),
+            None,
+        )
+        if parent:
+            warning(f"⚠️ {path} liegt in {parent} und wird nicht extra durchsucht.")
+            continue
+        for root in [
+            root for root in roots if os.path.commonpath([root, path]) == path
+        ]:
+            warning(f"⚠️ {root} liegt in {path} und wird nicht extra durchsucht.")
+            roots.remove(root)
+        roots.append(path)
+    return roots
+
+
+def check_roots(roots):
+    """
+    Verhindert, dass ein einzelner Pfad als Liste von Startpfaden verwendet wird; sonst
+    würde jedes Zeichen (auch "/") zu einem eigenen Startpfad.
+
+    Raises:
+        TypeError: Wenn roots ein str ist.
+    """
+    if isinstance(roots, (str, bytes)):
+        raise TypeError(f"Startpfade müssen eine Liste sein, nicht {roots!r}")
+
+
+def scan_roots(
+    roots,
+    config,
+    full_rescan=False,
+    checkpoints=None,
+    directories=False,
+    on_idle=None,
+    threads=DEFAULT_SCAN_THREADS,
+    **options,
+):
+    """
+    Durchsucht mehrere Startpfade gleichzeitig mit find_mkv_files, jeden in einem
+    eigenen Thread. Innerhalb eines Startpfads bleibt die Suchreihenfolge erhalten, die
+    Startpfade selbst werden gemischt. Ein einzelner Startpfad wird ohne Thread durchsucht.
+
+    Args:
+        roots (list): Die Startpfade (siehe normalize_roots).
+        checkpoints (CheckpointSet): Checkpoints der Startpfade (optional).
+        directories (bool): Auch durchsuchte Verzeichnisse melden, statt den Scan-Index
+            direkt zu schreiben (für WorkerPool.directory_scanned).
+        on_idle (callable): Wird regelmäßig aufgerufen, solange keine Datei gefunden wird.
+        options: Weitere Argumente für find_mkv_files (z.B. read_only).
+
+    Yields:
+        tuple: ("file", Pfad) oder ("directory", (Verzeichnis, Snapshot)).
+
+    Raises:
+        TypeError: Wenn roots ein einzelner Pfad statt einer Liste ist.
+    """
+    check_roots(roots)
+    # Einmal für alle Startpfade, sonst sähe nur der erste eine geänderte Mindestgröße
+    if min_size_changed(config, options.get("read_only", False)):
+        full_rescan = True
+    if len(roots) == 1:
+        yield from _scan_root(
+            roots[0], config, full_rescan, checkpoints, directories, None, options
+        )
+        return
+
+    results = queue.Queue(SCAN_QUEUE_SIZE)
+    stop = threading.Event()
+    options["stop"] = stop
+
+    def put(item):
+        # Nicht ewig blockieren, falls der Verbraucher abgebrochen hat
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=IDLE_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def scan(root):
+        try:
+            for item in _scan_root(
+                root, config, full_rescan, checkpoints, directories, put, options
+            ):
+                put(item)
+                if stop.is_set():
+                    return
+        except Exception as e:
+            error(f"❌ Fehler beim Durchsuchen von {root}: {e}")
+        finally:
+            put(("done", root))
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(threads, len(roots))),
+        thread_name_prefix="ShrinkBot-Scan",
+    )
+    try:
+        for root in roots:
+            executor.submit(scan, root)
+        remaining = len(roots)
+        while remaining:
+            try:
+                kind, value = results.get(timeout=IDLE_SECONDS)
+            except queue.Empty:
+                if on_idle:
+                    on_idle()
+                continue
+            if kind == "done":
+                remaining -= 1
+                continue
+            yield kind, value
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _scan_root(root, config, full_rescan, checkpoints, directories, put, options):
+    on_directory_scanned = None
+    pending = []
+    if directories:
+        if put:
+            # Im Scan-Thread: Verzeichnisse in derselben Reihenfolge wie die Dateien melden
+            def on_directory_scanned(directory, snapshot):
+                put(("directory", (directory, snapshot)))
+
+        else:
+
+            def on_directory_scanned(directory, snapshot):
+                pending.append((directory, snapshot))
+
+    checkpoint = checkpoints.for_root(root) if checkpoints else None
+    for file_path in find_mkv_files(
+        root, config, on_directory_scanned, full_rescan, checkpoint, **options
+    ):
+        while pending:
+            yield "directory", pending.pop(0)
+        yield "file", file_path
+    while pending:
+        yield "directory", pending.pop(0)
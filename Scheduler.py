@@ -0,0 +1,186 @@
+import heapq
+import os
+from collections import deque
+from Logger import error
+from Probe import predict_output_size
+from Profiles import is_remux, select_profile, target_bitrate
+
+SCHEDULE_POLICIES = ("walk", "savings", "largest", "oldest", "fair")
+DEFAULT_SCHEDULE = "walk"  # Reihenfolge des Durchsuchens beibehalten
+DEFAULT_SCHEDULE_QUEUE_SIZE = 10_000  # Maximal vorgemerkte Dateien
+# Schätzwerte, solange die Statistiken noch keine Erfahrungswerte enthalten
+DEFAULT_ENCODE_SECONDS_PER_MB = 0.5
+DEFAULT_REMUX_SECONDS_PER_MB = 0.01
+DEFAULT_SAVINGS_RATIO = 0.3
+
+
+def calibrate(statistics):
+    """
+    Leitet Erfahrungswerte für Schätzungen aus den bisherigen Statistiken ab.
+
+    Returns:
+        tuple: (Sekunden pro MB Konvertierung, Sekunden pro MB Remux, Anteil Ersparnis).
+    """
+    remux_mb = statistics["total_remux_input_mb"]
+    encode_mb = (
+        statistics["total_input_mb"] - remux_mb - statistics["total_reused_input_mb"]
+    )
+    encode_seconds_per_mb = (
+        statistics["total_conversion_time_seconds"] / encode_mb
+        if encode_mb > 0 and statistics["total_conversion_time_seconds"] > 0
+        else DEFAULT_ENCODE_SECONDS_PER_MB
+    )
+    remux_seconds_per_mb = (
+        statistics["total_remux_time_seconds"] / remux_mb
+        if remux_mb > 0 and statistics["total_remux_time_seconds"] > 0
+        else DEFAULT_REMUX_SECONDS_PER_MB
+    )
+    savings_ratio = (
+        statistics["total_savings_mb"] / statistics["total_input_mb"]
+        if statistics["total_input_mb"] > 0
+        else DEFAULT_SAVINGS_RATIO
+    )
+    return encode_seconds_per_mb, remux_seconds_per_mb, savings_ratio
+
+
+class Scheduler:
+    """
+    Sammelt die gefundenen Dateien in einer begrenzten Warteschlange und gibt sie nach
+    der gewählten Strategie zurück:
+
+    - "savings": größte erwartete Ersparnis pro Sekunde Konvertierung zuerst,
+    - "largest": größte Datei zuerst,
+    - "oldest": älteste Datei (mtime) zuerst,
+    - "fair": reihum aus allen Verzeichnissen, innerhalb eines Verzeichnisses nach Ersparnis pro Sekunde.
+
+    Die erwartete Ersparnis stammt aus gespeicherten ffprobe-Ergebnissen und dem Profil,
+    sonst aus den bisherigen Statistiken; die erwartete Dauer immer aus den Statistiken
+    (Sekunden pro MB). ffprobe selbst wird beim Vormerken nicht gestartet, damit der
+    Scan nicht pro Datei auf einen Prozess oder Container wartet. Es werden höchstens
+    max_queued Dateien vorgemerkt, damit auch sehr große Bibliotheken wenig Speicher brauchen.
+
+    Eine Datei wartet höchstens, bis max_queued weitere Dateien vorgemerkt wurden, und
+    kommt dann unabhängig von der Strategie dran. Sonst hielte eine unattraktive Datei
+    Checkpoint, Scan-Index und die Ersparnis pro Verzeichnis aller später durchsuchten
+    Verzeichnisse zurück (siehe WorkerPool).
+    """
+
+    def __init__(self, config, policy, max_queued=DEFAULT_SCHEDULE_QUEUE_SIZE):
+        self.config = config
+        self.policy = policy
+        self.max_queued = max(1, max_queued)
+        self._heap = []
+        # Vorgemerkte Dateien in Suchreihenfolge, für die Altersgrenze
+        self._order = deque()
+        # Bereits entnommene Dateien, die noch in _heap oder _order stehen
+        self._taken = set()
+        self._count = 0
+        self._sequence = 0
+        # Verzeichnis -> [bereits vergebene Runden, vorgemerkte Dateien] für "fair"
+        self._per_directory = {}
+
+        (
+            self.encode_seconds_per_mb,
+            self.remux_seconds_per_mb,
+            self.savings_ratio,
+        ) = calibrate(config["state"].get_statistics())
+
+    def __len__(self):
+        return self._count
+
+    def full(self):
+        return self._count >= self.max_queued
+
+    def savings_per_second(self, file_path, stat):
+        """
+        Schätzt die Ersparnis in MB pro Sekunde Konvertierung.
+        """
+        size = stat.st_size
+        size_mb = size / (1024 * 1024)
+        info = None
+        if self.config["settings"].get("probe", True):
+            info = self.config["state"].get_probe(file_path, size, stat.st_mtime_ns)
+        profile = select_profile(self.config["settings"], info)
+
+        if is_remux(profile):
+            seconds = size_mb * self.remux_seconds_per_mb
+        else:
+            seconds = size_mb * self.encode_seconds_per_mb
+
+        savings_mb = size_mb * self.savings_ratio
+        video_bitrate = target_bitrate(profile, info)
+        if info and video_bitrate:
+            predicted_size = predict_output_size(info, video_bitrate)
+            if predicted_size is not None:
+                savings_mb = (size - predicted_size) / (1024 * 1024)
+        return max(savings_mb, 0) / seconds if seconds > 0 else 0
+
+    def _key(self, file_path, stat):
+        if self.policy == "largest":
+            return (-stat.st_size,)
+        if self.policy == "oldest":
+            return (stat.st_mtime_ns,)
+        rate = self.savings_per_second(file_path, stat)
+        if self.policy == "fair":
+            entry = self._per_directory.setdefault(os.path.dirname(file_path), [0, 0])
+            turn = entry[0]
+            entry[0] += 1
+            entry[1] += 1
+            return (turn, -rate, -stat.st_size)
+        # Ohne gespeichertes ffprobe-Ergebnis ist die Rate gleich; dann die größere zuerst
+        return (-rate, -stat.st_size)
+
+    def push(self, file_path):
+        """
+        Merkt eine Datei vor.
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError as e:
+            error(f"❌ Fehler beim Zugriff auf {file_path}: {e}")
+            key = (float("inf"),)
+        else:
+            key = self._key(file_path, stat)
+        heapq.heappush(self._heap, (key, self._sequence, file_path))
+        self._order.append((self._sequence, file_path))
+        self._sequence += 1
+        self._count += 1
+
+    def _next_overdue(self):
+        # Entnommene Einträge vorne aus beiden Strukturen entfernen
+        while self._heap and self._heap[0][1] in self._taken:
+            self._taken.discard(heapq.heappop(self._heap)[1])
+        while self._order and self._order[0][0] in self._taken:
+            self._taken.discard(self._order.popleft()[0])
+        return self._sequence - self._order[0][0] > self.max_queued
+
+    def peek(self):
+        """
+        Liefert die nächste Datei, ohne sie zu entnehmen.
+        """
+        if self._next_overdue():
+            return self._order[0][1]
+        return self._heap[0][2]
+
+    def pop(self):
+        """
+        Liefert die nächste Datei nach der gewählten Strategie bzw. eine überfällige.
+        """
+        if self._next_overdue():
+            sequence, file_path = self._order.popleft()
+        else:
+            _, sequence, file_path = heapq.heappop(self._heap)
+        self._taken.add(sequence)
+        self._count -= 1
+        if not self._count:
+            self._heap.clear()
+            self._order.clear()
+            self._taken.clear()
+        directory = os.path.dirname(file_path)
+        entry = self._per_directory.get(directory)
+        if entry:
+            entry[1] -= 1
+            if not entry[1]:
+                # Leere Verzeichnisse nicht für den ganzen Lauf merken
+                del self._per_directory[directory]
+        return file_path
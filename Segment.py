@@ -0,0 +1,301 @@
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from Logger import error, log
+from Probe import parse_probe
+from Profiles import is_remux, video_args
+from Utils import format_number
+
+DEFAULT_SEGMENT_SECONDS = 300  # Ziel-Länge eines Segments
+DEFAULT_SEGMENT_MIN_DURATION_SECONDS = 3600  # Erst ab dieser Dauer wird geteilt
+DEFAULT_CPUS_PER_SEGMENT = 2  # Kerne pro gleichzeitig kodiertem Segment
+DURATION_TOLERANCE_SECONDS = 1.0  # Erlaubte Abweichung der Dauer nach dem Zusammenfügen
+SEGMENT_DIRECTORY_SUFFIX = ".segments"
+
+
+def use_segments(settings, info, profile):
+    """
+    Prüft, ob eine Datei in Segmenten parallel kodiert werden soll.
+    """
+    return bool(
+        settings.get("segmented_encoding", False)
+        and info
+        and not is_remux(profile)
+        and info.get("duration", 0)
+        >= settings.get(
+            "segment_min_duration_seconds", DEFAULT_SEGMENT_MIN_DURATION_SECONDS
+        )
+    )
+
+
+def segment_directory(staging_path):
+    """
+    Liefert das Verzeichnis für die Segmente einer Konvertierung. Ohne scratch_dir liegt
+    es in der Bibliothek; Scan und Watcher überspringen es (siehe is_segment_directory).
+    """
+    return f"{staging_path}{SEGMENT_DIRECTORY_SUFFIX}"
+
+
+def is_segment_directory(path):
+    """
+    Prüft, ob path ein Segment-Verzeichnis einer laufenden Konvertierung ist.
+    """
+    return path.endswith(SEGMENT_DIRECTORY_SUFFIX)
+
+
+def core_groups(cpuset, cpus_per_segment):
+    """
+    Teilt die Kerne des Workers in Gruppen für die parallel laufenden Segmente. Übrige
+    Kerne werden auf die Gruppen verteilt, damit alle reservierten Kerne genutzt werden.
+
+    Args:
+        cpuset (str): Die CPU-Kerne des Workers (z.B. "0,1,2,3").
+        cpus_per_segment (int): Gewünschte Anzahl Kerne pro Segment.
+
+    Returns:
+        list: CPU-Sets im Docker-Format (z.B. "0,1").
+    """
+    cpus = cpuset.split(",")
+    count = max(1, len(cpus) // max(1, cpus_per_segment))
+    size, extra = divmod(len(cpus), count)
+    groups = []
+    start = 0
+    for group in range(count):
+        end = start + size + (1 if group < extra else 0)
+        groups.append(",".join(cpus[start:end]))
+        start = end
+    return groups
+
+
+def split_args(file_path, directory, segment_seconds):
+    """
+    Teilt den Videostream ohne Neukodierung an Keyframes in Segmente. Sie heißen
+    nicht .mkv, damit sie nie selbst als Quelle gefunden werden.
+    """
+    return [
+        "-y",
+        "-loglevel",
+        "error",
+        "-i",
+        file_path,
+        "-map",
+        "0:v:0",
+        "-c",
+        "copy",
+        "-f",
+        "segment",
+        "-segment_format",
+        "matroska",
+        "-segment_time",
+        str(segment_seconds),
+        "-reset_timestamps",
+        "1",
+        os.path.join(directory, "source%05d.seg"),
+    ]
+
+
+def encode_args(segment_path, output_path, profile, info):
+    return [
+        "-y",
+        "-loglevel",
+        "error",
+        "-i",
+        segment_path,
+        *video_args(profile, info),
+        "-an",
+        "-sn",
+        "-f",
+        "mp4",
+        output_path,
+    ]
+
+
+def concat_args(list_path, file_path, output_path):
+    """
+    Fügt die kodierten Segmente zusammen; Audio und Untertitel kommen aus der Quelle.
+    """
+    return [
+        "-y",
+        "-loglevel",
+        "error",
+        "-f",
+        "concat",
+        "-safe",
+        "0",
+        "-i",
+        list_path,
+        "-i",
+        file_path,
+        "-map",
+        "0:v",
+        "-map",
+        "1:a",
+        "-map",
+        "1:s?",
+        "-c:v",
+        "copy",
+        "-c:a",
+        "copy",
+        "-c:s",
+        "mov_text",
+        "-f",
+        "mp4",
+        output_path,
+    ]
+
+
+def _probe_duration(encoder, file_path, directories):
+    output = encoder.probe(
+        [
+            "-v",
+            "error",
+            "-print_format",
+            "json",
+            "-show_format",
+            "-show_streams",
+            "-f",
+            "mp4",
+            file_path,
+        ],
+        directories,
+    )
+    return parse_probe(json.loads(output))["duration"]
+
+
+def _run_job(encoder, args, directories, cpuset, job):
+    """
+    Führt einen ffmpeg-Schritt als Teil der Konvertierung job aus, damit ihn die
+    Pausenzeiten und die Lastregelung zusammen mit den übrigen Schritten anhalten.
+
+    Returns:
+        float: Sekunden, die der Prozess angehalten war.
+
+    Raises:
+        subprocess.CalledProcessError: Wenn ffmpeg mit einem Fehler endet.
+    """
+    process = encoder.start(args, directories, cpuset, job=job)
+    _, stderr = process.communicate()
+    seconds = encoder.release(process)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(
+            process.returncode, process.args, stderr=stderr
+        )
+    return seconds
+
+
+def encode_segmented(
+    config, file_path, staging_path, profile, info, directories, cpuset
+):
+    """
+    Kodiert eine lange Datei in Segmenten parallel auf den Kernen des Workers (cpuset):
+    Der Videostream wird an Keyframes geteilt, jedes Segment auf einer eigenen
+    Kerngruppe (cpus_per_segment) kodiert und das Ergebnis mit Audio und Untertiteln
+    der Quelle nach staging_path geschrieben. Zum Schluss wird geprüft, ob die Dauer
+    mit der Quelle übereinstimmt.
+
+    Returns:
+        tuple: (Ergebnis vollständig (bool), Sekunden, die ffmpeg angehalten war).
+
+    Raises:
+        subprocess.CalledProcessError: Wenn ffmpeg mit einem Fehler endet.
+    """
+    settings = config["settings"]
+    encoder = config["encoder"]
+    filename = os.path.basename(file_path)
+    directory = segment_directory(staging_path)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    try:
+        # Teilen und Zusammenfügen laufen einzeln, ihre Pausen zählen voll
+        split_suspended = _run_job(
+            encoder,
+            split_args(
+                file_path,
+                directory,
+                settings.get("segment_seconds", DEFAULT_SEGMENT_SECONDS),
+            ),
+            directories,
+            cpuset,
+            file_path,
+        )
+        sources = sorted(
+            os.path.join(directory, name)
+            for name in os.listdir(directory)
+            if name.startswith("source")
+        )
+        if not sources:
+            error(f"❌ {filename} konnte nicht in Segmente geteilt werden.")
+            return False, split_suspended
+
+        cpusets = core_groups(
+            cpuset, settings.get("cpus_per_segment", DEFAULT_CPUS_PER_SEGMENT)
+        )
+        log(f"🧩 {filename}: {len(sources)} Segmente auf {len(cpusets)} Kerngruppen.")
+        free_cpusets = queue.Queue()
+        for group in cpusets:
+            free_cpusets.put(group)
+        lock = threading.Lock()
+        done = [0]
+        # Angehaltene Zeit pro Thread; die Threads werden gemeinsam angehalten
+        suspended = {}
+
+        def encode(source):
+            group = free_cpusets.get()
+            try:
+                output = f"{os.path.splitext(source)[0]}.mp4"
+                # Alle Segmente zählen als eine Konvertierung (siehe Pause.enforce_limit)
+                seconds = _run_job(
+                    encoder,
+                    encode_args(source, output, profile, info),
+                    directories,
+                    group,
+                    file_path,
+                )
+                with lock:
+                    thread = threading.get_ident()
+                    suspended[thread] = suspended.get(thread, 0.0) + seconds
+                    done[0] += 1
+                    config["metrics"].job_progress(
+                        file_path, {"percent": done[0] / len(sources) * 100}
+                    )
+                return output
+            finally:
+                free_cpusets.put(group)
+
+        with ThreadPoolExecutor(
+            max_workers=len(cpusets), thread_name_prefix="ShrinkBot-Segment"
+        ) as executor:
+            outputs = list(executor.map(encode, sources))
+        suspended_seconds = split_suspended + max(suspended.values(), default=0.0)
+
+        list_path = os.path.join(directory, "segments.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for output in outputs:
+                escaped = output.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        suspended_seconds += _run_job(
+            encoder,
+            concat_args(list_path, file_path, staging_path),
+            directories,
+            cpuset,
+            file_path,
+        )
+
+        try:
+            duration = _probe_duration(encoder, staging_path, directories)
+        except (ValueError, KeyError, TypeError, AttributeError, OSError) as e:
+            error(f"❌ Dauer der zusammengefügten Datei von {filename} unbekannt: {e}")
+            return False, suspended_seconds
+        if abs(duration - info["duration"]) > DURATION_TOLERANCE_SECONDS:
+            error(
+                f"❌ Zusammengefügte Datei von {filename} ist {format_number(duration)} statt "
+                f"{format_number(info['duration'])} Sekunden lang."
+            )
+            return False, suspended_seconds
+        return True, suspended_seconds
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
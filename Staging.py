@@ -0,0 +1,151 @@
+import errno
+import hashlib
+import os
+import shutil
+import threading
+from Logger import log
+
+DEFAULT_SCRATCH_RESERVE_BYTES = 1024 * 1024 * 1024  # 1 GB bleibt immer frei
+DEFAULT_PREFETCH_BYTES = 256 * 1024 * 1024  # Vorab gelesener Anfang der nächsten Datei
+PARTIAL_SUFFIX = ".part"
+
+
+def partial_path(output_path):
+    """
+    Liefert den Pfad, unter dem eine Ausgabedatei neben dem Ziel entsteht,
+    bevor sie atomar an ihren Platz verschoben wird.
+    """
+    return f"{output_path}{PARTIAL_SUFFIX}"
+
+
+def _free_bytes(directory):
+    try:
+        return shutil.disk_usage(directory).free
+    except OSError:
+        return None
+
+
+class Scratch:
+    """
+    Verwaltet, wo ffmpeg die Ausgabedatei schreibt. Mit scratch_dir (z.B. SSD oder tmpfs)
+    entsteht sie dort, sonst als ".part"-Datei neben dem Ziel. Erst nach dem Größenvergleich
+    wird sie mit publish() atomar an ihren Platz verschoben; vorher gibt es nie eine
+    halbe MP4-Datei im Zielverzeichnis. Vor jedem Start wird der freie Speicherplatz
+    geprüft, wobei der Platz laufender Konvertierungen bereits abgezogen ist.
+    """
+
+    def __init__(
+        self,
+        directory=None,
+        reserve_bytes=DEFAULT_SCRATCH_RESERVE_BYTES,
+        prefetch_bytes=DEFAULT_PREFETCH_BYTES,
+    ):
+        self.directory = os.path.abspath(directory) if directory else None
+        self.reserve_bytes = reserve_bytes
+        self.prefetch_bytes = prefetch_bytes
+        self._lock = threading.Lock()
+        # Staging-Pfad -> (Verzeichnis, reservierte Bytes)
+        self._reserved = {}
+        self._prefetched = None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _reserved_in(self, directory):
+        return sum(size for path, size in self._reserved.values() if path == directory)
+
+    def _has_room(self, directory, size):
+        free = _free_bytes(directory)
+        return (
+            free is None
+            or free - self._reserved_in(directory) - size >= self.reserve_bytes
+        )
+
+    def reserve(self, file_path, output_path, expected_size):
+        """
+        Wählt den Pfad, in den ffmpeg schreibt, und reserviert expected_size Bytes.
+        Reicht der Platz im Scratch-Verzeichnis nicht, wird neben dem Ziel geschrieben.
+
+        Returns:
+            str: Der Staging-Pfad oder None, wenn auch neben dem Ziel kein Platz ist.
+        """
+        target_directory = os.path.dirname(output_path)
+        with self._lock:
+            # Das Ergebnis muss am Ende auch ins Zielverzeichnis passen
+            if not self._has_room(target_directory, expected_size):
+                return None
+            if self.directory:
+                if self._has_room(self.directory, expected_size):
+                    name, _ = os.path.splitext(os.path.basename(output_path))
+                    digest = hashlib.blake2b(
+                        file_path.encode("utf-8"), digest_size=6
+                    ).hexdigest()
+                    staging_path = os.path.join(
+                        self.directory, f"{name}.{digest}.mp4{PARTIAL_SUFFIX}"
+                    )
+                    self._reserved[staging_path] = (self.directory, expected_size)
+                    return staging_path
+                log(
+                    f"💽 Zu wenig Platz in {self.directory}. Schreibe neben die Quelldatei."
+                )
+            staging_path = partial_path(output_path)
+            self._reserved[staging_path] = (target_directory, expected_size)
+            return staging_path
+
+    def release(self, staging_path):
+        """
+        Gibt den reservierten Platz wieder frei.
+        """
+        with self._lock:
+            self._reserved.pop(staging_path, None)
+
+    def directories(self, staging_path):
+        """
+        Liefert die Verzeichnisse, die der Encoder zusätzlich zur Quelle braucht.
+        """
+        directory = os.path.dirname(staging_path)
+        return [directory] if directory == self.directory else []
+
+    def publish(self, staging_path, output_path):
+        """
+        Verschiebt die fertige Ausgabedatei atomar an ihren Platz. Liegt das
+        Scratch-Verzeichnis auf einem anderen Dateisystem, wird zuerst neben das Ziel
+        kopiert und dann umbenannt.
+        """
+        try:
+            os.replace(staging_path, output_path)
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV:  # Anderes Dateisystem
+                raise
+        target_partial = partial_path(output_path)
+        try:
+            shutil.copyfile(staging_path, target_partial)
+            os.replace(target_partial, output_path)
+        except BaseException:
+            if os.path.exists(target_partial):
+                os.remove(target_partial)
+            raise
+        os.remove(staging_path)
+
+    def prefetch(self, file_path):
+        """
+        Bittet den Kernel, den Anfang der nächsten Datei schon einmal zu lesen, während
+        die Worker noch beschäftigt sind (posix_fadvise, nur auf Linux).
+        """
+        if (
+            not self.prefetch_bytes
+            or not hasattr(os, "posix_fadvise")
+            or file_path == self._prefetched
+        ):
+            return
+        self._prefetched = file_path
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.posix_fadvise(fd, 0, self.prefetch_bytes, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
@@ -0,0 +1,769 @@
+import json
+import os
+import sqlite3
+import threading
+import time as time_module
+
+# Jeder Eintrag hebt das Datenbankschema um eine Version an (PRAGMA user_version).
+# Bestehende Einträge nie ändern, sondern neue Schritte hinten anhängen.
+SCHEMA_MIGRATIONS = [
+    [
+        """
+        CREATE TABLE blacklist (
+            path TEXT PRIMARY KEY,
+            added_at REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE statistics (
+            key TEXT PRIMARY KEY,
+            value REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE directory_savings (
+            directory TEXT PRIMARY KEY,
+            savings_mb REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+        """,
+    ],
+    [
+        """
+        CREATE TABLE scan_directories (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            entry_count INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE scan_files (
+            path TEXT PRIMARY KEY,
+            directory TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            inode INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX scan_files_directory ON scan_files (directory)",
+    ],
+    [
+        """
+        CREATE TABLE checkpoints (
+            root TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            position TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE running_jobs (
+            path TEXT PRIMARY KEY,
+            output_path TEXT NOT NULL,
+            started_at REAL NOT NULL
+        )
+        """,
+    ],
+    [
+        "ALTER TABLE blacklist ADD COLUMN reason TEXT",
+        """
+        CREATE TABLE probes (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            info TEXT NOT NULL
+        )
+        """,
+    ],
+    [
+        """
+        CREATE TABLE fingerprints (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            fingerprint TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE content_blacklist (
+            fingerprint TEXT PRIMARY KEY,
+            reason TEXT,
+            added_at REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE content_results (
+            fingerprint TEXT PRIMARY KEY,
+            output_path TEXT NOT NULL,
+            output_size INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        )
+        """,
+    ],
+    [
+        """
+        CREATE TABLE jobs (
+            path TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            worker TEXT,
+            lease_expires REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            outcome TEXT,
+            queued_at REAL NOT NULL,
+            finished_at REAL
+        )
+        """,
+        "CREATE INDEX jobs_status ON jobs (status, queued_at)",
+    ],
+    [
+        """
+        CREATE TABLE history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            path TEXT NOT NULL,
+            directory TEXT NOT NULL,
+            finished_at REAL NOT NULL,
+            outcome TEXT NOT NULL,
+            input_size INTEGER,
+            output_size INTEGER,
+            conversion_seconds REAL NOT NULL DEFAULT 0,
+            cpu_seconds REAL NOT NULL DEFAULT 0,
+            codec TEXT,
+            width INTEGER,
+            height INTEGER,
+            media_duration REAL,
+            profile TEXT
+        )
+        """,
+        "CREATE INDEX history_directory ON history (directory, finished_at)",
+        "CREATE INDEX history_finished_at ON history (finished_at)",
+    ],
+]
+
+HISTORY_FIELDS = (
+    "path",
+    "directory",
+    "finished_at",
+    "outcome",
+    "input_size",
+    "output_size",
+    "conversion_seconds",
+    "cpu_seconds",
+    "codec",
+    "width",
+    "height",
+    "media_duration",
+    "profile",
+)
+
+# Dateien, deren Ersparnis in die Statistik eingeht
+SAVING_OUTCOMES = ("converted", "remuxed", "reused")
+_SAVED = f"""
+    outcome IN {SAVING_OUTCOMES} AND output_size < input_size
+"""
+_MB = "/ 1048576.0"
+HISTORY_STATISTICS = f"""
+    SELECT
+        coalesce(sum(CASE WHEN {_SAVED} THEN input_size {_MB} END), 0),
+        coalesce(sum(CASE WHEN {_SAVED} THEN (input_size - output_size) {_MB} END), 0),
+        count(CASE WHEN outcome = 'converted' THEN 1 END),
+        coalesce(sum(CASE WHEN outcome = 'converted' THEN conversion_seconds END), 0),
+        count(CASE WHEN outcome = 'remuxed' THEN 1 END),
+        coalesce(sum(CASE WHEN outcome = 'remuxed' THEN conversion_seconds END), 0),
+        coalesce(sum(cpu_seconds), 0),
+        coalesce(sum(CASE WHEN outcome = 'remuxed' THEN input_size {_MB} END), 0),
+        count(CASE WHEN outcome = 'reused' AND output_size < input_size THEN 1 END),
+        coalesce(sum(CASE WHEN outcome = 'reused' AND output_size < input_size
+            THEN input_size {_MB} END), 0)
+    FROM history WHERE finished_at >= ? AND id > ? AND id <= ?
+"""
+
+STATISTIC_KEYS = (
+    "total_input_mb",
+    "total_savings_mb",
+    "total_files_converted",
+    "total_conversion_time_seconds",
+    "total_files_remuxed",
+    "total_remux_time_seconds",
+    "total_cpu_seconds",
+    "total_remux_input_mb",
+    "total_files_reused",
+    "total_reused_input_mb",
+)
+
+
+class StateStore:
+    """
+    Speichert Blacklist, Statistiken und den Fortschritt in einer SQLite-Datenbank.
+    Jede Änderung ist eine kleine, atomare Transaktion, sodass ein Absturz nie den
+    gesamten Zustand beschädigt. Alle Methoden sind threadsicher.
+    """
+
+    def __init__(self, path, shared=False):
+        """
+        Args:
+            path (str): Pfad der Datenbank.
+            shared (bool): Die Datenbank liegt auf einem Netzlaufwerk und wird von
+                mehreren Rechnern geöffnet. WAL funktioniert dort nicht, deshalb wird
+                das klassische Rollback-Journal verwendet.
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        # (statistics_since, letzte verbuchte history-ID, Summen) für get_statistics
+        self._history_totals = None
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        if shared:
+            self._conn.execute("PRAGMA journal_mode=DELETE")
+            self._conn.execute("PRAGMA synchronous=FULL")
+        else:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+
+    def _migrate(self):
+        with self._lock:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, statements in enumerate(
+                SCHEMA_MIGRATIONS[version:], start=version + 1
+            ):
+                with self._conn:
+                    for statement in statements:
+                        self._conn.execute(statement)
+                    self._conn.execute(f"PRAGMA user_version = {number}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # Blacklist
+
+    def is_blacklisted(self, path):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM blacklist WHERE path = ?", (path,)
+            ).fetchone()
+        return row is not None
+
+    def add_to_blacklist(self, path, reason=None, fingerprint=None):
+        """
+        Fügt einen Pfad zur Blacklist hinzu. Mit fingerprint gilt die Entscheidung
+        auch für den Inhalt, also für Kopien und verschobene Dateien.
+
+        Args:
+            path (str): Der Pfad der MKV-Datei.
+            reason (str): "no_savings" nach einer Konvertierung, "predicted" nach ffprobe.
+            fingerprint (str): Der Inhalts-Fingerabdruck (optional).
+
+        Returns:
+            bool: True, wenn der Pfad neu eingetragen wurde.
+        """
+        now = time_module.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO blacklist (path, added_at, reason) VALUES (?, ?, ?)",
+                (path, now, reason),
+            )
+            if fingerprint:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO content_blacklist (fingerprint, reason, added_at) VALUES (?, ?, ?)",
+                    (fingerprint, reason, now),
+                )
+        return cursor.rowcount > 0
+
+    def content_blacklist_reason(self, fingerprint):
+        """
+        Returns:
+            str: Der Grund, wenn der Inhalt auf der Blacklist steht, sonst None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT coalesce(reason, '') FROM content_blacklist WHERE fingerprint = ?",
+                (fingerprint,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def clear_blacklist(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM blacklist")
+            self._conn.execute("DELETE FROM content_blacklist")
+
+    # Statistiken
+
+    def _statistics_since(self):
+        return float(self.get_meta("statistics_since", 0))
+
+    def get_statistics(self):
+        """
+        Liefert die Gesamtstatistiken als Dictionary mit den gleichen Schlüsseln
+        wie früher in der Konfigurationsdatei. Sie werden aus dem Verlauf berechnet;
+        die Tabelle statistics enthält nur noch übernommene Werte älterer Versionen.
+
+        Der Verlauf wird nur angehängt, deshalb werden die Summen zwischengespeichert
+        und bei jedem Aufruf nur um die neuen Einträge ergänzt, auch um die anderer
+        Rechner an einer gemeinsamen Datenbank.
+        """
+        since = self._statistics_since()
+        with self._lock:
+            rows = dict(self._conn.execute("SELECT key, value FROM statistics"))
+            if self._history_totals and self._history_totals[0] == since:
+                _, last_id, totals = self._history_totals
+            else:
+                last_id, totals = 0, (0,) * len(STATISTIC_KEYS)
+            newest_id = self._conn.execute(
+                "SELECT coalesce(max(id), 0) FROM history"
+            ).fetchone()[0]
+            if newest_id > last_id:
+                history = self._conn.execute(
+                    HISTORY_STATISTICS, (since, last_id, newest_id)
+                ).fetchone()
+                totals = tuple(total + value for total, value in zip(totals, history))
+            self._history_totals = (since, newest_id, totals)
+        statistics = {
+            key: rows.get(key, 0.0) + value
+            for key, value in zip(STATISTIC_KEYS, totals)
+        }
+        statistics["total_files_converted"] = int(statistics["total_files_converted"])
+        statistics["total_files_remuxed"] = int(statistics["total_files_remuxed"])
+        statistics["total_files_reused"] = int(statistics["total_files_reused"])
+        return statistics
+
+    def add_history(self, record):
+        """
+        Hängt das Ergebnis einer Datei an den Verlauf an. Einträge werden nie geändert.
+
+        Args:
+            record (dict): Felder aus HISTORY_FIELDS; fehlende bleiben leer.
+        """
+        values = dict(record)
+        values.setdefault("directory", os.path.dirname(values["path"]))
+        values.setdefault("finished_at", time_module.time())
+        values.setdefault("conversion_seconds", 0.0)
+        values.setdefault("cpu_seconds", 0.0)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO history ({', '.join(HISTORY_FIELDS)}) "
+                f"VALUES ({', '.join('?' for _ in HISTORY_FIELDS)})",
+                [values.get(field) for field in HISTORY_FIELDS],
+            )
+
+    def iter_history(self, batch_size=1000):
+        """
+        Liefert den gesamten Verlauf als Dictionaries, ohne ihn vollständig zu laden.
+        """
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, {', '.join(HISTORY_FIELDS)} FROM history "
+                    "WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(zip(HISTORY_FIELDS, row[1:]))
+            last_id = rows[-1][0]
+
+    def _add_statistics(self, values):
+        self._conn.executemany(
+            """
+            INSERT INTO statistics (key, value) VALUES (?, ?)
+            ON CONFLICT (key) DO UPDATE SET value = value + excluded.value
+            """,
+            values.items(),
+        )
+
+    def _add_directory_savings(self, directory, savings_mb):
+        self._conn.execute(
+            """
+            INSERT INTO directory_savings (directory, savings_mb) VALUES (?, ?)
+            ON CONFLICT (directory) DO UPDATE SET savings_mb = savings_mb + excluded.savings_mb
+            """,
+            (directory, savings_mb),
+        )
+
+    def directory_savings(self, directory):
+        since = self._statistics_since()
+        with self._lock:
+            legacy = self._conn.execute(
+                "SELECT savings_mb FROM directory_savings WHERE directory = ?",
+                (directory,),
+            ).fetchone()
+            history = self._conn.execute(
+                f"""
+                SELECT coalesce(sum((input_size - output_size) {_MB}), 0) FROM history
+                WHERE directory = ? AND finished_at >= ? AND {_SAVED}
+                """,
+                (directory, since),
+            ).fetchone()
+        return (legacy[0] if legacy else 0.0) + history[0]
+
+    def reset_statistics(self):
+        """
+        Setzt die Statistiken zurück. Der Verlauf bleibt für --report erhalten,
+        zählt aber erst ab jetzt wieder zur Statistik.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM statistics")
+            self._conn.execute("DELETE FROM directory_savings")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('statistics_since', ?)",
+                (str(time_module.time()),),
+            )
+
+    # Fortschritt
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row and row[0] is not None else default
+
+    def set_meta(self, key, value):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    def get_last_path(self):
+        """
+        Liefert den verzeichnisbasierten Fortsetzungspunkt älterer Versionen.
+        """
+        return self.get_meta("last_path")
+
+    def set_last_path(self, path):
+        self.set_meta("last_path", path)
+
+    def get_checkpoint(self, root):
+        """
+        Returns:
+            tuple: (Pfad, Position als JSON) oder None.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT path, position FROM checkpoints WHERE root = ?", (root,)
+            ).fetchone()
+
+    def set_checkpoint(self, root, path, position):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (root, path, position, updated_at) VALUES (?, ?, ?, ?)",
+                (root, path, position, time_module.time()),
+            )
+
+    def clear_checkpoint(self, root):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM checkpoints WHERE root = ?", (root,))
+
+    # ffprobe-Cache
+
+    def get_probe(self, path, size, mtime_ns):
+        """
+        Liefert zwischengespeicherte ffprobe-Daten, wenn sich die Datei nicht geändert hat.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT info FROM probes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, size, mtime_ns),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_probe(self, path, size, mtime_ns, info):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO probes (path, size, mtime_ns, info) VALUES (?, ?, ?, ?)",
+                (path, size, mtime_ns, json.dumps(info)),
+            )
+
+    # Inhalts-Fingerabdrücke
+
+    def get_fingerprint(self, path, size, mtime_ns):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint FROM fingerprints WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, size, mtime_ns),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_fingerprint(self, path, size, mtime_ns, fingerprint):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (path, size, mtime_ns, fingerprint) VALUES (?, ?, ?, ?)",
+                (path, size, mtime_ns, fingerprint),
+            )
+
+    def get_content_result(self, fingerprint):
+        """
+        Liefert die MP4-Datei, die zuletzt aus diesem Inhalt erzeugt wurde.
+
+        Returns:
+            tuple: (Pfad, Größe) oder None.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT output_path, output_size FROM content_results WHERE fingerprint = ?",
+                (fingerprint,),
+            ).fetchone()
+
+    def set_content_result(self, fingerprint, output_path, output_size):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO content_results (fingerprint, output_path, output_size, created_at) VALUES (?, ?, ?, ?)",
+                (fingerprint, output_path, output_size, time_module.time()),
+            )
+
+    # Laufende Konvertierungen
+
+    def begin_job(self, path, output_path):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO running_jobs (path, output_path, started_at) VALUES (?, ?, ?)",
+                (path, output_path, time_module.time()),
+            )
+
+    def end_job(self, path):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM running_jobs WHERE path = ?", (path,))
+
+    def get_running_jobs(self):
+        """
+        Liefert Konvertierungen, die beim letzten Lauf nicht beendet wurden.
+
+        Returns:
+            list: Tupel aus (MKV-Pfad, Ausgabepfad).
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT path, output_path FROM running_jobs"
+            ).fetchall()
+
+    # Auftragswarteschlange für den verteilten Betrieb
+
+    def enqueue_job(self, path):
+        """
+        Stellt eine Datei in die Warteschlange. Abgeschlossene Aufträge werden erneut
+        eingestellt, wartende und laufende bleiben unverändert.
+
+        Returns:
+            bool: True, wenn der Auftrag neu eingestellt wurde.
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """
+                INSERT INTO jobs (path, status, queued_at) VALUES (?, 'queued', ?)
+                ON CONFLICT (path) DO UPDATE SET
+                    status = 'queued', worker = NULL, lease_expires = NULL,
+                    attempts = 0, outcome = NULL, queued_at = excluded.queued_at,
+                    finished_at = NULL
+                WHERE status IN ('done', 'failed')
+                """,
+                (path, time_module.time()),
+            )
+        return cursor.rowcount > 0
+
+    def lease_job(self, worker, lease_seconds):
+        """
+        Vergibt den ältesten wartenden Auftrag an worker. Die Transaktion sperrt die
+        Datenbank sofort, sodass zwei Prozesse nie denselben Auftrag bekommen.
+
+        Returns:
+            str: Der Pfad der MKV-Datei oder None, wenn kein Auftrag wartet.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute(
+                "SELECT path FROM jobs WHERE status = 'queued' ORDER BY queued_at, path LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                """
+                UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?,
+                    attempts = attempts + 1
+                WHERE path = ?
+                """,
+                (worker, time_module.time() + lease_seconds, row[0]),
+            )
+        return row[0]
+
+    def renew_leases(self, worker, lease_seconds):
+        """
+        Verlängert alle Aufträge von worker (Heartbeat).
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE status = 'leased' AND worker = ?",
+                (time_module.time() + lease_seconds, worker),
+            )
+
+    def requeue_expired_jobs(self, max_attempts):
+        """
+        Stellt Aufträge, deren Worker keinen Heartbeat mehr sendet, erneut ein.
+        Nach max_attempts Versuchen gilt ein Auftrag als fehlgeschlagen.
+
+        Returns:
+            tuple: (Liste erneut eingestellter Pfade, Liste fehlgeschlagener Pfade).
+        """
+        now = time_module.time()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                "SELECT path, attempts FROM jobs WHERE status = 'leased' AND lease_expires < ?",
+                (now,),
+            ).fetchall()
+            requeued = [path for path, attempts in rows if attempts < max_attempts]
+            failed = [path for path, attempts in rows if attempts >= max_attempts]
+            self._conn.executemany(
+                "UPDATE jobs SET status = 'queued', worker = NULL, lease_expires = NULL WHERE path = ?",
+                [(path,) for path in requeued],
+            )
+            self._conn.executemany(
+                "UPDATE jobs SET status = 'failed', outcome = 'lost', finished_at = ? WHERE path = ?",
+                [(now, path) for path in failed],
+            )
+        return requeued, failed
+
+    def finish_job(self, path, worker, outcome):
+        """
+        Schließt einen Auftrag ab, sofern worker ihn noch hält.
+
+        Returns:
+            bool: True, wenn der Auftrag abgeschlossen wurde.
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """
+                UPDATE jobs SET status = ?, outcome = ?, lease_expires = NULL, finished_at = ?
+                WHERE path = ? AND status = 'leased' AND worker = ?
+                """,
+                (
+                    "failed" if outcome == "failed" else "done",
+                    outcome,
+                    time_module.time(),
+                    path,
+                    worker,
+                ),
+            )
+        return cursor.rowcount > 0
+
+    def release_jobs(self, worker):
+        """
+        Gibt alle Aufträge von worker sofort wieder frei, z.B. beim Beenden.
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """
+                UPDATE jobs SET status = 'queued', worker = NULL, lease_expires = NULL,
+                    attempts = attempts - 1
+                WHERE status = 'leased' AND worker = ?
+                """,
+                (worker,),
+            )
+        return cursor.rowcount
+
+    def is_job_leased(self, path):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM jobs WHERE path = ? AND status = 'leased' AND lease_expires >= ?",
+                (path, time_module.time()),
+            ).fetchone()
+        return row is not None
+
+    def count_jobs(self):
+        """
+        Returns:
+            dict: Anzahl der Aufträge je Status ("queued", "leased", "done", "failed").
+        """
+        with self._lock:
+            rows = dict(
+                self._conn.execute("SELECT status, count(*) FROM jobs GROUP BY status")
+            )
+        return {
+            status: rows.get(status, 0)
+            for status in ("queued", "leased", "done", "failed")
+        }
+
+    # Scan-Index
+
+    def get_directory_index(self, directory):
+        """
+        Liefert den gespeicherten Index eines Verzeichnisses.
+
+        Returns:
+            tuple: (mtime_ns, entry_count, {Pfad: (size, mtime_ns, inode)}) oder None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime_ns, entry_count FROM scan_directories WHERE path = ?",
+                (directory,),
+            ).fetchone()
+            if row is None:
+                return None
+            files = {
+                path: (size, mtime_ns, inode)
+                for path, size, mtime_ns, inode in self._conn.execute(
+                    "SELECT path, size, mtime_ns, inode FROM scan_files WHERE directory = ?",
+                    (directory,),
+                )
+            }
+        return row[0], row[1], files
+
+    def record_directory(self, directory, snapshot):
+        """
+        Speichert den Snapshot eines vollständig abgearbeiteten Verzeichnisses.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scan_directories (path, mtime_ns, entry_count) VALUES (?, ?, ?)",
+                (directory, snapshot["mtime_ns"], snapshot["entry_count"]),
+            )
+            self._conn.execute(
+                "DELETE FROM scan_files WHERE directory = ?", (directory,)
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO scan_files (path, directory, size, mtime_ns, inode) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (path, directory, size, mtime_ns, inode)
+                    for path, size, mtime_ns, inode in snapshot["files"]
+                ),
+            )
+
+    def clear_scan_index(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM scan_directories")
+            self._conn.execute("DELETE FROM scan_files")
+
+    # Migration
+
+    def import_legacy_state(self, data):
+        """
+        Übernimmt Blacklist, Statistiken und last_path aus einer alten JSON-Konfiguration.
+        Alles wird in einer Transaktion geschrieben; bei einem Fehler bleibt die Datenbank unverändert.
+
+        Args:
+            data (dict): Die alten Felder "last_path", "blacklist" und "statistics".
+        """
+        statistics = data.get("statistics") or {}
+        now = time_module.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO blacklist (path, added_at) VALUES (?, ?)",
+                ((path, now) for path in data.get("blacklist") or []),
+            )
+            self._add_statistics(
+                {key: statistics.get(key, 0.0) or 0.0 for key in STATISTIC_KEYS}
+            )
+            for directory, savings_mb in (
+                statistics.get("per_directory_savings_mb") or {}
+            ).items():
+                self._add_directory_savings(directory, savings_mb)
+            if data.get("last_path"):
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_path', ?)",
+                    (data["last_path"],),
+                )
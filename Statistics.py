@@ -1,36 +1,13 @@
 from Logger import log
-from Config import save_config
+from Metrics import throughput
 from Utils import format_number, format_time
 
 
-def update_statistics(config, directory, input_mb, savings_mb, conversion_time):
-    """
-    Aktualisiert die Statistiken basierend auf den Ersparnissen einer Datei.
-    """
-    # Stelle sicher, dass nur positive Ersparnisse hinzugefügt werden
-    if savings_mb <= 0:
-        return
-
-    stats = config["statistics"]
-    stats["total_input_mb"] += input_mb
-    stats["total_savings_mb"] += savings_mb
-    stats["total_files_converted"] += 1
-    stats["total_conversion_time_seconds"] += conversion_time
-
-    # Aktualisiere die Ersparnis pro Verzeichnis
-    if directory not in stats["per_directory_savings_mb"]:
-        stats["per_directory_savings_mb"][directory] = 0.0
-    stats["per_directory_savings_mb"][directory] += savings_mb
-
-    save_config(config)
-
-
 def display_directory_savings(config, directory):
     """
     Zeigt die Ersparnis für ein bestimmtes Verzeichnis an.
     """
-    stats = config["statistics"]
-    savings_mb = stats["per_directory_savings_mb"].get(directory, 0.0)
+    savings_mb = config["state"].directory_savings(directory)
     if savings_mb > 0:
         log(
             f"📗 Ersparnis für Verzeichnis '{directory}': {format_number(savings_mb)} MB"
@@ -41,7 +18,7 @@ def display_total_statistics(config):
     """
     Zeigt die Gesamtstatistiken an.
     """
-    stats = config["statistics"]
+    stats = config["state"].get_statistics()
     total_input_mb = stats["total_input_mb"]
     total_savings_mb = stats["total_savings_mb"]
     total_files = stats["total_files_converted"]
@@ -62,3 +39,24 @@ def display_total_statistics(config):
         f"💾 Gesamtersparnis: {format_number(total_savings_mb)} MB ({format_number(total_savings_percent)}%)"
     )
     log(f"⏱️ Durchschnittliche Konvertierungszeit pro Datei: {average_time_str}")
+
+    remuxed_files = stats["total_files_remuxed"]
+    if remuxed_files > 0:
+        average_remux_str = format_time(
+            stats["total_remux_time_seconds"] / remuxed_files
+        )
+        log(
+            f"📦 Umgepackte Dateien: {remuxed_files}, durchschnittlich {average_remux_str} pro Datei"
+        )
+
+    if stats["total_files_reused"] > 0:
+        log(
+            f"♻️ Von Duplikaten übernommen: {stats['total_files_reused']} Dateien ohne Konvertierung"
+        )
+
+    input_gb_per_hour, savings_per_cpu_hour = throughput(stats)
+    if input_gb_per_hour is not None and savings_per_cpu_hour is not None:
+        log(
+            f"📈 Durchsatz: {format_number(input_gb_per_hour)} GB pro Stunde, "
+            f"{format_number(savings_per_cpu_hour)} MB Ersparnis pro CPU-Stunde"
+        )
@@ -0,0 +1,247 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time as time_module
+from Logger import error, log, warning
+from Processor import find_mkv_files, large_enough
+from Segment import is_segment_directory
+from Utils import format_number
+
+DEFAULT_WATCH_SETTLE_SECONDS = 60  # So lange darf eine neue Datei nicht mehr wachsen
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class Inotify:
+    """
+    Minimaler Zugriff auf inotify über ctypes (nur Linux, ohne zusätzliche Pakete).
+
+    Raises:
+        OSError: Wenn inotify nicht verfügbar ist.
+    """
+
+    def __init__(self):
+        library = ctypes.util.find_library("c")
+        if library is None:
+            raise OSError(errno.ENOSYS, "libc nicht gefunden")
+        self._libc = ctypes.CDLL(library, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify wird nicht unterstützt")
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 fehlgeschlagen")
+        self._poll = select.poll()
+        self._poll.register(self.fd, select.POLLIN)
+
+    def add_watch(self, path, mask):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), path)
+        return wd
+
+    def remove_watch(self, wd):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout=None):
+        """
+        Wartet höchstens timeout Sekunden (None: unbegrenzt) auf Ereignisse.
+
+        Returns:
+            list: Tupel aus (wd, mask, cookie, name).
+        """
+        if not self._poll.poll(None if timeout is None else int(timeout * 1000)):
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            events.append((wd, mask, cookie, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Watcher:
+    """
+    Beobachtet die Startpfade roots mit inotify und liefert neue oder fertig geschriebene
+    MKV-Dateien. Eine Datei gilt als fertig, wenn sie settle_seconds nach dem letzten
+    Schließen bzw. Verschieben unverändert ist. Zwischen den Ereignissen schläft der
+    Prozess im Kernel und verbraucht keine CPU.
+
+    Änderungen, die andere Rechner auf einem Netzlaufwerk vornehmen, meldet inotify nicht.
+    """
+
+    def __init__(self, config, roots, settle_seconds=DEFAULT_WATCH_SETTLE_SECONDS):
+        self.config = config
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.settle_seconds = max(0, settle_seconds)
+        self.inotify = Inotify()
+        # wd -> Verzeichnis
+        self._directories = {}
+        # Pfad -> (fällig ab, Größe, mtime)
+        self._pending = {}
+        for root in self.roots:
+            self._watch_tree(root)
+
+    def close(self):
+        self.inotify.close()
+
+    def _watch_tree(self, path, scan=False):
+        """
+        Beobachtet path und alle Unterverzeichnisse. Mit scan werden die enthaltenen
+        MKV-Dateien vorgemerkt, z.B. für ein hineinverschobenes Verzeichnis.
+        Segment-Verzeichnisse laufender Konvertierungen werden nicht beobachtet.
+        """
+        if is_segment_directory(path):
+            return
+        for directory, subdirectories, files in os.walk(path):
+            subdirectories[:] = sorted(
+                name for name in subdirectories if not is_segment_directory(name)
+            )
+            try:
+                wd = self.inotify.add_watch(directory, WATCH_MASK)
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    error(
+                        "❌ Zu wenige inotify-Watches. fs.inotify.max_user_watches erhöhen."
+                    )
+                    raise
+                error(f"❌ Fehler beim Beobachten von {directory}: {e}")
+                continue
+            self._directories[wd] = directory
+            if scan:
+                for name in files:
+                    self._remember(os.path.join(directory, name))
+
+    def _unwatch_tree(self, path):
+        prefix = os.path.join(path, "")
+        for wd, directory in list(self._directories.items()):
+            if directory == path or directory.startswith(prefix):
+                self.inotify.remove_watch(wd)
+                del self._directories[wd]
+
+    def _remember(self, file_path):
+        if not file_path.lower().endswith(".mkv"):
+            return
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return
+        self._pending[file_path] = (
+            time_module.monotonic() + self.settle_seconds,
+            stat.st_size,
+            stat.st_mtime_ns,
+        )
+
+    def _rescan(self):
+        # Ereignisse gingen verloren; Index-gestützter Scan findet verpasste Dateien
+        warning("⚠️ inotify-Warteschlange übergelaufen. Durchsuche erneut.")
+        for wd in list(self._directories):
+            self.inotify.remove_watch(wd)
+        self._directories.clear()
+        for root in self.roots:
+            self._watch_tree(root)
+            for file_path in find_mkv_files(root, self.config):
+                self._remember(file_path)
+
+    def _handle(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            self._rescan()
+            return
+        directory = self._directories.get(wd)
+        if directory is None:
+            return
+        if mask & IN_IGNORED:
+            del self._directories[wd]
+            return
+        path = os.path.join(directory, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._watch_tree(path, scan=True)
+            elif mask & IN_MOVED_FROM:
+                self._unwatch_tree(path)
+            return
+        if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            self._remember(path)
+
+    def _is_ready(self, file_path, size, mtime_ns):
+        """
+        Prüft eine fällige Datei. Ist sie noch gewachsen, wird sie erneut vorgemerkt.
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False  # Inzwischen gelöscht, verschoben oder konvertiert
+        if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+            self._remember(file_path)
+            return False
+        if not large_enough(stat.st_size, self.config["settings"]):
+            return False
+        if self.config["state"].is_blacklisted(file_path):
+            return False
+        return True
+
+    def next_file(self):
+        """
+        Blockiert, bis eine neue MKV-Datei fertig geschrieben ist.
+
+        Returns:
+            str: Der Pfad der MKV-Datei.
+        """
+        while True:
+            now = time_module.monotonic()
+            for file_path, (due, size, mtime_ns) in sorted(
+                self._pending.items(), key=lambda item: item[1][0]
+            ):
+                if due > now:
+                    break
+                del self._pending[file_path]
+                if self._is_ready(file_path, size, mtime_ns):
+                    log(
+                        f"👀 Neu: {os.path.basename(file_path)} ({format_number(size / (1024 * 1024))} MB)"
+                    )
+                    return file_path
+
+            timeout = None
+            if self._pending:
+                timeout = max(0, min(due for due, _, _ in self._pending.values()) - now)
+            for wd, mask, _, name in self.inotify.read(timeout):
+                self._handle(wd, mask, name)
+
+    def __iter__(self):
+        while True:
+            yield self.next_file()